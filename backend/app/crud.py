@@ -1,11 +1,14 @@
-from datetime import date, timedelta
-from typing import List, Optional
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
 
-from sqlalchemy import and_, delete
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, case, delete, func, select, tuple_
+from sqlalchemy.orm import Session, selectinload
 
 from . import models, schemas
+from .services import image_variants, resource_versions, rollups, streaks
+from .utils.sql_dates import EPOCH, day_number
 from .utils.timezone_utils import get_bangkok_today
+from .utils.upsert import dialect_insert
 
 
 # User (for security)
@@ -44,12 +47,36 @@ def _build_habit_with_history(habit: models.Habit) -> dict:
     }
 
 
-def get_habits_for_user(db: Session, user_id: int) -> List[dict]:
+def completions_in_window(
+    start_date: Optional[date] = None, end_date: Optional[date] = None
+):
+    """
+    Habit.completions restricted to [start_date, end_date] for use in loader
+    options, so the date window is applied in SQL rather than after loading.
+    """
+    criteria = []
+    if start_date is not None:
+        criteria.append(models.HabitCompletion.completed_on >= start_date)
+    if end_date is not None:
+        criteria.append(models.HabitCompletion.completed_on <= end_date)
+
+    if not criteria:
+        return models.Habit.completions
+    return models.Habit.completions.and_(*criteria)
+
+
+def get_habits_for_user(
+    db: Session,
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> List[dict]:
     habits = (
         db.query(models.Habit)
-        .options(joinedload(models.Habit.completions))
+        .options(selectinload(completions_in_window(start_date, end_date)))
         .filter(models.Habit.user_id == user_id)
         .order_by(models.Habit.habit_id.asc())
+        .execution_options(populate_existing=True)
         .all()
     )
     return [_build_habit_with_history(h) for h in habits]
@@ -60,6 +87,89 @@ def get_user_habits(db: Session, user_id: int) -> List[dict]:
     return get_habits_for_user(db, user_id)
 
 
+def get_habit_bulk_page(
+    db: Session,
+    user_id: int,
+    after_id: Optional[int] = None,
+    limit: int = 50,
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Keyset-paginated lightweight habit rows for list views.
+
+    completed_today and week_completion (completions in the last 7 days,
+    today included) are aggregated in SQL over only this week's completions,
+    so the completions/sessions collections are never loaded.
+    Returns (rows, next_after_id); next_after_id is None on the last page.
+    """
+    today = get_bangkok_today()
+    week_start = today - timedelta(days=6)
+    Completion = models.HabitCompletion
+
+    query = (
+        db.query(
+            models.Habit.habit_id,
+            models.Habit.user_id,
+            models.Habit.habit_name,
+            models.Habit.category_id,
+            models.HabitCategory.category_name,
+            models.HabitCategory.color,
+            models.Habit.emoji,
+            models.Habit.duration_minutes,
+            models.Habit.best_streak,
+            models.Habit.is_active,
+            func.max(case((Completion.completed_on == today, 1), else_=0)).label(
+                "completed_today"
+            ),
+            func.count(Completion.completion_id).label("week_completion"),
+        )
+        .outerjoin(
+            models.HabitCategory,
+            models.HabitCategory.category_id == models.Habit.category_id,
+        )
+        .outerjoin(
+            Completion,
+            and_(
+                Completion.habit_id == models.Habit.habit_id,
+                Completion.completed_on >= week_start,
+                Completion.completed_on <= today,
+            ),
+        )
+        .filter(models.Habit.user_id == user_id)
+    )
+
+    if after_id is not None:
+        query = query.filter(models.Habit.habit_id > after_id)
+
+    rows = (
+        query.group_by(models.Habit.habit_id, models.HabitCategory.category_id)
+        .order_by(models.Habit.habit_id.asc())
+        .limit(limit + 1)
+        .all()
+    )
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [
+        {
+            "habit_id": row.habit_id,
+            "user_id": row.user_id,
+            "habit_name": row.habit_name,
+            "category_id": row.category_id,
+            "category_name": row.category_name,
+            "color": row.color,
+            "emoji": row.emoji,
+            "duration_minutes": row.duration_minutes,
+            "best_streak": row.best_streak or 0,
+            "is_active": row.is_active,
+            "completed_today": bool(row.completed_today),
+            "week_completion": row.week_completion,
+        }
+        for row in rows
+    ]
+    next_after_id = items[-1]["habit_id"] if has_more else None
+    return items, next_after_id
+
+
 def create_user_habit(db: Session, habit: schemas.HabitCreate, user_id: int):
     obj = models.Habit(
         user_id=user_id,
@@ -70,6 +180,7 @@ def create_user_habit(db: Session, habit: schemas.HabitCreate, user_id: int):
         best_streak=0,
     )
     db.add(obj)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     db.refresh(obj)
 
@@ -82,22 +193,49 @@ def delete_user_habit(db: Session, habit_id: int, user_id: int) -> bool:
     obj = get_habit(db, habit_id, user_id)
     if not obj:
         return False
+    days = rollups.habit_days(db, habit_id)
     db.delete(obj)
+    db.flush()
+    streaks.rebuild_user_streak(db, user_id)
+    rollups.rebuild_days(db, user_id, days)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     return True
 
 
-def log_habit_completion(db: Session, habit_id: int, user_id: int, completed_on: date):
-    """Create a habit completion record."""
-    db_completion = models.HabitCompletion(
-        habit_id=habit_id,
-        user_id=user_id,
-        completed_on=completed_on,
+def insert_habit_completion(
+    db: Session, habit_id: int, user_id: int, completed_on: date
+) -> bool:
+    """
+    Mark a day done unless it already is (does not commit). A single
+    INSERT ... ON CONFLICT DO NOTHING, so a repeated or concurrent call is a
+    no-op instead of an IntegrityError; returns whether a row was added.
+    """
+    stmt = (
+        dialect_insert(db, models.HabitCompletion)
+        .values(habit_id=habit_id, user_id=user_id, completed_on=completed_on)
+        .on_conflict_do_nothing(index_elements=["habit_id", "user_id", "completed_on"])
+        .returning(models.HabitCompletion.completion_id)
     )
-    db.add(db_completion)
+    if db.execute(stmt).first() is None:
+        return False
+    streaks.record_completion(db, habit_id, user_id, completed_on)
+    rollups.add_completion(db, user_id, completed_on)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
+    return True
+
+
+def log_habit_completion(db: Session, habit_id: int, user_id: int, completed_on: date):
+    """Create a habit completion record (or return the existing one for that day)."""
+    insert_habit_completion(db, habit_id, user_id, completed_on)
     db.commit()
-    db.refresh(db_completion)
-    return db_completion
+    return db.scalars(
+        select(models.HabitCompletion).where(
+            models.HabitCompletion.habit_id == habit_id,
+            models.HabitCompletion.user_id == user_id,
+            models.HabitCompletion.completed_on == completed_on,
+        )
+    ).one()
 
 
 def remove_habit_completion(
@@ -111,30 +249,130 @@ def remove_habit_completion(
         )
     )
     result = db.execute(stmt)
+    if result.rowcount > 0:
+        streaks.record_uncompletion(db, habit_id, user_id, completed_on)
+        rollups.add_completion(db, user_id, completed_on, -1)
+        resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     return result.rowcount > 0
 
 
+def apply_completion_batch(
+    db: Session, user_id: int, toggles: List[schemas.CompletionToggle]
+) -> Tuple[int, int]:
+    """
+    Apply many completion toggles for habits the caller already checked
+    belong to user_id, in one transaction: one INSERT ... ON CONFLICT DO
+    NOTHING, one DELETE, one streak rebuild per touched habit and one
+    rollup update per touched day. Does not commit. Returns (added, removed).
+    """
+    HC = models.HabitCompletion
+    # Last toggle for a cell wins
+    wanted = {(t.habit_id, t.on): t.done for t in toggles}
+    to_add = [cell for cell, done in wanted.items() if done]
+    to_remove = [cell for cell, done in wanted.items() if not done]
+
+    added = removed = []
+    if to_add:
+        stmt = dialect_insert(db, HC).values([
+            {"habit_id": habit_id, "user_id": user_id, "completed_on": day}
+            for habit_id, day in to_add
+        ])
+        added = db.execute(
+            stmt.on_conflict_do_nothing(index_elements=["habit_id", "user_id", "completed_on"])
+            .returning(HC.habit_id, HC.completed_on)
+        ).all()
+    if to_remove:
+        removed = db.execute(
+            delete(HC)
+            .where(HC.user_id == user_id, tuple_(HC.habit_id, HC.completed_on).in_(to_remove))
+            .returning(HC.habit_id, HC.completed_on)
+        ).all()
+
+    if added or removed:
+        for habit_id in {row.habit_id for row in added} | {row.habit_id for row in removed}:
+            streaks.rebuild_habit_streak(db, habit_id, user_id)
+        streaks.rebuild_user_streak(db, user_id)
+
+        deltas = {}
+        for row in added:
+            deltas[row.completed_on] = deltas.get(row.completed_on, 0) + 1
+        for row in removed:
+            deltas[row.completed_on] = deltas.get(row.completed_on, 0) - 1
+        for day, delta in deltas.items():
+            if delta:
+                rollups.add_completion(db, user_id, day, delta)
+        resource_versions.bump(db, user_id, resource_versions.HABITS)
+    return len(added), len(removed)
+
+
 # Gratitude
+def _gratitude_item(entry) -> dict:
+    """Response dict for a gratitude entry (ORM object or row), formatted for frontend."""
+    created_at = entry.created_at
+    return {
+        "id": entry.gratitude_id,
+        "text": entry.body,
+        "category": entry.category or "",
+        # DD/MM/YYYY
+        "date": f"{created_at.day:02d}/{created_at.month:02d}/{created_at.year}",
+        "image": entry.image_url,
+        "image_thumb": image_variants.variant_url(entry.image_url, "thumb"),
+        "image_medium": image_variants.variant_url(entry.image_url, "medium"),
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _gratitude_query(
+    db: Session,
+    user_id: int,
+    category: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    G = models.GratitudeEntry
+    query = db.query(G.gratitude_id, G.body, G.category, G.image_url, G.created_at).filter(
+        G.user_id == user_id
+    )
+    if category is not None:
+        query = query.filter(G.category == category)
+    if start_date is not None:
+        query = query.filter(G.created_at >= datetime.combine(start_date, time.min))
+    if end_date is not None:
+        query = query.filter(G.created_at < datetime.combine(end_date + timedelta(days=1), time.min))
+    return query.order_by(G.created_at.desc(), G.gratitude_id.desc())
+
+
 def get_user_gratitude_entries(db: Session, user_id: int) -> List[dict]:
     """Get all gratitude entries for a user, formatted for frontend."""
-    entries = (
-        db.query(models.GratitudeEntry)
-        .filter(models.GratitudeEntry.user_id == user_id)
-        .order_by(models.GratitudeEntry.created_at.desc())
-        .all()
-    )
+    return [_gratitude_item(row) for row in _gratitude_query(db, user_id)]
 
-    return [
-        {
-            "id": entry.gratitude_id,
-            "text": entry.body,
-            "category": entry.category or "",
-            "date": entry.created_at.strftime("%d/%m/%Y"),  # DD/MM/YYYY
-            "image": entry.image_url,
-        }
-        for entry in entries
-    ]
+
+def get_gratitude_page(
+    db: Session,
+    user_id: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: int = 50,
+    category: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> Tuple[List[dict], Optional[Tuple[datetime, int]]]:
+    """
+    One keyset page of gratitude entries, newest first.
+    `after` is the (created_at, gratitude_id) of the last entry already seen;
+    returns (items, position to pass as `after` for the next page or None).
+    Served by the (user_id, created_at, gratitude_id) index.
+    """
+    G = models.GratitudeEntry
+    query = _gratitude_query(db, user_id, category, start_date, end_date)
+    if after is not None:
+        query = query.filter(tuple_(G.created_at, G.gratitude_id) < tuple_(*after))
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_after = (rows[-1].created_at, rows[-1].gratitude_id) if has_more else None
+    return [_gratitude_item(row) for row in rows], next_after
 
 
 def create_gratitude_entry(
@@ -144,7 +382,7 @@ def create_gratitude_entry(
     category: Optional[str] = None,
     image_url: Optional[str] = None,
 ) -> dict:
-    """Create a new gratitude entry."""
+    """Create a new gratitude entry (does not commit)."""
     entry = models.GratitudeEntry(
         user_id=user_id,
         body=text,
@@ -152,20 +390,15 @@ def create_gratitude_entry(
         image_url=image_url,
     )
     db.add(entry)
-    db.commit()
+    resource_versions.bump(db, user_id, resource_versions.GRATITUDE)
+    db.flush()
     db.refresh(entry)
 
-    return {
-        "id": entry.gratitude_id,
-        "text": entry.body,
-        "category": entry.category or "",
-        "date": entry.created_at.strftime("%d/%m/%Y"),
-        "image": entry.image_url,
-    }
+    return _gratitude_item(entry)
 
 
 def delete_gratitude_entry(db: Session, entry_id: int, user_id: int) -> bool:
-    """Delete a gratitude entry (only if owned by user)."""
+    """Delete a gratitude entry (only if owned by user; does not commit)."""
     entry = (
         db.query(models.GratitudeEntry)
         .filter(
@@ -179,7 +412,8 @@ def delete_gratitude_entry(db: Session, entry_id: int, user_id: int) -> bool:
         return False
 
     db.delete(entry)
-    db.commit()
+    resource_versions.bump(db, user_id, resource_versions.GRATITUDE)
+    db.flush()
     return True
 
 
@@ -231,30 +465,80 @@ def get_user_mood_logs(
     )
 
 
+def insert_mood_log(
+    db: Session,
+    user_id: int,
+    mood_score: int,
+    note: Optional[str],
+    logged_on: date,
+) -> Optional[models.MoodLog]:
+    """
+    Insert a mood log unless the day already has one (does not commit).
+    Returns None on conflict rather than raising IntegrityError.
+    """
+    stmt = (
+        dialect_insert(db, models.MoodLog)
+        .values(user_id=user_id, mood_score=mood_score, note=note, logged_on=logged_on)
+        .on_conflict_do_nothing(index_elements=["user_id", "logged_on"])
+        .returning(models.MoodLog.mood_id)
+    )
+    mood_id = db.execute(stmt).scalar()
+    if mood_id is None:
+        return None
+    rollups.set_mood(db, user_id, logged_on, mood_score)
+    resource_versions.bump(db, user_id, resource_versions.MOOD)
+    return db.get(models.MoodLog, mood_id)
+
+
 def create_mood_log(
     db: Session,
     user_id: int,
     mood_score: int,
     note: Optional[str] = None,
     logged_on: date = None,
-) -> models.MoodLog:
-    """Create a new mood log entry."""
+) -> Optional[models.MoodLog]:
+    """Create a new mood log entry; None if the day already has one."""
     if logged_on is None:
         logged_on = get_bangkok_today()
 
-    mood_log = models.MoodLog(
-        user_id=user_id,
-        mood_score=mood_score,
-        note=note,
-        logged_on=logged_on,
-    )
-
-    db.add(mood_log)
+    mood_log = insert_mood_log(db, user_id, mood_score, note, logged_on)
     db.commit()
-    db.refresh(mood_log)
     return mood_log
 
 
+def insert_habit_session(
+    db: Session,
+    habit_id: int,
+    user_id: int,
+    session_date: date,
+    planned_duration_seconds: int,
+    notes: Optional[str] = None,
+) -> Optional[models.HabitSession]:
+    """Insert a 'todo' session unless the day already has one (does not commit); None on conflict."""
+    stmt = (
+        dialect_insert(db, models.HabitSession)
+        .values(
+            habit_id=habit_id,
+            user_id=user_id,
+            session_date=session_date,
+            planned_duration_seconds=planned_duration_seconds,
+            notes=notes,
+            status="todo",
+        )
+        .on_conflict_do_nothing(index_elements=["habit_id", "user_id", "session_date"])
+        .returning(models.HabitSession.session_id)
+    )
+    session_id = db.execute(stmt).scalar()
+    if session_id is None:
+        return None
+    session = db.get(models.HabitSession, session_id)
+    rollups.apply_session_change(
+        db, user_id, session_date, rollups.session_totals(None), rollups.session_totals(session)
+    )
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
+    return session
+
+
 def update_mood_log(
     db: Session,
     mood_id: int,
@@ -262,7 +546,7 @@ def update_mood_log(
     mood_score: Optional[int] = None,
     note: Optional[str] = None,
 ) -> Optional[models.MoodLog]:
-    """Update an existing mood log."""
+    """Update an existing mood log (does not commit)."""
     mood_log = get_mood_log(db, mood_id, user_id)
 
     if not mood_log:
@@ -270,101 +554,172 @@ def update_mood_log(
 
     if mood_score is not None:
         mood_log.mood_score = mood_score
+        rollups.set_mood(db, user_id, mood_log.logged_on, mood_score)
 
     if note is not None:
         mood_log.note = note
 
-    db.commit()
+    resource_versions.bump(db, user_id, resource_versions.MOOD)
+    db.flush()
     db.refresh(mood_log)
     return mood_log
 
 
 def delete_mood_log(db: Session, mood_id: int, user_id: int) -> bool:
-    """Delete a mood log."""
+    """Delete a mood log (does not commit)."""
     mood_log = get_mood_log(db, mood_id, user_id)
 
     if not mood_log:
         return False
 
     db.delete(mood_log)
-    db.commit()
+    rollups.set_mood(db, user_id, mood_log.logged_on, None)
+    resource_versions.bump(db, user_id, resource_versions.MOOD)
+    db.flush()
     return True
 
 
-def get_mood_statistics(db: Session, user_id: int, days: int = 30) -> dict:
-    """Calculate mood statistics for a user over a period."""
-    start_date = get_bangkok_today() - timedelta(days=days)
-
-    logs = get_user_mood_logs(db, user_id=user_id, start_date=start_date, limit=days)
-
-    if not logs:
-        return {
-            "average_mood": 0,
-            "total_logs": 0,
-            "highest_mood": 0,
-            "lowest_mood": 0,
-            "current_streak": 0,
-            "best_streak": 0,
-            "logs_this_week": 0,
-            "logs_this_month": 0,
-        }
+# Streaks are computed over the most recent year of mood logs
+MOOD_STREAK_LOGS = 365
+
+_EMPTY_MOOD_STATS = {
+    "average_mood": 0,
+    "total_logs": 0,
+    "highest_mood": 0,
+    "lowest_mood": 0,
+    "current_streak": 0,
+    "best_streak": 0,
+    "logs_this_week": 0,
+    "logs_this_month": 0,
+}
+
+def _mood_statistics_sql(db: Session, user_id: int, days: int, today: date) -> dict:
+    """
+    get_mood_statistics as one statement: the latest logs are numbered once,
+    the window stats use FILTER aggregates and streaks are gaps-and-islands
+    over the numbered rows (consecutive days share day_number + row_number).
+    """
+    ML = models.MoodLog
+    recent = (
+        select(
+            ML.logged_on,
+            ML.mood_score,
+            func.row_number().over(order_by=ML.logged_on.desc()).label("rn"),
+        )
+        .where(ML.user_id == user_id)
+        .order_by(ML.logged_on.desc())
+        .limit(max(days, MOOD_STREAK_LOGS))
+        .cte("recent")
+    )
 
-    # Basic stats
-    mood_scores = [log.mood_score for log in logs]
-    average_mood = sum(mood_scores) / len(mood_scores)
+    streak_days = (
+        select(
+            day_number(db, recent.c.logged_on).label("day"),
+            (day_number(db, recent.c.logged_on) + recent.c.rn).label("island"),
+        )
+        .where(recent.c.rn <= MOOD_STREAK_LOGS)
+        .subquery()
+    )
+    runs = (
+        select(
+            func.count().label("length"),
+            func.min(streak_days.c.day).label("first_day"),
+            func.max(streak_days.c.day).label("last_day"),
+        )
+        .group_by(streak_days.c.island)
+        .cte("runs")
+    )
+    today_number = (today - EPOCH).days
+    best_streak = select(func.coalesce(func.max(runs.c.length), 0)).scalar_subquery()
+    # The run containing today, counted up to today (later-dated logs don't extend it)
+    current_streak = (
+        select(func.coalesce(func.max(today_number - runs.c.first_day + 1), 0))
+        .where(runs.c.first_day <= today_number, runs.c.last_day >= today_number)
+        .scalar_subquery()
+    )
 
-    # Week and month counts
-    today = get_bangkok_today()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
+    stmt = select(
+        func.count().label("total_logs"),
+        func.sum(recent.c.mood_score).label("score_sum"),
+        func.max(recent.c.mood_score).label("highest_mood"),
+        func.min(recent.c.mood_score).label("lowest_mood"),
+        func.count().filter(recent.c.logged_on >= today - timedelta(days=7)).label("logs_this_week"),
+        func.count().filter(recent.c.logged_on >= today - timedelta(days=30)).label("logs_this_month"),
+        best_streak.label("best_streak"),
+        current_streak.label("current_streak"),
+    ).where(
+        recent.c.logged_on >= today - timedelta(days=days),
+        recent.c.rn <= days,
+    )
+    row = db.execute(stmt).one()
+
+    if not row.total_logs:
+        return dict(_EMPTY_MOOD_STATS)
+    return {
+        "average_mood": round(row.score_sum / row.total_logs, 1),
+        "total_logs": row.total_logs,
+        "highest_mood": row.highest_mood,
+        "lowest_mood": row.lowest_mood,
+        "current_streak": row.current_streak,
+        "best_streak": row.best_streak,
+        "logs_this_week": row.logs_this_week,
+        "logs_this_month": row.logs_this_month,
+    }
 
-    logs_this_week = sum(1 for log in logs if log.logged_on >= week_ago)
-    logs_this_month = sum(1 for log in logs if log.logged_on >= month_ago)
 
-    # Calculate streaks
-    all_logs = get_user_mood_logs(
-        db, user_id=user_id, limit=365  # Check up to a year for streaks
+def _mood_statistics_python(db: Session, user_id: int, days: int, today: date) -> dict:
+    """
+    Fallback for SQLite: one query for the latest logs, one pass in Python.
+    The window (the newest `days` logs since today - days) is a prefix of them.
+    """
+    rows = (
+        db.query(models.MoodLog.logged_on, models.MoodLog.mood_score)
+        .filter(models.MoodLog.user_id == user_id)
+        .order_by(models.MoodLog.logged_on.desc())
+        .limit(max(days, MOOD_STREAK_LOGS))
+        .all()
     )
 
-    current_streak = 0
-    best_streak = 0
-    temp_streak = 0
+    start_date = today - timedelta(days=days)
+    window = [row for row in rows if row.logged_on >= start_date][:days]
+    if not window:
+        return dict(_EMPTY_MOOD_STATS)
 
-    if all_logs:
-        # Sort by date descending
-        sorted_logs = sorted(all_logs, key=lambda x: x.logged_on, reverse=True)
+    scores = [row.mood_score for row in window]
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
 
-        # Calculate current streak
-        check_date = today
-        for log in sorted_logs:
-            if log.logged_on == check_date:
+    # rows are newest first with one log per day
+    current_streak = best_streak = run = 0
+    check_date = today
+    counting_current = True
+    previous = None
+    for row in rows[:MOOD_STREAK_LOGS]:
+        if counting_current:
+            if row.logged_on == check_date:
                 current_streak += 1
                 check_date -= timedelta(days=1)
-            elif log.logged_on < check_date:
-                break
-
-        # Calculate best streak
-        prev_date = None
-        for log in sorted(all_logs, key=lambda x: x.logged_on):
-            if prev_date is None:
-                temp_streak = 1
-            elif (log.logged_on - prev_date).days == 1:
-                temp_streak += 1
-            else:
-                best_streak = max(best_streak, temp_streak)
-                temp_streak = 1
-
-            prev_date = log.logged_on
-
-        best_streak = max(best_streak, temp_streak)
+            elif row.logged_on < check_date:
+                counting_current = False
+        run = run + 1 if previous is not None and (previous - row.logged_on).days == 1 else 1
+        best_streak = max(best_streak, run)
+        previous = row.logged_on
 
     return {
-        "average_mood": round(average_mood, 1),
-        "total_logs": len(logs),
-        "highest_mood": max(mood_scores),
-        "lowest_mood": min(mood_scores),
+        "average_mood": round(sum(scores) / len(scores), 1),
+        "total_logs": len(window),
+        "highest_mood": max(scores),
+        "lowest_mood": min(scores),
         "current_streak": current_streak,
         "best_streak": best_streak,
-        "logs_this_week": logs_this_week,
-        "logs_this_month": logs_this_month,
-    }
\ No newline at end of file
+        "logs_this_week": sum(1 for row in window if row.logged_on >= week_ago),
+        "logs_this_month": sum(1 for row in window if row.logged_on >= month_ago),
+    }
+
+
+def get_mood_statistics(db: Session, user_id: int, days: int = 30) -> dict:
+    """Calculate mood statistics for a user over a period."""
+    today = get_bangkok_today()
+    if db.get_bind().dialect.name == "postgresql":
+        return _mood_statistics_sql(db, user_id, days, today)
+    return _mood_statistics_python(db, user_id, days, today)
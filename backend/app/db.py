@@ -1,7 +1,100 @@
 import os
+import time
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import metrics
+
+# Pool settings (PostgreSQL); the SQLAlchemy default of 5 + 10 runs out
+# quickly under bursts of sync requests
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# 0 disables the server-side statement timeout
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+class PoolMetrics:
+    """Checkout, overflow, wait and timeout metrics for one pool, under a name prefix."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.checkouts = metrics.counter(f"{prefix}checkouts_total", "Connections handed out by the pool")
+        self.connects = metrics.counter(f"{prefix}connects_total", "New DBAPI connections opened")
+        self.overflows = metrics.counter(
+            f"{prefix}overflow_total", "Checkouts served by an overflow connection beyond pool_size"
+        )
+        self.waits = metrics.counter(
+            f"{prefix}waits_total", "Checkouts that had to wait for a connection to be returned"
+        )
+        self.timeouts = metrics.counter(
+            f"{prefix}timeouts_total", "Checkouts that gave up after pool_timeout"
+        )
+        self.checkout_seconds = metrics.histogram(
+            f"{prefix}checkout_seconds", "Time spent acquiring a connection from the pool"
+        )
+
+    def snapshot(self) -> dict:
+        return metrics.snapshot(self.prefix)
+
+
+sync_pool_metrics = PoolMetrics("db_pool_")
+async_pool_metrics = PoolMetrics("db_async_pool_")
+
+
+class _InstrumentedPool:
+    """
+    Records checkout latency, overflow and waits. A checkout is classified
+    after it returns: a newly opened connection while more than size()
+    connections are out is an overflow; a reused one that found no idle
+    connection on entry had to wait.
+    """
+
+    pool_metrics = sync_pool_metrics
+
+    def __init__(self, *args, max_overflow: int = 10, **kw):
+        super().__init__(*args, max_overflow=max_overflow, **kw)
+        self.max_overflow = max_overflow
+
+    def _do_get(self):
+        m = self.pool_metrics
+        none_idle = self.checkedin() == 0
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            m.waits.inc()
+            m.timeouts.inc()
+            raise
+        finally:
+            m.checkout_seconds.observe(time.perf_counter() - start)
+
+        if record.fresh:
+            if self.checkedout() > self.size():
+                m.overflows.inc()
+        elif none_idle:
+            m.waits.inc()
+        return record
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    """QueuePool for the sync engine, reporting to the db_pool_* metrics."""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool for the async engine, reporting to the db_async_pool_* metrics."""
+
+    pool_metrics = async_pool_metrics
+
+
+def _instrument(engine, pool_metrics: PoolMetrics = sync_pool_metrics):
+    event.listen(engine, "checkout", lambda *args: pool_metrics.checkouts.inc())
+    event.listen(engine, "connect", lambda *args: pool_metrics.connects.inc())
+
 
 # Check test mode
 if os.getenv("TESTING") == "1":
@@ -10,6 +103,8 @@ if os.getenv("TESTING") == "1":
         SQLALCHEMY_DATABASE_URL,
         connect_args={"check_same_thread": False},
     )
+    ASYNC_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
 else:
     # Use PostgreSQL for production/development
     DB_USER = os.getenv("POSTGRES_USER", "postgres")
@@ -21,15 +116,89 @@ else:
     SQLALCHEMY_DATABASE_URL = (
         f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    connect_args = {}
+    if STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+    # Async engine for read-heavy async routes; same pool settings, separate pool
+    ASYNC_DATABASE_URL = (
+        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
+    async_connect_args = {}
+    if STATEMENT_TIMEOUT_MS > 0:
+        async_connect_args["server_settings"] = {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+        connect_args=async_connect_args,
+    )
+
+_instrument(engine, sync_pool_metrics)
+_instrument(async_engine.sync_engine, async_pool_metrics)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 
+def _pool_status(pool, pool_metrics: PoolMetrics) -> dict:
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=getattr(pool, "max_overflow", MAX_OVERFLOW),
+            timeout=pool.timeout(),
+        )
+    status["metrics"] = pool_metrics.snapshot()
+    return status
+
+
+def pool_status(pool=None) -> dict:
+    """
+    Occupancy plus metrics of one pool, or of both the sync and the async
+    engine's pools when no pool is given.
+    """
+    if pool is not None:
+        return _pool_status(pool, getattr(pool, "pool_metrics", sync_pool_metrics))
+    return {
+        "sync": _pool_status(engine.pool, sync_pool_metrics),
+        "async": _pool_status(async_engine.pool, async_pool_metrics),
+    }
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """
+    AsyncSession dependency for async routes. Results must be fully loaded
+    (eager options or serialized inside run_sync) before the route returns;
+    lazy loads are not available outside the session's greenlet.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
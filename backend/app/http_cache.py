@@ -0,0 +1,148 @@
+"""
+HTTP validators and conditional GET for read endpoints.
+
+A route opts in with a dependency that loads the resource's version (one
+primary-key lookup, see services/resource_versions.py) before the route
+body runs:
+
+    @router.get("/", dependencies=[Depends(user_resource(resource_versions.MOOD))])
+
+If the request's If-None-Match (or, without it, If-Modified-Since) matches,
+the dependency answers 304 and the route's main query never runs. Otherwise
+the validators are left on request.state and ConditionalGetMiddleware adds
+ETag / Last-Modified / Cache-Control / Vary to the 200 response.
+
+ETags are weak: they identify the data version, not the exact bytes. They
+also cover the path, the query string and the current Bangkok date, since
+several endpoints share a version and some answers depend on "today".
+"""
+import hashlib
+from datetime import datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import get_async_db
+from .security import Principal, get_current_principal_async
+from .services import resource_versions
+from .utils.timezone_utils import BANGKOK_TZ, get_bangkok_today
+
+# Per-user data: any cache may keep it only for this user and must revalidate
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def make_etag(request: Request, scope: str, version, daily: bool = True) -> str:
+    """Weak ETag for this URL at this data version (and, if daily, this Bangkok date)."""
+    variant = f"{scope}|{request.url.path}?{request.url.query}"
+    if daily:
+        variant += f"|{get_bangkok_today().isoformat()}"
+    digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def _start_of_today_utc() -> datetime:
+    midnight = datetime.combine(get_bangkok_today(), time.min, tzinfo=BANGKOK_TZ)
+    return midnight.astimezone(timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match."""
+    opaque = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def check_conditional(
+    request: Request,
+    etag: str,
+    last_modified: Optional[datetime],
+    cache_control: str = PRIVATE_REVALIDATE,
+    vary: Optional[str] = "Authorization",
+):
+    """
+    Record the validators for the response, or raise a 304 if the client's
+    copy is current. last_modified is an aware UTC datetime (or None).
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if vary:
+        headers["Vary"] = vary
+    request.state.cache_headers = headers
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = (
+            if_modified_since is not None
+            and last_modified is not None
+            and _not_modified_since(if_modified_since, last_modified)
+        )
+
+    if not_modified:
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def user_resource(resource: str):
+    """Dependency: conditional GET on the current user's version of resource."""
+
+    async def dependency(
+        request: Request,
+        db: AsyncSession = Depends(get_async_db),
+        principal: Principal = Depends(get_current_principal_async),
+    ):
+        version, updated_at = await resource_versions.current(db, principal.user_id, resource)
+        # Answers may change at midnight (streaks, "today" windows) without a write
+        last_modified = _start_of_today_utc()
+        if updated_at is not None:
+            last_modified = max(last_modified, updated_at.replace(tzinfo=timezone.utc))
+        etag = make_etag(request, f"{principal.user_id}:{resource}", version)
+        check_conditional(request, etag, last_modified)
+
+    return dependency
+
+
+class ConditionalGetMiddleware:
+    """
+    Adds the validators recorded by check_conditional() to successful GET
+    responses. Pure ASGI so streaming responses pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_validators(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = scope.get("state", {}).get("cache_headers")
+                if headers:
+                    present = {name.lower() for name, _ in message.get("headers", [])}
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in headers.items()
+                        if name.lower().encode("latin-1") not in present
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
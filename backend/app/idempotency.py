@@ -0,0 +1,149 @@
+"""
+Idempotency keys for retried writes.
+
+A client that may retry a POST (mobile apps on flaky networks) sends an
+Idempotency-Key header, any unique string such as a UUID. The route calls
+begin() before its write and finish() before committing:
+
+    replay = idempotency.begin(db, user_id, key, "POST /mood/", payload)
+    if replay is not None:
+        return replay
+    ...write, without committing...
+    response = idempotency.finish(db, user_id, key, 201, body)
+    db.commit()
+    return response
+
+begin() reserves (user_id, key) in idempotency_keys inside the route's
+transaction, so the reservation and the stored response commit together
+with the write, or not at all (an error response is never stored and the
+retry runs again). A retry with the same key gets the stored response
+without touching anything else; a concurrent retry waits on the key's row
+until the first request commits, then gets its response. Reusing a key for
+a different request is a 422. Keys expire after IDEMPOTENCY_TTL_HOURS, and
+purge_expired() deletes old rows.
+
+Requests without the header are handled as before.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from fastapi import Header, HTTPException, Response
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .utils.upsert import dialect_insert
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+IK = models.IdempotencyKey
+
+
+def idempotency_key(
+    key: Optional[str] = Header(None, alias=HEADER, min_length=1, max_length=255)
+) -> Optional[str]:
+    """Dependency: the request's Idempotency-Key header, if any."""
+    return key
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def fingerprint(scope: str, payload: Any) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{scope}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def _response(status_code: int, body: Optional[str], replayed: bool = False) -> Response:
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    if body is None:
+        return Response(status_code=status_code, headers=headers)
+    return Response(
+        content=body, status_code=status_code, media_type="application/json", headers=headers
+    )
+
+
+def begin(
+    db: Session, user_id: int, key: Optional[str], scope: str, payload: Any = None
+) -> Optional[Response]:
+    """
+    Reserve key for this request (returns None: go ahead and write), or
+    return the response stored by the request that first used it.
+    """
+    if key is None:
+        return None
+    now = _now()
+    digest = fingerprint(scope, payload)
+    stmt = dialect_insert(db, IK).values(
+        user_id=user_id, key=key, fingerprint=digest, created_at=now
+    )
+    # An expired key is reused as if it were new
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "fingerprint": stmt.excluded.fingerprint,
+            "created_at": stmt.excluded.created_at,
+            "status_code": None,
+            "response_body": None,
+        },
+        where=IK.created_at < now - timedelta(hours=TTL_HOURS),
+    )
+    if db.execute(stmt.returning(IK.key)).first() is not None:
+        return None
+
+    stored = db.execute(
+        select(IK.fingerprint, IK.status_code, IK.response_body).where(
+            IK.user_id == user_id, IK.key == key
+        )
+    ).one()
+    if stored.fingerprint != digest:
+        raise HTTPException(
+            status_code=422, detail=f"{HEADER} was already used for a different request"
+        )
+    if stored.status_code is None:
+        raise HTTPException(
+            status_code=409, detail=f"A request with this {HEADER} is still in progress"
+        )
+    return _response(stored.status_code, stored.response_body, replayed=True)
+
+
+def finish(
+    db: Session, user_id: int, key: Optional[str], status_code: int, body: Optional[str] = None
+) -> Response:
+    """Store the response for key (does not commit) and return it."""
+    if key is not None:
+        db.execute(
+            IK.__table__.update()
+            .where(IK.user_id == user_id, IK.key == key)
+            .values(status_code=status_code, response_body=body)
+        )
+    return _response(status_code, body)
+
+
+def purge_expired(db: Session) -> int:
+    """Delete keys older than the TTL (does not commit); returns the number removed."""
+    cutoff = _now() - timedelta(hours=TTL_HOURS)
+    return db.execute(delete(IK).where(IK.created_at < cutoff)).rowcount
+
+
+def main():
+    """Delete expired keys; run it from cron."""
+    from .db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        removed = purge_expired(db)
+        db.commit()
+        print(f"Deleted {removed} expired idempotency keys")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
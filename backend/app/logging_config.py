@@ -0,0 +1,80 @@
+"""
+Logging setup for the API and the standalone commands.
+
+    LOG_LEVEL   root level (default INFO)
+    LOG_LEVELS  per-module overrides, e.g. "app.security=DEBUG,sqlalchemy.engine=INFO"
+    LOG_FORMAT  "text" (default) or "json" (one JSON object per line)
+
+Modules log with lazy %-style arguments, e.g.
+    logger.debug("Loaded %d habits for user %s", len(habits), user_id)
+so a disabled level costs a level check and nothing else.
+"""
+import json
+import logging
+import os
+import sys
+from typing import Dict, Optional
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Single-line JSON records for log aggregation."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _level(name: str) -> int:
+    level = logging.getLevelName(name.strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {name!r}")
+    return level
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Parse "module=LEVEL,module=LEVEL" into {module: level}."""
+    levels = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        module, sep, name = item.partition("=")
+        if not sep or not module.strip():
+            raise ValueError(f"Expected module=LEVEL, got {item!r}")
+        levels[module.strip()] = _level(name)
+    return levels
+
+
+_handler: Optional[logging.Handler] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    levels: Optional[str] = None,
+    fmt: Optional[str] = None,
+):
+    """Install the root handler and levels; safe to call more than once."""
+    global _handler
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    levels = levels if levels is not None else os.getenv("LOG_LEVELS", "")
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    root.addHandler(_handler)
+    root.setLevel(_level(level))
+
+    for module, module_level in parse_levels(levels).items():
+        logging.getLogger(module).setLevel(module_level)
@@ -1,37 +1,88 @@
+import asyncio
+import logging
 import os
 from contextlib import asynccontextmanager
 from zoneinfo import ZoneInfo
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from .db import Base, engine
-from .routers import achievements, auth, gratitude, habits, mood, users
-from .seed_achievements import seed_achievements
+from .db import SessionLocal, async_engine, engine
+from . import idempotency, schema
+from .http_cache import ConditionalGetMiddleware
+from .logging_config import configure_logging
+from .routers import achievements, auth, gratitude, habits, metrics, mood, reports, users
+from .seed_achievements import ensure_achievement_seed
+from .services import (
+    achievement_catalog,
+    achievement_events,
+    image_variants,
+    password_hashing,
+    storage,
+    uploads,
+)
 
 # Set Bangkok timezone
 os.environ['TZ'] = 'Asia/Bangkok'
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
+def init_database():
+    """
+    Bring the schema, the achievement seed and the upload reference backfill
+    up to date only if their versions changed (one marker lookup when all are
+    current), then load
+    the catalog. Expired idempotency keys are purged by python -m app.idempotency.
+    """
+    versions = schema.read_versions(engine)
+    if schema.ensure_schema(engine, versions):
+        logger.info("Database schema applied")
+    db = SessionLocal()
+    try:
+        if ensure_achievement_seed(db, versions):
+            logger.info("Achievement seed applied")
+        if uploads.ensure_references(db, versions):
+            logger.info("Upload references backfilled")
+        catalog = achievement_catalog.load(db)
+        logger.info("Achievement catalog loaded: %d achievements", len(catalog.achievements))
+    finally:
+        db.close()
+
+
 # Startup event
 async def startup_event():
-    print("Starting BloomUp API")
-    print("Timezone: Asia/Bangkok (UTC+7)")
-    seed_achievements()
+    logger.info("Starting BloomUp API")
+    logger.info("Timezone: Asia/Bangkok (UTC+7)")
+    init_database()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await startup_event()
+
+    # Background achievement evaluation (see services/achievement_events.py)
+    stop_worker = asyncio.Event()
+    worker = None
+    if achievement_events.WORKER_ENABLED:
+        worker = asyncio.create_task(achievement_events.run_worker(stop_worker))
+
     yield
+
     # Shutdown
-    pass
+    stop_worker.set()
+    if worker is not None:
+        await worker
+    await async_engine.dispose()
+    password_hashing.shutdown()
+    image_variants.shutdown()
 
 
 app = FastAPI(title="BloomUp API", lifespan=lifespan)
 
-Base.metadata.create_all(bind=engine)
+# ETag / Last-Modified / Cache-Control on conditional GET routes (see http_cache.py)
+app.add_middleware(ConditionalGetMiddleware)
 
 # CORS - MUST be before other middleware
 app.add_middleware(
@@ -51,14 +102,20 @@ app.add_middleware(
         "X-User-ID",
         "Accept",
         "Origin",
+        idempotency.HEADER,
     ],
     expose_headers=["*"],
     max_age=600,
 )
 
-# serve uploaded files
-os.makedirs("uploads", exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# serve uploaded files (local storage backend; also keeps files uploaded
+# before a switch to S3 reachable)
+os.makedirs(storage.UPLOAD_ROOT, exist_ok=True)
+app.mount(
+    storage.UPLOAD_URL_PREFIX,
+    image_variants.VariantStaticFiles(directory=storage.UPLOAD_ROOT),
+    name="uploads",
+)
 
 
 @app.get("/")
@@ -80,4 +137,6 @@ app.include_router(users.router)
 app.include_router(habits.router)
 app.include_router(gratitude.router)
 app.include_router(mood.router)
-app.include_router(achievements.router)
\ No newline at end of file
+app.include_router(achievements.router)
+app.include_router(reports.router)
+app.include_router(metrics.router)
\ No newline at end of file
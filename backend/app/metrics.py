@@ -0,0 +1,121 @@
+"""
+Minimal in-process metrics (counters and latency histograms).
+
+Values are per process; with several workers each one reports its own.
+Exposed as JSON by routers/metrics.py.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, Sequence
+
+# Upper bounds in seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Monotonically increasing count."""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = 0
+
+    def snapshot(self) -> int:
+        return self._value
+
+
+class Histogram:
+    """Cumulative bucketed observations, Prometheus style."""
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+            self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, observed, maximum = self._sum, self._count, self._max
+
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = observed
+        return {
+            "count": observed,
+            "sum": round(total, 6),
+            "avg": round(total / observed, 6) if observed else 0.0,
+            "max": round(maximum, 6),
+            "buckets": buckets,
+        }
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, description: str = "") -> Counter:
+    """Get or create a process-wide counter."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, description)
+        return _registry[name]
+
+
+def histogram(name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Get or create a process-wide histogram."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, description, buckets)
+        return _registry[name]
+
+
+def snapshot(prefix: str = "") -> Dict:
+    """Current values of all metrics whose name starts with prefix."""
+    with _registry_lock:
+        metrics = [m for name, m in _registry.items() if name.startswith(prefix)]
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+
+def reset(prefix: str = ""):
+    """Zero metrics whose name starts with prefix (tests, manual resets)."""
+    with _registry_lock:
+        metrics = [m for name, m in _registry.items() if name.startswith(prefix)]
+    for metric in metrics:
+        metric.reset()
@@ -4,6 +4,7 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -71,6 +72,52 @@ class User(Base):
         cascade="all, delete-orphan",
     )
 
+    # User ↔ AchievementEvent
+    achievement_events = relationship(
+        "AchievementEvent",
+        cascade="all, delete-orphan",
+    )
+
+    # User ↔ UserStreak
+    streak = relationship(
+        "UserStreak",
+        back_populates="user",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+    # User ↔ DailyUserRollup
+    daily_rollups = relationship(
+        "DailyUserRollup",
+        cascade="all, delete-orphan",
+    )
+
+    # User ↔ ResourceVersion
+    resource_versions = relationship(
+        "ResourceVersion",
+        cascade="all, delete-orphan",
+    )
+
+    # User ↔ IdempotencyKey
+    idempotency_keys = relationship(
+        "IdempotencyKey",
+        cascade="all, delete-orphan",
+    )
+
+    # User ↔ UserTokenVersion
+    token_version = relationship(
+        "UserTokenVersion",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+    # Storage key of the avatar, kept by services/uploads.py
+    avatar_reference = relationship(
+        "UploadReference",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
 
 class HabitCategory(Base):
     """Categories for habits with custom colors"""
@@ -152,6 +199,14 @@ class Habit(Base):
         cascade="all, delete-orphan",
     )
 
+    # Habit ↔ HabitStreak
+    streak = relationship(
+        "HabitStreak",
+        back_populates="habit",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
 
 class HabitCompletion(Base):
     __tablename__ = "habit_completions"
@@ -239,6 +294,71 @@ class HabitSession(Base):
     )
 
 
+class HabitStreak(Base):
+    """Streak state for one habit, maintained incrementally on (un)completion"""
+    __tablename__ = "habit_streaks"
+
+    habit_id = Column(
+        Integer,
+        ForeignKey("habits.habit_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    # Length of the run of consecutive days ending on last_completed_on
+    current_streak = Column(Integer, nullable=False, default=0)
+    best_streak = Column(Integer, nullable=False, default=0)
+    last_completed_on = Column(Date, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    habit = relationship(
+        "Habit",
+        back_populates="streak",
+    )
+
+
+class UserStreak(Base):
+    """Streak state across all of a user's habits (a day counts if any habit was completed)"""
+    __tablename__ = "user_streaks"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # Length of the run of consecutive days ending on last_completed_on
+    current_streak = Column(Integer, nullable=False, default=0)
+    best_streak = Column(Integer, nullable=False, default=0)
+    last_completed_on = Column(Date, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    user = relationship(
+        "User",
+        back_populates="streak",
+    )
+
+
+class DailyUserRollup(Base):
+    """Per-user, per-day totals for reports, maintained incrementally by the write paths"""
+    __tablename__ = "daily_user_rollup"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day = Column(Date, primary_key=True)
+    completions = Column(Integer, nullable=False, default=0)
+    planned_seconds = Column(Integer, nullable=False, default=0)
+    actual_seconds = Column(Integer, nullable=False, default=0)
+    sessions_done = Column(Integer, nullable=False, default=0)
+    mood_score = Column(Integer, nullable=True)
+
+
 class GratitudeEntry(Base):
     __tablename__ = "gratitude_entries"
 
@@ -260,6 +380,18 @@ class GratitudeEntry(Base):
         back_populates="gratitude_entries",
     )
 
+    # Storage key of the image, kept by services/uploads.py
+    image_reference = relationship(
+        "UploadReference",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
+
+    # Keyset pagination of a user's jar, newest first
+    __table_args__ = (
+        Index("ix_gratitude_user_created", "user_id", "created_at", "gratitude_id"),
+    )
+
 
 class MoodLog(Base):
     __tablename__ = "mood_logs"
@@ -354,4 +486,106 @@ class UserAchievement(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "achievement_id", name="uq_user_achievement"),
-    )
\ No newline at end of file
+    )
+
+class AchievementEvent(Base):
+    """Outbox of domain events awaiting achievement evaluation"""
+    __tablename__ = "achievement_events"
+
+    event_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    event_type = Column(String(50), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class AchievementEventFailure(Base):
+    """Failed evaluation attempts of an outbox event; at the limit the worker skips it"""
+    __tablename__ = "achievement_event_failures"
+
+    event_id = Column(
+        Integer,
+        ForeignKey("achievement_events.event_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    failed_at = Column(DateTime, nullable=False)
+
+
+class SeedVersion(Base):
+    """Version marker for reference data applied by a seed (e.g. achievements)"""
+    __tablename__ = "seed_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class ResourceVersion(Base):
+    """Per-user change counter for a group of read endpoints, used as the HTTP cache validator"""
+    __tablename__ = "resource_versions"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    resource = Column(String(32), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class IdempotencyKey(Base):
+    """Outcome of a write sent with an Idempotency-Key header, replayed to retries"""
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    key = Column(String(255), primary_key=True)
+    # Hash of the endpoint and request body the key was first used with
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer)
+    response_body = Column(Text)
+    created_at = Column(DateTime, nullable=False, index=True)
+
+
+class UserTokenVersion(Base):
+    """Per-user token version; bumping it revokes every access token issued before"""
+    __tablename__ = "user_token_versions"
+
+    user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # Users without a row are at version 0
+    version = Column(Integer, nullable=False, default=0)
+
+
+class UploadReference(Base):
+    """Storage key of an upload used by a gratitude entry or an avatar (one owner per row)"""
+    __tablename__ = "upload_references"
+
+    reference_id = Column(Integer, primary_key=True)
+    # Equality lookups from uploads.is_referenced()
+    key = Column(String, nullable=False, index=True)
+    gratitude_id = Column(
+        Integer,
+        ForeignKey("gratitude_entries.gratitude_id", ondelete="CASCADE"),
+        unique=True,
+        nullable=True,
+    )
+    avatar_user_id = Column(
+        Integer,
+        ForeignKey("users.user_id", ondelete="CASCADE"),
+        unique=True,
+        nullable=True,
+    )
@@ -1,120 +1,141 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
 from .. import crud, models, schemas
-from ..db import get_db
-from ..security import get_current_email
+from ..db import get_async_db, get_db
+from ..http_cache import check_conditional, make_etag, user_resource
+from ..security import (
+    Principal,
+    get_current_principal,
+    get_current_principal_async,
+)
+from ..services import achievement_catalog, resource_versions
 
 router = APIRouter(prefix="/achievements", tags=["achievements"])
 
 
+async def current_catalog(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> achievement_catalog.Catalog:
+    """
+    The in-memory catalog, with conditional GET on its seed version. The
+    catalog only changes when a new seed is applied, so responses may be
+    cached for ACHIEVEMENT_CATALOG_MAX_AGE and revalidated by ETag after that.
+    """
+    catalog = await achievement_catalog.get_catalog(db)
+    etag = make_etag(request, "catalog", (catalog.version or "0")[:16], daily=False)
+    check_conditional(
+        request,
+        etag,
+        None,
+        cache_control=f"public, max-age={achievement_catalog.MAX_AGE_SECONDS}",
+        vary=None,
+    )
+    return catalog
+
+
 @router.get("", response_model=List[schemas.AchievementOut])
-def list_achievements(db: Session = Depends(get_db)):
+async def list_achievements(
+    catalog: achievement_catalog.Catalog = Depends(current_catalog),
+):
     """Get all available achievements"""
-    achievements = db.query(models.Achievement).all()
-    return achievements
+    return Response(content=catalog.list_json, media_type="application/json")
 
 
 @router.get("/{achievement_id}", response_model=schemas.AchievementOut)
-def get_achievement(achievement_id: int, db: Session = Depends(get_db)):
+async def get_achievement(
+    achievement_id: int,
+    catalog: achievement_catalog.Catalog = Depends(current_catalog),
+):
     """Get a specific achievement by ID"""
-    achievement = (
-        db.query(models.Achievement)
-        .filter(models.Achievement.achievement_id == achievement_id)
-        .first()
-    )
+    achievement = catalog.by_id.get(achievement_id)
     if not achievement:
         raise HTTPException(status_code=404, detail="Achievement not found")
     return achievement
 
 
 @router.get("/by-key/{key_name}", response_model=schemas.AchievementOut)
-def get_achievement_by_key(key_name: str, db: Session = Depends(get_db)):
+async def get_achievement_by_key(
+    key_name: str,
+    catalog: achievement_catalog.Catalog = Depends(current_catalog),
+):
     """Get a specific achievement by key name"""
-    achievement = (
-        db.query(models.Achievement)
-        .filter(models.Achievement.key_name == key_name)
-        .first()
-    )
+    achievement = catalog.by_key.get(key_name)
     if not achievement:
         raise HTTPException(status_code=404, detail="Achievement not found")
     return achievement
 
 
-@router.get("/user/all", response_model=List[schemas.UserAchievementSummary])
-def get_user_achievements(
-    db: Session = Depends(get_db), email: str = Depends(get_current_email)
-):
-    """Get all achievements for the current user with progress"""
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Use joinedload to eager load the achievement relationship
-    from sqlalchemy.orm import joinedload
-
-    user_achievements = (
-        db.query(models.UserAchievement)
-        .options(joinedload(models.UserAchievement.achievement))
-        .filter(models.UserAchievement.user_id == user.user_id)
-        .all()
-    )
+async def _user_achievement_summaries(
+    db: AsyncSession, user_id: int, earned_only: bool = False
+) -> List[schemas.UserAchievementSummary]:
+    UA = models.UserAchievement
+    query = select(
+        UA.achievement_id,
+        UA.is_earned,
+        UA.earned_date,
+        UA.progress,
+        UA.progress_unit_value,
+    ).where(UA.user_id == user_id)
+    if earned_only:
+        query = query.where(UA.is_earned == True)  # noqa: E712
+    rows = (await db.execute(query)).all()
+
+    # Titles, icons and points come from the in-memory catalog
+    catalog = await achievement_catalog.get_catalog(db)
+    if any(row.achievement_id not in catalog.by_id for row in rows):
+        catalog = await achievement_catalog.get_catalog(db, refresh=True)
 
     summaries = []
-    for ua in user_achievements:
-        summary = schemas.UserAchievementSummary(
-            achievement_id=ua.achievement_id,
-            title=ua.achievement.title,
-            description=ua.achievement.description,
-            icon=ua.achievement.icon,
-            points=ua.achievement.points,
-            is_earned=ua.is_earned,
-            earned_date=ua.earned_date,
-            progress=ua.progress,
-            progress_unit_value=ua.progress_unit_value,
+    for row in rows:
+        achievement = catalog.by_id.get(row.achievement_id)
+        if achievement is None:
+            continue
+        summaries.append(
+            schemas.UserAchievementSummary(
+                achievement_id=row.achievement_id,
+                title=achievement.title,
+                description=achievement.description,
+                icon=achievement.icon,
+                points=achievement.points,
+                is_earned=row.is_earned,
+                earned_date=row.earned_date,
+                progress=row.progress,
+                progress_unit_value=row.progress_unit_value,
+            )
         )
-        summaries.append(summary)
-
     return summaries
 
 
-@router.get("/user/earned", response_model=List[schemas.UserAchievementSummary])
-def get_earned_achievements(
-    db: Session = Depends(get_db), email: str = Depends(get_current_email)
+@router.get(
+    "/user/all",
+    response_model=List[schemas.UserAchievementSummary],
+    dependencies=[Depends(user_resource(resource_versions.ACHIEVEMENTS))],
+)
+async def get_user_achievements(
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_current_principal_async),
 ):
-    """Get only earned achievements for the current user"""
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    user_achievements = (
-        db.query(models.UserAchievement)
-        .filter(
-            models.UserAchievement.user_id == user.user_id,
-            models.UserAchievement.is_earned == True,
-        )
-        .all()
-    )
+    """Get all achievements for the current user with progress"""
+    return await _user_achievement_summaries(db, principal.user_id)
 
-    summaries = []
-    for ua in user_achievements:
-        summary = schemas.UserAchievementSummary(
-            achievement_id=ua.achievement_id,
-            title=ua.achievement.title,
-            description=ua.achievement.description,
-            icon=ua.achievement.icon,
-            points=ua.achievement.points,
-            is_earned=ua.is_earned,
-            earned_date=ua.earned_date,
-            progress=ua.progress,
-            progress_unit_value=ua.progress_unit_value,
-        )
-        summaries.append(summary)
 
-    return summaries
+@router.get(
+    "/user/earned",
+    response_model=List[schemas.UserAchievementSummary],
+    dependencies=[Depends(user_resource(resource_versions.ACHIEVEMENTS))],
+)
+async def get_earned_achievements(
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_current_principal_async),
+):
+    """Get only earned achievements for the current user"""
+    return await _user_achievement_summaries(db, principal.user_id, earned_only=True)
 
 
 @router.post(
@@ -125,13 +146,9 @@ def update_achievement_progress(
     progress: int = Query(..., ge=0, le=100),
     progress_unit_value: int = Query(0),
     db: Session = Depends(get_db),
-    email: str = Depends(get_current_email),
+    principal: Principal = Depends(get_current_principal),
 ):
     """Update progress for a specific achievement"""
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     achievement = (
         db.query(models.Achievement)
         .filter(models.Achievement.achievement_id == achievement_id)
@@ -143,7 +160,7 @@ def update_achievement_progress(
     user_achievement = (
         db.query(models.UserAchievement)
         .filter(
-            models.UserAchievement.user_id == user.user_id,
+            models.UserAchievement.user_id == principal.user_id,
             models.UserAchievement.achievement_id == achievement_id,
         )
         .first()
@@ -151,7 +168,7 @@ def update_achievement_progress(
 
     if not user_achievement:
         user_achievement = models.UserAchievement(
-            user_id=user.user_id,
+            user_id=principal.user_id,
             achievement_id=achievement_id,
             progress=progress,
             progress_unit_value=progress_unit_value,
@@ -165,6 +182,7 @@ def update_achievement_progress(
         user_achievement.is_earned = True
         user_achievement.earned_date = func.now()
 
+    resource_versions.bump(db, principal.user_id, resource_versions.ACHIEVEMENTS)
     db.commit()
     db.refresh(user_achievement)
     return user_achievement
@@ -174,13 +192,9 @@ def update_achievement_progress(
 def earn_achievement(
     achievement_id: int,
     db: Session = Depends(get_db),
-    email: str = Depends(get_current_email),
+    principal: Principal = Depends(get_current_principal),
 ):
     """Manually mark an achievement as earned"""
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
     achievement = (
         db.query(models.Achievement)
         .filter(models.Achievement.achievement_id == achievement_id)
@@ -192,7 +206,7 @@ def earn_achievement(
     user_achievement = (
         db.query(models.UserAchievement)
         .filter(
-            models.UserAchievement.user_id == user.user_id,
+            models.UserAchievement.user_id == principal.user_id,
             models.UserAchievement.achievement_id == achievement_id,
         )
         .first()
@@ -200,7 +214,7 @@ def earn_achievement(
 
     if not user_achievement:
         user_achievement = models.UserAchievement(
-            user_id=user.user_id,
+            user_id=principal.user_id,
             achievement_id=achievement_id,
             is_earned=True,
             earned_date=func.now(),
@@ -213,6 +227,7 @@ def earn_achievement(
         user_achievement.earned_date = func.now()
         user_achievement.progress = 100
 
+    resource_versions.bump(db, principal.user_id, resource_versions.ACHIEVEMENTS)
     db.commit()
     db.refresh(user_achievement)
     return user_achievement
\ No newline at end of file
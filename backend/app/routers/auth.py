@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from google.auth.transport import requests as google_requests
 from google.oauth2 import id_token
 import os
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import create_access_token, hash_password, verify_password
+from ..db import get_async_db, get_db
+from ..security import UNUSABLE_PASSWORD, create_access_token, token_version_query
+from ..services import password_hashing
 from ..services.achievement_checker import (
     check_all_achievements,
     initialize_user_achievements,
@@ -34,16 +37,19 @@ def create_default_categories(db: Session, user_id: int):
         db.add(category)
     db.commit()
 
-@router.post("/signup", response_model=schemas.UserOut)
-def signup(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.email == payload.email).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in attempts right now, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _create_user(db: Session, payload: schemas.UserCreate, password_hash: str) -> models.User:
     user = models.User(
         email=payload.email,
         name=payload.name,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         bio=payload.bio,
         profile_picture=payload.profile_picture,
     )
@@ -60,15 +66,52 @@ def signup(payload: schemas.UserCreate, db: Session = Depends(get_db)):
     # Check all achievements to calculate initial progress
     check_all_achievements(db, user.user_id)
 
+    db.refresh(user)
     return user
 
 
+@router.post("/signup", response_model=schemas.UserOut)
+async def signup(payload: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(
+        select(models.User.user_id).where(models.User.email == payload.email)
+    )
+    if existing:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    # bcrypt runs on the dedicated hashing pool, not the request threadpool
+    try:
+        password_hash = await password_hashing.hash_password_async(payload.password)
+    except password_hashing.PasswordHashingBusy:
+        raise _hashing_busy()
+
+    return await db.run_sync(_create_user, payload, password_hash)
+
+
 @router.post("/login", response_model=schemas.Token)
-def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(models.User).where(models.User.email == payload.email))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    try:
+        valid, new_hash = await password_hashing.verify_and_update_async(
+            payload.password, user.password_hash
+        )
+    except password_hashing.PasswordHashingBusy:
+        raise _hashing_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    token = create_access_token(subject=user.email)
+
+    # Transparently upgrade hashes made with an older work factor
+    if new_hash is not None:
+        user.password_hash = new_hash
+        await db.commit()
+
+    token_version = (await db.execute(token_version_query(user.user_id))).one()[1]
+    token = create_access_token(
+        subject=user.email, user_id=user.user_id, token_version=token_version
+    )
     return {"token": token, "token_type": "bearer"}
 
 @router.post("/google-login", response_model=schemas.Token)
@@ -104,7 +147,7 @@ def google_login(payload: dict, db: Session = Depends(get_db)):
             user = models.User(
                 email=email,
                 name=name,
-                password_hash=hash_password(os.urandom(32).hex()),  # Random password
+                password_hash=UNUSABLE_PASSWORD,  # Google accounts sign in without a password
                 profile_picture=picture,
                 bio="",
             )
@@ -120,7 +163,10 @@ def google_login(payload: dict, db: Session = Depends(get_db)):
             check_all_achievements(db, user.user_id)
         
         # Create access token
-        token = create_access_token(subject=user.email)
+        token_version = db.execute(token_version_query(user.user_id)).one()[1]
+        token = create_access_token(
+            subject=user.email, user_id=user.user_id, token_version=token_version
+        )
         return {"token": token, "token_type": "bearer"}
     
     except ValueError as e:
@@ -1,61 +1,134 @@
-from typing import List
-import os
-import uuid
+from datetime import date, datetime
+from typing import List, Optional
+import json
+import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, UploadFile, File, status, Form
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .. import crud, models, schemas
-from ..db import get_db
-from ..security import get_current_user
-from ..services.achievement_checker import check_gratitude_achievements
+from ..db import get_async_db, get_db
+from ..http_cache import user_resource
+from ..security import Principal, get_current_principal_async, get_current_user
+from ..services import achievement_events, resource_versions, uploads
+from ..utils.cursor import decode_cursor, encode_cursor
 
-router = APIRouter(prefix="/gratitude", tags=["Gratitude"])
+logger = logging.getLogger(__name__)
 
-# Ensure uploads directory exists
-UPLOAD_DIR = "uploads/gratitude"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+router = APIRouter(prefix="/gratitude", tags=["Gratitude"])
 
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Rows fetched per query while streaming an export
+EXPORT_BATCH_SIZE = 500
 
 
-def allowed_file(filename: str) -> bool:
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+@router.get(
+    "/",
+    response_model=List[dict],
+    dependencies=[Depends(user_resource(resource_versions.GRATITUDE))],
+)
+async def list_gratitude_entries(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
+):
+    """Get all gratitude entries for the authenticated user."""
+    return await db.run_sync(crud.get_user_gratitude_entries, current_user.user_id)
 
 
-def save_upload_file(file: UploadFile) -> str:
-    """Save uploaded file and return the relative path."""
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
     try:
-        if file.size > MAX_FILE_SIZE:
-            raise ValueError(f"File size exceeds {MAX_FILE_SIZE / 1024 / 1024}MB limit")
-        
-        if not allowed_file(file.filename):
-            raise ValueError("File type not allowed")
-        
-        # Generate unique filename
-        ext = file.filename.rsplit(".", 1)[1].lower()
-        unique_filename = f"{uuid.uuid4()}.{ext}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            buffer.write(file.file.read())
-        
-        # Return relative path for frontend to access via /uploads/
-        return f"/uploads/gratitude/{unique_filename}"
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"File upload failed: {str(e)}")
-
-
-@router.get("/", response_model=List[dict])
-def list_gratitude_entries(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+        created_at, entry_id = decode_cursor(cursor)
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _check_range(start_date: Optional[date], end_date: Optional[date]):
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+
+@router.get(
+    "/page",
+    response_model=schemas.GratitudePage,
+    dependencies=[Depends(user_resource(resource_versions.GRATITUDE))],
+)
+async def list_gratitude_page(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    category: Optional[str] = None,
+    start_date: Optional[date] = Query(None, alias="from"),
+    end_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
-    """Get all gratitude entries for the authenticated user."""
-    return crud.get_user_gratitude_entries(db, current_user.user_id)
+    """Gratitude entries newest first, one keyset page at a time."""
+    _check_range(start_date, end_date)
+    items, next_after = await db.run_sync(
+        crud.get_gratitude_page,
+        current_user.user_id,
+        after=_parse_cursor(cursor),
+        limit=limit,
+        category=category,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    next_cursor = None
+    if next_after is not None:
+        created_at, entry_id = next_after
+        next_cursor = encode_cursor(created_at.isoformat(), entry_id)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/export.ndjson",
+    dependencies=[Depends(user_resource(resource_versions.GRATITUDE))],
+)
+async def export_gratitude_entries(
+    category: Optional[str] = None,
+    start_date: Optional[date] = Query(None, alias="from"),
+    end_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
+):
+    """
+    Every matching gratitude entry as newline-delimited JSON, newest first.
+    Streamed in keyset batches so memory stays flat however large the jar is.
+    """
+    _check_range(start_date, end_date)
+    user_id = current_user.user_id
+    # The request's session is closed before the body is streamed
+    bind = db.bind
+
+    async def lines():
+        async with AsyncSession(bind=bind, expire_on_commit=False) as export_db:
+            after = None
+            while True:
+                items, after = await export_db.run_sync(
+                    crud.get_gratitude_page,
+                    user_id,
+                    after=after,
+                    limit=EXPORT_BATCH_SIZE,
+                    category=category,
+                    start_date=start_date,
+                    end_date=end_date,
+                )
+                if items:
+                    yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+                if after is None:
+                    break
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="gratitude.ndjson"'},
+    )
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -64,16 +137,19 @@ def create_gratitude_entry(
     category: str = Form(""),
     file: UploadFile = File(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Create a new gratitude entry with optional image."""
     if not text.strip():
         raise HTTPException(status_code=422, detail="Gratitude text cannot be empty")
 
-    # Handle image upload
+    # Handle image upload (streamed to disk; this route already runs on the threadpool)
     image_url = None
     if file:
-        image_url = save_upload_file(file)
+        try:
+            image_url = uploads.store_upload(file.file, uploads.MAX_GRATITUDE_IMAGE_BYTES)
+        except uploads.UploadRejected as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
 
     result = crud.create_gratitude_entry(
         db,
@@ -83,8 +159,9 @@ def create_gratitude_entry(
         image_url=image_url,
     )
 
-    # Check achievements after creating entry
-    check_gratitude_achievements(db, current_user.user_id)
+    # Queue achievement evaluation for the background worker
+    achievement_events.emit(db, current_user.user_id, achievement_events.GRATITUDE_CHANGED)
+    db.commit()
 
     return result
 
@@ -93,9 +170,9 @@ def create_gratitude_entry(
 def delete_gratitude_entry(
     entry_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    """Delete a gratitude entry and its image if exists."""
+    """Delete a gratitude entry and its image if no longer used."""
     # Get entry first to retrieve image_url for deletion
     entry = (
         db.query(models.GratitudeEntry)
@@ -111,21 +188,19 @@ def delete_gratitude_entry(
             status_code=404, detail="Gratitude entry not found or not owned by user"
         )
 
-    # Delete image file if exists
-    if entry.image_url:
-        try:
-            # Convert URL path to file path
-            file_path = entry.image_url.lstrip("/")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            print(f"Warning: Could not delete image file: {e}")
+    image_url = entry.image_url
 
-    # Delete entry from database
+    # Delete entry from database and queue achievement evaluation
     db.delete(entry)
+    achievement_events.emit(db, current_user.user_id, achievement_events.GRATITUDE_CHANGED)
+    resource_versions.bump(db, current_user.user_id, resource_versions.GRATITUDE)
     db.commit()
 
-    # Check achievements after deleting entry
-    check_gratitude_achievements(db, current_user.user_id)
+    # Delete the image once no other entry or avatar shares it
+    if image_url:
+        try:
+            uploads.release(db, image_url)
+        except Exception as e:
+            logger.warning("Could not delete image file %s: %s", image_url, e)
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -1,29 +1,47 @@
-from datetime import date, datetime
+import logging
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
-
-from .. import crud, models, schemas
-from ..db import get_db
-from ..security import get_current_user
-from ..services.achievement_checker import (
-    check_habit_achievements,
-    check_streak_achievements,
-)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from .. import crud, idempotency, models, schemas
+from ..db import get_async_db, get_db
+from ..http_cache import user_resource
+from ..security import Principal, get_current_principal_async, get_current_user
+from ..services import achievement_events, resource_versions, rollups, streaks
 from ..utils.timezone_utils import get_bangkok_today, get_bangkok_now
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/habits", tags=["Habits"])
 
 
-def _user_id(u: models.User) -> int:
-    """Extract the integer user_id from the authenticated User object."""
+def _user_id(u: Principal) -> int:
+    """Extract the integer user_id from the authenticated principal."""
     user_id = getattr(u, "user_id", None)
     if user_id is None:
         raise HTTPException(status_code=500, detail="Authenticated user lacks user_id")
     return user_id
 
+def _history_window(
+    start_date: Optional[date], end_date: Optional[date], days: Optional[int]
+):
+    """Resolve the from/to/days query parameters into a (start, end) window."""
+    if days is not None:
+        if start_date is not None:
+            raise HTTPException(status_code=400, detail="Use either 'from' or 'days', not both")
+        end_date = end_date or get_bangkok_today()
+        start_date = end_date - timedelta(days=days - 1)
+
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return start_date, end_date
+
+
 def calculate_session_status(actual_duration: int, planned_duration: int) -> str:
     """
     Calculate session status based on actual vs planned duration.
@@ -40,27 +58,30 @@ def calculate_session_status(actual_duration: int, planned_duration: int) -> str
 
 
 # Category Routes
-@router.get("/categories", response_model=List[schemas.HabitCategoryOut])
-def list_categories(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.get(
+    "/categories",
+    response_model=List[schemas.HabitCategoryOut],
+    dependencies=[Depends(user_resource(resource_versions.HABITS))],
+)
+async def list_categories(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get all categories for the authenticated user"""
     user_id = _user_id(current_user)
-    categories = (
-        db.query(models.HabitCategory)
-        .filter(models.HabitCategory.user_id == user_id)
+    result = await db.execute(
+        select(models.HabitCategory)
+        .where(models.HabitCategory.user_id == user_id)
         .order_by(models.HabitCategory.category_name)
-        .all()
     )
-    return categories
+    return result.scalars().all()
 
 
 @router.post("/categories", response_model=schemas.HabitCategoryOut, status_code=status.HTTP_201_CREATED)
 def create_category(
     payload: schemas.HabitCategoryCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Create a new category"""
     user_id = _user_id(current_user)
@@ -84,6 +105,7 @@ def create_category(
         color=payload.color,
     )
     db.add(category)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     db.refresh(category)
     return category
@@ -94,7 +116,7 @@ def update_category(
     category_id: int,
     payload: schemas.HabitCategoryUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Update a category"""
     user_id = _user_id(current_user)
@@ -116,6 +138,7 @@ def update_category(
     if payload.color is not None:
         category.color = payload.color
     
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     db.refresh(category)
     return category
@@ -125,7 +148,7 @@ def update_category(
 def delete_category(
     category_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Delete a category"""
     user_id = _user_id(current_user)
@@ -148,40 +171,85 @@ def delete_category(
     ).update({"category_id": None})
     
     db.delete(category)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # Habit Routes
-@router.get("/", response_model=List[schemas.HabitOut])
-def list_habits(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """Get all habits for the authenticated user with categories and sessions"""
-    user_id = _user_id(current_user)
-    
-    # Use joinedload to eagerly load category
-    habits = (
+def _load_habit_responses(
+    db: Session,
+    user_id: int,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    habit_id: Optional[int] = None,
+) -> List[dict]:
+    """Load habits with category, windowed completions and sessions, as response dicts."""
+    # Category is many-to-one, so joining it adds no rows. Each collection is
+    # loaded with its own IN-query to avoid a completions x sessions product.
+    query = (
         db.query(models.Habit)
         .options(
-            joinedload(models.Habit.category),  
-            joinedload(models.Habit.completions),  
-            joinedload(models.Habit.sessions),  
+            joinedload(models.Habit.category),
+            selectinload(crud.completions_in_window(start_date, end_date)),
+            selectinload(models.Habit.sessions),
         )
         .filter(models.Habit.user_id == user_id)
-        .order_by(models.Habit.habit_id.asc())
+    )
+    if habit_id is not None:
+        query = query.filter(models.Habit.habit_id == habit_id)
+
+    habits = (
+        query.order_by(models.Habit.habit_id.asc())
+        .execution_options(populate_existing=True)
         .all()
     )
-    
     return [_build_habit_response(h) for h in habits]
 
 
+@router.get(
+    "/",
+    response_model=List[schemas.HabitOut],
+    dependencies=[Depends(user_resource(resource_versions.HABITS))],
+)
+async def list_habits(
+    start_date: Optional[date] = Query(None, alias="from", description="History window start (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, alias="to", description="History window end (YYYY-MM-DD)"),
+    days: Optional[int] = Query(None, ge=1, le=3660, description="History window of the last N days"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
+):
+    """Get all habits for the authenticated user with categories and sessions"""
+    user_id = _user_id(current_user)
+    start_date, end_date = _history_window(start_date, end_date, days)
+    
+    return await db.run_sync(_load_habit_responses, user_id, start_date, end_date)
+
+
+@router.get(
+    "/bulk",
+    response_model=schemas.HabitBulkPage,
+    dependencies=[Depends(user_resource(resource_versions.HABITS))],
+)
+async def list_habits_bulk(
+    after_id: Optional[int] = Query(None, ge=0, description="Return habits with habit_id greater than this cursor"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
+):
+    """Lightweight, keyset-paginated habit list for dashboards"""
+    user_id = _user_id(current_user)
+    items, next_after_id = await db.run_sync(
+        crud.get_habit_bulk_page, user_id, after_id=after_id, limit=limit
+    )
+    return {"items": items, "next_after_id": next_after_id}
+
+
 @router.post("/", response_model=schemas.HabitOut, status_code=status.HTTP_201_CREATED)
 def create_habit(
     payload: schemas.HabitCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Create a new habit"""
     user_id = _user_id(current_user)
@@ -238,41 +306,41 @@ def create_habit(
         best_streak=0,)
     
     db.add(habit)
+    achievement_events.emit(db, user_id, achievement_events.HABITS_CHANGED)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     db.refresh(habit)
     db.refresh(habit, attribute_names=["completions", "sessions", "category"])
     
-    # Check achievements
-    check_habit_achievements(db, user_id)
-    
     return _build_habit_response(habit)
 
 
-@router.get("/{habit_id}", response_model=schemas.HabitOut)
-def get_habit(
+@router.get(
+    "/{habit_id}",
+    response_model=schemas.HabitOut,
+    dependencies=[Depends(user_resource(resource_versions.HABITS))],
+)
+async def get_habit(
     habit_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    start_date: Optional[date] = Query(None, alias="from", description="History window start (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, alias="to", description="History window end (YYYY-MM-DD)"),
+    days: Optional[int] = Query(None, ge=1, le=3660, description="History window of the last N days"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get a specific habit"""
     user_id = _user_id(current_user)
+    start_date, end_date = _history_window(start_date, end_date, days)
     
-    # Use joinedload to eagerly load category
-    habit = (
-        db.query(models.Habit)
-        .options(
-            joinedload(models.Habit.category),  
-            joinedload(models.Habit.completions),  
-            joinedload(models.Habit.sessions),
-        )
-        .filter(models.Habit.habit_id == habit_id, models.Habit.user_id == user_id)
-        .first()
+    # Same loading strategy as list_habits: no collection fan-out
+    habits = await db.run_sync(
+        _load_habit_responses, user_id, start_date, end_date, habit_id=habit_id
     )
     
-    if not habit:
+    if not habits:
         raise HTTPException(status_code=404, detail="Habit not found or not owned by user")
     
-    return _build_habit_response(habit)
+    return habits[0]
 
 
 @router.put("/{habit_id}", response_model=schemas.HabitOut)
@@ -280,7 +348,7 @@ def update_habit(
     habit_id: int,
     payload: schemas.HabitUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Update a habit"""
     user_id = _user_id(current_user)
@@ -316,8 +384,11 @@ def update_habit(
     if payload.description is not None:
         habit.description = payload.description
     if payload.is_active is not None:
+        if payload.is_active != habit.is_active:
+            achievement_events.emit(db, user_id, achievement_events.HABITS_CHANGED)
         habit.is_active = payload.is_active
     
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     db.refresh(habit, attribute_names=["completions", "sessions", "category"])
     
@@ -329,7 +400,7 @@ def update_habit(
 def delete_habit(
     habit_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Delete a habit"""
     user_id = _user_id(current_user)
@@ -342,43 +413,54 @@ def delete_habit(
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found or not owned by user")
     
+    days = rollups.habit_days(db, habit_id)
     db.delete(habit)
+    db.flush()
+    # Its completions are gone, so the user-level streak may have shrunk
+    streaks.rebuild_user_streak(db, user_id)
+    rollups.rebuild_days(db, user_id, days)
+    achievement_events.emit(db, user_id, achievement_events.HABITS_CHANGED)
+    achievement_events.emit(db, user_id, achievement_events.COMPLETIONS_CHANGED)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     
-    check_habit_achievements(db, user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # Habit Session Routes
-@router.get("/{habit_id}/sessions", response_model=List[schemas.HabitSessionOut])
-def get_habit_sessions(
+@router.get(
+    "/{habit_id}/sessions",
+    response_model=List[schemas.HabitSessionOut],
+    dependencies=[Depends(user_resource(resource_versions.HABITS))],
+)
+async def get_habit_sessions(
     habit_id: int,
     date_filter: Optional[date] = Query(None, description="Filter by date"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get all sessions for a habit"""
     user_id = _user_id(current_user)
     
     # Verify habit exists
-    habit = (
-        db.query(models.Habit)
-        .filter(models.Habit.habit_id == habit_id, models.Habit.user_id == user_id)
-        .first()
+    habit_id_found = await db.scalar(
+        select(models.Habit.habit_id).where(
+            models.Habit.habit_id == habit_id, models.Habit.user_id == user_id
+        )
     )
-    if not habit:
+    if habit_id_found is None:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    query = db.query(models.HabitSession).filter(
+    query = select(models.HabitSession).where(
         models.HabitSession.habit_id == habit_id,
         models.HabitSession.user_id == user_id,
     )
     
     if date_filter:
-        query = query.filter(models.HabitSession.session_date == date_filter)
+        query = query.where(models.HabitSession.session_date == date_filter)
     
-    sessions = query.order_by(models.HabitSession.session_date.desc()).all()
-    return sessions
+    result = await db.execute(query.order_by(models.HabitSession.session_date.desc()))
+    return result.scalars().all()
 
 
 @router.post("/{habit_id}/sessions", response_model=schemas.HabitSessionOut, status_code=status.HTTP_201_CREATED)
@@ -386,9 +468,10 @@ def create_habit_session(
     habit_id: int,
     payload: schemas.HabitSessionCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    key: Optional[str] = Depends(idempotency.idempotency_key),
 ):
-    """Create a new session for a habit"""
+    """Create a new session for a habit (retry-safe with an Idempotency-Key header)"""
     user_id = _user_id(current_user)
     
     # Verify habit exists
@@ -401,34 +484,28 @@ def create_habit_session(
         raise HTTPException(status_code=404, detail="Habit not found")
     
     session_date = payload.session_date or get_bangkok_today()
-    
-    # Check if session exists for this date
-    existing = (
-        db.query(models.HabitSession)
-        .filter(
-            models.HabitSession.habit_id == habit_id,
-            models.HabitSession.user_id == user_id,
-            models.HabitSession.session_date == session_date,
-        )
-        .first()
+    replay = idempotency.begin(
+        db,
+        user_id,
+        key,
+        f"POST /habits/{habit_id}/sessions",
+        {**payload.model_dump(mode="json"), "session_date": str(session_date)},
     )
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Session already exists for this date")
-    
-    session = models.HabitSession(
-        habit_id=habit_id,
-        user_id=user_id,
-        session_date=session_date,
-        planned_duration_seconds=payload.planned_duration_seconds,
-        notes=payload.notes,
-        status="todo",
+    if replay is not None:
+        return replay
+
+    session = crud.insert_habit_session(
+        db, habit_id, user_id, session_date, payload.planned_duration_seconds, payload.notes
     )
-    
-    db.add(session)
+    if session is None:
+        # Release the key reservation so a retry runs again
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Session already exists for this date")
+
+    body = schemas.HabitSessionOut.model_validate(session).model_dump_json()
+    response = idempotency.finish(db, user_id, key, status.HTTP_201_CREATED, body)
     db.commit()
-    db.refresh(session)
-    return session
+    return response
 
 
 @router.put("/{habit_id}/sessions/{session_id}", response_model=schemas.HabitSessionOut)
@@ -437,7 +514,7 @@ def update_habit_session(
     session_id: int,
     payload: schemas.HabitSessionUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Update a habit session"""
     from datetime import datetime
@@ -458,6 +535,7 @@ def update_habit_session(
         raise HTTPException(status_code=404, detail="Session not found")
     
     old_status = session.status
+    totals_before = rollups.session_totals(session)
     
     if payload.status is not None:
         session.status = payload.status
@@ -465,66 +543,44 @@ def update_habit_session(
         # Set started_at when transitioning to in_progress
         if payload.status == "in_progress" and not session.started_at:
             session.started_at = get_bangkok_now()
-            print(f"SET started_at: {session.started_at}")
+            logger.debug("Session %s started_at=%s", session_id, session.started_at)
         
         # Set completed_at when transitioning to done
         elif payload.status == "done" and not session.completed_at:
             session.completed_at = get_bangkok_now()
-            print(f"SET completed_at: {session.completed_at}")
+            logger.debug("Session %s completed_at=%s", session_id, session.completed_at)
         
         # If pausing, keep started_at but don't set completed_at
         elif payload.status == "todo" and old_status == "in_progress":
-            print(f"PAUSED: keeping started_at={session.started_at}")
+            logger.debug("Session %s paused, keeping started_at=%s", session_id, session.started_at)
     
     # Update actual_duration_seconds (in seconds!)
     if payload.actual_duration_seconds is not None:
         session.actual_duration_seconds = payload.actual_duration_seconds
-        print(f"Updated actual_duration_seconds: {payload.actual_duration_seconds}s")
     
     if payload.notes is not None:
         session.notes = payload.notes
     
-    db.commit()
-    db.refresh(session)
-    
-    print(f"Session updated: status={session.status}, actual_duration_seconds={session.actual_duration_seconds}s")
+    rollups.apply_session_change(
+        db, user_id, session.session_date, totals_before, rollups.session_totals(session)
+    )
     
-    # Check streak achievements if session is marked done
+    # Re-evaluate streak achievements if session is marked done
     if session.status == "done":
-        check_streak_achievements(db, user_id)
-    
-    return session
-
-
-@router.get("/{habit_id}/sessions", response_model=List[schemas.HabitSessionOut])
-def get_habit_sessions(
-    habit_id: int,
-    date_filter: Optional[date] = Query(None, description="Filter by date"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """Get all sessions for a habit"""
-    user_id = _user_id(current_user)
+        achievement_events.emit(db, user_id, achievement_events.COMPLETIONS_CHANGED)
     
-    # Verify habit exists
-    habit = (
-        db.query(models.Habit)
-        .filter(models.Habit.habit_id == habit_id, models.Habit.user_id == user_id)
-        .first()
-    )
-    if not habit:
-        raise HTTPException(status_code=404, detail="Habit not found")
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
+    db.commit()
+    db.refresh(session)
     
-    query = db.query(models.HabitSession).filter(
-        models.HabitSession.habit_id == habit_id,
-        models.HabitSession.user_id == user_id,
+    logger.debug(
+        "Session %s updated: status=%s actual_duration_seconds=%s",
+        session_id,
+        session.status,
+        session.actual_duration_seconds,
     )
     
-    if date_filter:
-        query = query.filter(models.HabitSession.session_date == date_filter)
-    
-    sessions = query.order_by(models.HabitSession.session_date.desc()).all()
-    return sessions
+    return session
 
 
 @router.delete("/{habit_id}/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -532,7 +588,7 @@ def delete_habit_session(
     habit_id: int,
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Delete a habit session"""
     user_id = _user_id(current_user)
@@ -550,20 +606,58 @@ def delete_habit_session(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    rollups.apply_session_change(
+        db, user_id, session.session_date, rollups.session_totals(session), rollups.session_totals(None)
+    )
     db.delete(session)
+    resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # Completion Routes
+@router.post("/completions/batch", response_model=schemas.CompletionBatchResult)
+def toggle_completions_batch(
+    payload: schemas.CompletionBatch,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Set or clear many (habit_id, date) completions in one transaction (grid edits, offline sync)"""
+    user_id = _user_id(current_user)
+
+    habit_ids = {toggle.habit_id for toggle in payload.items}
+    owned = set(
+        db.scalars(
+            select(models.Habit.habit_id).where(
+                models.Habit.user_id == user_id, models.Habit.habit_id.in_(habit_ids)
+            )
+        )
+    )
+    missing = habit_ids - owned
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Habits not found or not owned by user: {sorted(missing)}",
+        )
+
+    added, removed = crud.apply_completion_batch(db, user_id, payload.items)
+    if added or removed:
+        # One achievement evaluation for the whole batch
+        achievement_events.emit(db, user_id, achievement_events.COMPLETIONS_CHANGED)
+    db.commit()
+
+    return {"added": added, "removed": removed}
+
+
 @router.post("/{habit_id}/complete", status_code=status.HTTP_204_NO_CONTENT)
 def mark_complete(
     habit_id: int,
     on: date = Query(..., description="YYYY-MM-DD"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    key: Optional[str] = Depends(idempotency.idempotency_key),
 ):
-    """Mark habit complete for a date (legacy endpoint)"""
+    """Mark habit complete for a date (legacy endpoint); marking a done day again is a no-op"""
     user_id = _user_id(current_user)
     
     if not (
@@ -572,18 +666,17 @@ def mark_complete(
         .first()
     ):
         raise HTTPException(status_code=404, detail="Habit not found or not owned by user")
-    
-    # Log completion
-    db_completion = models.HabitCompletion(
-        habit_id=habit_id,
-        user_id=user_id,
-        completed_on=on,
-    )
-    db.add(db_completion)
+
+    replay = idempotency.begin(db, user_id, key, f"POST /habits/{habit_id}/complete", {"on": str(on)})
+    if replay is not None:
+        return replay
+
+    if crud.insert_habit_completion(db, habit_id, user_id, on):
+        achievement_events.emit(db, user_id, achievement_events.COMPLETIONS_CHANGED)
+    response = idempotency.finish(db, user_id, key, status.HTTP_204_NO_CONTENT)
     db.commit()
     
-    check_streak_achievements(db, user_id)
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return response
 
 
 @router.delete("/{habit_id}/complete", status_code=status.HTTP_204_NO_CONTENT)
@@ -591,7 +684,7 @@ def unmark_complete(
     habit_id: int,
     on: date = Query(..., description="YYYY-MM-DD"),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Unmark habit complete for a date (legacy endpoint)"""
     user_id = _user_id(current_user)
@@ -613,9 +706,13 @@ def unmark_complete(
         )
     )
     result = db.execute(stmt)
+    if result.rowcount > 0:
+        streaks.record_uncompletion(db, habit_id, user_id, on)
+        rollups.add_completion(db, user_id, on, -1)
+        achievement_events.emit(db, user_id, achievement_events.COMPLETIONS_CHANGED)
+        resource_versions.bump(db, user_id, resource_versions.HABITS)
     db.commit()
     
-    check_streak_achievements(db, user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -644,7 +741,9 @@ def _build_habit_response(habit: models.Habit) -> dict:
             "created_at": habit.category.created_at,
         }
     elif habit.category_id:
-        print(f"WARNING: Habit {habit.habit_id} has category_id={habit.category_id} but category is NULL")
+        logger.warning(
+            "Habit %s has category_id=%s but category is NULL", habit.habit_id, habit.category_id
+        )
     
     return {
         "habit_id": habit.habit_id,
@@ -0,0 +1,38 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from ..db import pool_status
+from ..services import password_hashing
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def require_metrics_token(x_metrics_token: Optional[str] = Header(None)):
+    """Internal endpoints: the X-Metrics-Token header must match METRICS_TOKEN; unset, they 404"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_metrics_token is None or not hmac.compare_digest(x_metrics_token, METRICS_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(require_metrics_token)],
+    include_in_schema=False,
+)
+
+
+@router.get("/db-pool")
+def db_pool_metrics():
+    """Connection pool occupancy, checkout/wait/overflow counters and checkout latency"""
+    return pool_status()
+
+
+@router.get("/password-hashing")
+def password_hashing_metrics():
+    """Hashing pool size, queued jobs, rejections and queue/run latency"""
+    return password_hashing.pool_status()
@@ -4,12 +4,14 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .. import crud, models, schemas
-from ..db import get_db
-from ..security import get_current_user
-from ..services.achievement_checker import check_mood_achievements
+from .. import crud, idempotency, models, schemas
+from ..db import get_async_db, get_db
+from ..http_cache import user_resource
+from ..security import Principal, get_current_principal_async, get_current_user
+from ..services import achievement_events, resource_versions
 from ..utils.timezone_utils import get_bangkok_today
 
 logger = logging.getLogger(__name__)
@@ -17,8 +19,8 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/mood", tags=["Mood"])
 
 
-def _user_id(u: models.User) -> int:
-    """Extract the integer user_id from the authenticated User object."""
+def _user_id(u: Principal) -> int:
+    """Extract the integer user_id from the authenticated principal."""
     user_id = getattr(u, "user_id", None)
     if user_id is None:
         raise HTTPException(status_code=500, detail="Authenticated user lacks user_id")
@@ -75,22 +77,26 @@ class MoodTrendOut(BaseModel):
 
 
 # Routes
-@router.get("/", response_model=List[MoodLogOut])
-def list_mood_logs(
+@router.get(
+    "/",
+    response_model=List[MoodLogOut],
+    dependencies=[Depends(user_resource(resource_versions.MOOD))],
+)
+async def list_mood_logs(
     limit: int = Query(30, ge=1, le=365, description="Number of logs to return"),
     offset: int = Query(0, ge=0),
     start_date: Optional[date] = Query(None, description="Filter from this date"),
     end_date: Optional[date] = Query(None, description="Filter until this date"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get all mood logs for the authenticated user with optional filters."""
     try:
         user_id = _user_id(current_user)
-        logger.info(f"Fetching moods for user {user_id}")
+        logger.debug("Fetching moods for user %s", user_id)
 
-        logs = crud.get_user_mood_logs(
-            db,
+        logs = await db.run_sync(
+            crud.get_user_mood_logs,
             user_id=user_id,
             limit=limit,
             offset=offset,
@@ -98,10 +104,10 @@ def list_mood_logs(
             end_date=end_date,
         )
 
-        logger.info(f"Found {len(logs)} mood logs for user {user_id}")
+        logger.debug("Found %d mood logs for user %s", len(logs), user_id)
         return logs
     except Exception as e:
-        logger.error(f"Error in list_mood_logs: {e}", exc_info=True)
+        logger.error("Error in list_mood_logs: %s", e, exc_info=True)
         raise
 
 
@@ -109,67 +115,82 @@ def list_mood_logs(
 def create_mood_log(
     payload: MoodLogCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    key: Optional[str] = Depends(idempotency.idempotency_key),
 ):
-    """Log a new mood entry."""
+    """Log a new mood entry (retry-safe with an Idempotency-Key header)."""
     try:
         user_id = _user_id(current_user)
         log_date = payload.logged_on or get_bangkok_today()  
 
-        logger.info(
-            f"Creating mood for user {user_id} on {log_date}: score={payload.mood_score}"
+        logger.debug(
+            "Creating mood for user %s on %s: score=%s", user_id, log_date, payload.mood_score
         )
 
-        # Check if already exists
-        existing = crud.get_mood_log_by_date(db, user_id, log_date)
-        if existing:
-            logger.warning(f"Mood already exists for {log_date}")
+        replay = idempotency.begin(
+            db,
+            user_id,
+            key,
+            "POST /mood/",
+            {**payload.model_dump(mode="json"), "logged_on": str(log_date)},
+        )
+        if replay is not None:
+            return replay
+
+        result = crud.insert_mood_log(db, user_id, payload.mood_score, payload.note, log_date)
+        if result is None:
+            logger.info("Mood already exists for %s", log_date)
+            # Release the key reservation so a retry runs again
+            db.rollback()
             raise HTTPException(
                 status_code=400,
                 detail=f"Mood log already exists for {log_date}. Use PUT to update it.",
             )
 
-        result = crud.create_mood_log(
-            db,
-            user_id=user_id,
-            mood_score=payload.mood_score,
-            note=payload.note,
-            logged_on=log_date,
-        )
+        # Queue achievement evaluation for the background worker
+        achievement_events.emit(db, user_id, achievement_events.MOOD_CHANGED)
+        body = MoodLogOut.model_validate(result).model_dump_json()
+        response = idempotency.finish(db, user_id, key, status.HTTP_201_CREATED, body)
+        db.commit()
 
-        # Check achievements after creating mood log
-        check_mood_achievements(db, user_id)
-
-        logger.info(f"Mood created successfully: {result.mood_id}")
-        return result
+        logger.debug("Mood created: %s", result.mood_id)
+        return response
     except Exception as e:
-        logger.error(f"Error in create_mood_log: {e}", exc_info=True)
+        logger.error("Error in create_mood_log: %s", e, exc_info=True)
         raise
 
 
-@router.get("/stats", response_model=MoodStatsOut)
-def get_mood_stats(
+@router.get(
+    "/stats",
+    response_model=MoodStatsOut,
+    dependencies=[Depends(user_resource(resource_versions.MOOD))],
+)
+async def get_mood_stats(
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get mood statistics for the authenticated user."""
     user_id = _user_id(current_user)
-    return crud.get_mood_statistics(db, user_id, days=days)
+    return await db.run_sync(crud.get_mood_statistics, user_id, days=days)
 
 
-@router.get("/trend", response_model=List[MoodTrendOut])
-def get_mood_trend(
+@router.get(
+    "/trend",
+    response_model=List[MoodTrendOut],
+    dependencies=[Depends(user_resource(resource_versions.MOOD))],
+)
+async def get_mood_trend(
     days: int = Query(7, ge=1, le=90, description="Number of days for trend"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get mood trend data for visualization."""
     user_id = _user_id(current_user)
     start_date = get_bangkok_today() - timedelta(days=days)
 
-    logs = crud.get_user_mood_logs(
-        db, user_id=user_id, start_date=start_date, limit=days
+    logs = await db.run_sync(
+        crud.get_user_mood_logs, user_id=user_id, start_date=start_date, limit=days
     )
 
     return [
@@ -178,26 +199,34 @@ def get_mood_trend(
     ]
 
 
-@router.get("/today", response_model=Optional[MoodLogOut])
-def get_today_mood(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.get(
+    "/today",
+    response_model=Optional[MoodLogOut],
+    dependencies=[Depends(user_resource(resource_versions.MOOD))],
+)
+async def get_today_mood(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get today's mood log if it exists."""
     user_id = _user_id(current_user)
-    log = crud.get_mood_log_by_date(db, user_id, get_bangkok_today())
+    log = await db.run_sync(crud.get_mood_log_by_date, user_id, get_bangkok_today())
     return log
 
 
-@router.get("/{mood_id}", response_model=MoodLogOut)
-def get_mood_log(
+@router.get(
+    "/{mood_id}",
+    response_model=MoodLogOut,
+    dependencies=[Depends(user_resource(resource_versions.MOOD))],
+)
+async def get_mood_log(
     mood_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get a specific mood log by ID."""
     user_id = _user_id(current_user)
-    log = crud.get_mood_log(db, mood_id, user_id)
+    log = await db.run_sync(crud.get_mood_log, mood_id, user_id)
 
     if not log:
         raise HTTPException(
@@ -212,7 +241,7 @@ def update_mood_log(
     mood_id: int,
     payload: MoodLogUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Update an existing mood log."""
     user_id = _user_id(current_user)
@@ -231,8 +260,9 @@ def update_mood_log(
         note=payload.note,
     )
 
-    # Check achievements after updating mood log
-    check_mood_achievements(db, user_id)
+    # Queue achievement evaluation for the background worker
+    achievement_events.emit(db, user_id, achievement_events.MOOD_CHANGED)
+    db.commit()
 
     return updated
 
@@ -241,7 +271,7 @@ def update_mood_log(
 def delete_mood_log(
     mood_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Delete a mood log."""
     user_id = _user_id(current_user)
@@ -253,16 +283,17 @@ def delete_mood_log(
             status_code=404, detail="Mood log not found or not owned by user"
         )
 
-    # Check achievements after deleting mood log
-    check_mood_achievements(db, user_id)
+    # Queue achievement evaluation for the background worker
+    achievement_events.emit(db, user_id, achievement_events.MOOD_CHANGED)
+    db.commit()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@router.get("/week/summary")
-def get_week_summary(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.get("/week/summary", dependencies=[Depends(user_resource(resource_versions.MOOD))])
+async def get_week_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
 ):
     """Get a summary of this week's mood logs."""
     user_id = _user_id(current_user)
@@ -272,8 +303,8 @@ def get_week_summary(
     if today.weekday() == 6:
         start_of_week = today
 
-    logs = crud.get_user_mood_logs(
-        db, user_id=user_id, start_date=start_of_week, limit=7
+    logs = await db.run_sync(
+        crud.get_user_mood_logs, user_id=user_id, start_date=start_of_week, limit=7
     )
 
     if not logs:
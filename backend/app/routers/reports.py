@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import models, schemas
+from ..db import get_async_db
+from ..security import Principal, get_current_principal_async
+from ..utils.timezone_utils import get_bangkok_today
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+# Reports only read daily_user_rollup (one row per user per day), so a
+# window costs O(days) no matter how many completions or sessions it covers.
+MAX_REPORT_DAYS = 366
+DEFAULT_DAILY_DAYS = 30
+COUNTERS = ("completions", "planned_seconds", "actual_seconds", "sessions_done")
+
+
+def _user_id(u: Principal) -> int:
+    """Extract the integer user_id from the authenticated principal."""
+    user_id = getattr(u, "user_id", None)
+    if user_id is None:
+        raise HTTPException(status_code=500, detail="Authenticated user lacks user_id")
+    return user_id
+
+
+def _window(start_date: Optional[date], end_date: Optional[date], default_start) -> tuple:
+    end_date = end_date or get_bangkok_today()
+    start_date = start_date or default_start(end_date)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end_date - start_date).days + 1 > MAX_REPORT_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"Reports cover at most {MAX_REPORT_DAYS} days"
+        )
+    return start_date, end_date
+
+
+def _period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _period_end(start: date, period: str) -> date:
+    if period == "week":
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def _months_back(end_date: date, months: int) -> date:
+    month_index = end_date.year * 12 + end_date.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+async def _load_rollup(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    result = await db.execute(
+        select(models.DailyUserRollup)
+        .where(
+            models.DailyUserRollup.user_id == user_id,
+            models.DailyUserRollup.day.between(start_date, end_date),
+        )
+        .order_by(models.DailyUserRollup.day)
+    )
+    return {row.day: row for row in result.scalars()}
+
+
+@router.get("/daily", response_model=List[schemas.DailyReportOut])
+async def daily_report(
+    start_date: Optional[date] = Query(None, alias="from", description="First day (default: 30 days ago)"),
+    end_date: Optional[date] = Query(None, alias="to", description="Last day (default: today)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
+):
+    """Per-day totals for the window, one entry per day (days without activity are zero)"""
+    user_id = _user_id(current_user)
+    start_date, end_date = _window(
+        start_date, end_date, lambda end: end - timedelta(days=DEFAULT_DAILY_DAYS - 1)
+    )
+    rows = await _load_rollup(db, user_id, start_date, end_date)
+
+    report = []
+    day = start_date
+    while day <= end_date:
+        row = rows.get(day)
+        if row is None:
+            report.append(schemas.DailyReportOut(date=day))
+        else:
+            report.append(
+                schemas.DailyReportOut(
+                    date=day,
+                    mood_score=row.mood_score,
+                    **{name: getattr(row, name) for name in COUNTERS},
+                )
+            )
+        day += timedelta(days=1)
+    return report
+
+
+@router.get("/summary", response_model=List[schemas.PeriodSummaryOut])
+async def summary_report(
+    period: Literal["week", "month"] = Query("week"),
+    start_date: Optional[date] = Query(
+        None, alias="from", description="First day (default: 12 weeks / 12 months back)"
+    ),
+    end_date: Optional[date] = Query(None, alias="to", description="Last day (default: today)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal_async),
+):
+    """Weekly or monthly totals; partial periods at either end only count days inside the window"""
+    user_id = _user_id(current_user)
+    if period == "week":
+        default_start = lambda end: _period_start(end, "week") - timedelta(weeks=11)
+    else:
+        default_start = lambda end: _months_back(end, 11)
+    start_date, end_date = _window(start_date, end_date, default_start)
+    rows = await _load_rollup(db, user_id, start_date, end_date)
+
+    buckets = OrderedDict()
+    bucket_start = _period_start(start_date, period)
+    while bucket_start <= end_date:
+        buckets[bucket_start] = {
+            "period_start": bucket_start,
+            "period_end": _period_end(bucket_start, period),
+            "mood_total": 0,
+            "active_days": 0,
+            "mood_days": 0,
+            **{name: 0 for name in COUNTERS},
+        }
+        bucket_start = _period_end(bucket_start, period) + timedelta(days=1)
+
+    for day, row in rows.items():
+        bucket = buckets[_period_start(day, period)]
+        for name in COUNTERS:
+            bucket[name] += getattr(row, name)
+        if row.completions or row.sessions_done:
+            bucket["active_days"] += 1
+        if row.mood_score is not None:
+            bucket["mood_days"] += 1
+            bucket["mood_total"] += row.mood_score
+
+    summaries = []
+    for bucket in buckets.values():
+        mood_total = bucket.pop("mood_total")
+        average = round(mood_total / bucket["mood_days"], 2) if bucket["mood_days"] else None
+        summaries.append(schemas.PeriodSummaryOut(average_mood=average, **bucket))
+    return summaries
@@ -1,76 +1,124 @@
+import logging
 import os
-import shutil
-from uuid import uuid4
+from typing import Optional
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from .. import models, schemas
-from ..db import get_db
-from ..security import get_current_email, hash_password
+from ..db import get_async_db, get_db
+from ..security import (
+    Principal,
+    get_current_principal,
+    get_current_principal_async,
+    invalidate_principal,
+    revoke_tokens,
+)
+from ..services import password_hashing, uploads
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.get("/me", response_model=schemas.UserOut)
-def read_me(db: Session = Depends(get_db), email: str = Depends(get_current_email)):
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
-
-
-@router.put("/me", response_model=schemas.UserOut)
-def update_me(
-    patch: schemas.UserUpdate,
+def read_me(
     db: Session = Depends(get_db),
-    email: str = Depends(get_current_email),
+    principal: Principal = Depends(get_current_principal),
 ):
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = db.get(models.User, principal.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    return user
+
 
+def _apply_update(
+    db: Session, user: models.User, patch: schemas.UserUpdate, password_hash: Optional[str]
+) -> models.User:
     if patch.name is not None:
         user.name = patch.name
     if patch.bio is not None:
         user.bio = patch.bio
     if patch.profile_picture is not None:
         user.profile_picture = patch.profile_picture
-    if patch.password:
-        user.password_hash = hash_password(patch.password)
+    if password_hash is not None:
+        user.password_hash = password_hash
+        # Sessions signed in with the old password end here
+        revoke_tokens(db, user.user_id)
 
     db.commit()
     db.refresh(user)
     return user
 
 
+@router.put("/me", response_model=schemas.UserOut)
+async def update_me(
+    patch: schemas.UserUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    principal: Principal = Depends(get_current_principal_async),
+):
+    user = await db.get(models.User, principal.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # bcrypt runs on the dedicated hashing pool, not the request threadpool
+    password_hash = None
+    if patch.password:
+        try:
+            password_hash = await password_hashing.hash_password_async(patch.password)
+        except password_hashing.PasswordHashingBusy:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many password changes right now, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+    user = await db.run_sync(_apply_update, user, patch, password_hash)
+    invalidate_principal(principal.email, principal.user_id)
+    return user
+
+
 # Avatar upload
 BACKEND_BASE_URL = os.getenv("BACKEND_BASE_URL", "http://localhost:8000")
-ALLOWED_EXT = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
-UPLOAD_DIR = "uploads"
+
+
+def _set_avatar(db: Session, user_id: int, url: str) -> Optional[models.User]:
+    """Point the user's avatar at url and release the one it replaces; None if the user is gone."""
+    user = db.get(models.User, user_id)
+    if not user:
+        uploads.release(db, url)
+        return None
+
+    previous = user.profile_picture
+    # Local storage gives a path on this API
+    user.profile_picture = url if url.startswith(("http://", "https://")) else f"{BACKEND_BASE_URL}{url}"
+    db.commit()
+    # The replaced avatar goes unless something else shares it (leftovers: upload_gc)
+    if previous and previous != user.profile_picture:
+        try:
+            uploads.release(db, previous)
+        except Exception as e:
+            logger.warning("Could not delete previous avatar %s: %s", previous, e)
+    db.refresh(user)
+    return user
 
 
 @router.post("/me/avatar", response_model=schemas.UserOut)
 async def upload_avatar(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    email: str = Depends(get_current_email),
+    principal: Principal = Depends(get_current_principal),
 ):
-    ext = os.path.splitext(file.filename)[1].lower()
-    if ext not in ALLOWED_EXT:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
-
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    fname = f"{uuid4().hex}{ext}"
-    path = os.path.join(UPLOAD_DIR, fname)
-    with open(path, "wb") as out:
-        shutil.copyfileobj(file.file, out)
-
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
+    try:
+        url = await uploads.save_upload(file, uploads.MAX_AVATAR_BYTES)
+    except uploads.UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    # The reference lookup and storage deletes block, so they stay off the event loop
+    user = await run_in_threadpool(_set_avatar, db, principal.user_id, url)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-
-    user.profile_picture = f"{BACKEND_BASE_URL}/uploads/{fname}"
-    db.commit()
-    db.refresh(user)
-    return user
\ No newline at end of file
+    invalidate_principal(principal.email)
+    return user
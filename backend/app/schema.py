@@ -0,0 +1,119 @@
+"""
+Schema creation behind a version marker.
+
+There are no migrations: new state goes into new tables (and indexes), which
+create_all plus a checkfirst pass over the declared indexes add to an
+existing database. That DDL pass costs a catalog query per table and index,
+so it only runs when the declared schema changed: a hash of the tables,
+columns, constraints and indexes in Base.metadata is stored in seed_versions
+under SCHEMA_NAME, and startup compares it with one lookup (shared with the
+achievement seed check, see read_versions).
+
+Deploys can also run it as a one-shot step before starting the API:
+
+    python -m app.schema
+"""
+import hashlib
+import json
+from typing import Dict, Optional
+
+from sqlalchemy import delete, exc, insert, select, text
+from sqlalchemy.engine import Engine
+
+from . import models
+from .db import Base
+
+SCHEMA_NAME = "schema"
+
+# Arbitrary application-wide key for pg_advisory_lock
+_SCHEMA_LOCK_KEY = 724_301_002
+
+
+def _columns(item) -> str:
+    return ",".join(column.name for column in item.columns)
+
+
+def schema_version() -> str:
+    """Content hash of the declared schema; changes whenever a table, column or index is added or altered."""
+    tables = []
+    for table in Base.metadata.sorted_tables:
+        tables.append({
+            "name": table.name,
+            "columns": [
+                [column.name, str(column.type), column.nullable, column.primary_key]
+                for column in table.columns
+            ],
+            "constraints": sorted(
+                f"{type(constraint).__name__}:{constraint.name}:{_columns(constraint)}"
+                for constraint in table.constraints
+            ),
+            "indexes": sorted(
+                f"{index.name}:{index.unique}:{_columns(index)}"
+                for index in table.indexes
+            ),
+        })
+    payload = json.dumps(tables, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_versions(engine: Engine) -> Optional[Dict[str, str]]:
+    """All seed_versions markers in one query; None when the table does not exist yet."""
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(select(models.SeedVersion.name, models.SeedVersion.version))
+            return {name: version for name, version in rows}
+    except (exc.OperationalError, exc.ProgrammingError):
+        return None
+
+
+def apply_schema(engine: Engine, version: Optional[str] = None):
+    """Create missing tables and indexes and record the schema version. Idempotent."""
+    if version is None:
+        version = schema_version()
+    with engine.begin() as conn:
+        Base.metadata.create_all(bind=conn)
+        # create_all skips existing tables, so add indexes declared after they were created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        conn.execute(delete(models.SeedVersion).where(models.SeedVersion.name == SCHEMA_NAME))
+        conn.execute(insert(models.SeedVersion).values(name=SCHEMA_NAME, version=version))
+
+
+def ensure_schema(engine: Engine, versions: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Startup check: applies the schema only when its version changed (versions
+    as returned by read_versions; None means no marker table). Returns True
+    if it did.
+    """
+    version = schema_version()
+    if versions is not None and versions.get(SCHEMA_NAME) == version:
+        return False
+
+    if engine.dialect.name == "postgresql":
+        # Workers booting together apply the schema once; the rest wait here
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+            try:
+                current = read_versions(engine)
+                if current is None or current.get(SCHEMA_NAME) != version:
+                    apply_schema(engine, version)
+                    return True
+                return False
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _SCHEMA_LOCK_KEY})
+
+    apply_schema(engine, version)
+    return True
+
+
+def main():
+    """One-shot command: apply the schema regardless of its recorded version."""
+    from .db import engine
+
+    apply_schema(engine)
+    print(f"✓ Schema applied (version {schema_version()[:12]})")
+
+
+if __name__ == "__main__":
+    main()
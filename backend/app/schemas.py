@@ -1,7 +1,12 @@
 from datetime import date, datetime
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, EmailStr, Field, computed_field
+
+from .services import image_variants
+
+# Toggles accepted by POST /habits/completions/batch
+MAX_COMPLETION_BATCH = 500
 
 
 # Habit Category 
@@ -117,6 +122,29 @@ class HabitBulkOut(BaseModel):
     week_completion: int = 0
 
 
+class HabitBulkPage(BaseModel):
+    """One keyset page of HabitBulkOut rows"""
+    items: List[HabitBulkOut] = Field(default_factory=list)
+    next_after_id: Optional[int] = None
+
+
+class CompletionToggle(BaseModel):
+    """Set (done=true) or clear (done=false) one habit's completion for a day"""
+    habit_id: int
+    on: date = Field(validation_alias=AliasChoices("on", "date"), description="YYYY-MM-DD")
+    done: bool = True
+
+
+class CompletionBatch(BaseModel):
+    items: List[CompletionToggle] = Field(min_length=1, max_length=MAX_COMPLETION_BATCH)
+
+
+class CompletionBatchResult(BaseModel):
+    """Completions actually added / removed (toggles that were already in place count as neither)"""
+    added: int
+    removed: int
+
+
 # User
 class UserBase(BaseModel):
     email: EmailStr
@@ -152,6 +180,16 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True
 
+    @computed_field
+    @property
+    def profile_picture_thumb(self) -> Optional[str]:
+        return image_variants.variant_url(self.profile_picture, "thumb")
+
+    @computed_field
+    @property
+    def profile_picture_medium(self) -> Optional[str]:
+        return image_variants.variant_url(self.profile_picture, "medium")
+
 
 class Token(BaseModel):
     token: str
@@ -170,12 +208,21 @@ class GratitudeEntryOut(BaseModel):
     category: Optional[str] = None
     date: str
     image: Optional[str] = Field(None, validation_alias="image_url")
+    image_thumb: Optional[str] = None
+    image_medium: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
         populate_by_name = True
 
 
+class GratitudePage(BaseModel):
+    """One keyset page of the gratitude jar, newest first"""
+    items: List[GratitudeEntryOut] = Field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+
 # Mood
 class MoodLogCreate(BaseModel):
     mood_score: int = Field(ge=1, le=10, description="Mood score from 1-10")
@@ -222,7 +269,8 @@ class AchievementOut(BaseModel):
     meta: Optional[Dict[str, Any]] = Field(default_factory=dict)
     requirements: List[AchievementRequirementOut] = []
     created_at: datetime
-    updated_at: datetime
+    # Only set once a row has been updated
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -258,4 +306,27 @@ class UserAchievementSummary(BaseModel):
     progress_unit_value: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Reports
+class DailyReportOut(BaseModel):
+    """One day of the user's activity, read from daily_user_rollup"""
+    date: date
+    completions: int = 0
+    planned_seconds: int = 0
+    actual_seconds: int = 0
+    sessions_done: int = 0
+    mood_score: Optional[int] = None
+
+
+class PeriodSummaryOut(BaseModel):
+    """Totals for one week (Monday start) or calendar month"""
+    period_start: date
+    period_end: date
+    completions: int = 0
+    planned_seconds: int = 0
+    actual_seconds: int = 0
+    sessions_done: int = 0
+    active_days: int = 0
+    mood_days: int = 0
+    average_mood: Optional[float] = None
@@ -1,6 +1,8 @@
 import logging
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from zoneinfo import ZoneInfo
 
 import jwt
@@ -8,13 +10,15 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt import ExpiredSignatureError, InvalidTokenError
 from passlib.context import CryptContext
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from . import models
-from .db import get_db
+from .db import get_async_db, get_db
+from .utils.ttl_cache import TTLCache
+from .utils.upsert import dialect_insert
 
-# Setup logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Bangkok timezone
@@ -25,15 +29,57 @@ JWT_SECRET = os.getenv("JWT_SECRET", "change_me")
 JWT_ALG = "HS256"
 JWT_EXPIRE_MIN = 60 * 24
 
-# Log JWT_SECRET
-logger.warning(f"JWT_SECRET loaded: {JWT_SECRET[:20]}... (length: {len(JWT_SECRET)})")
 if JWT_SECRET == "change_me":
     logger.error("JWT_SECRET is using default value! Please set JWT_SECRET environment variable!")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt work factor (each +1 doubles the cost). Hashes made with another
+# value are upgraded on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Stored for accounts without a password (Google sign-in); never matches any
+# password, and no hashing work is spent creating or checking it
+UNUSABLE_PASSWORD = "!"
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as seen by routes: identity only, no ORM state."""
+    user_id: int
+    email: str
+
+
+# token subject (email) -> Principal; spares the user lookup on every request.
+# user_id -> current token version, for tokens that carry uid. Other processes
+# see a revocation or a removed account once their entry expires.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+_principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+_token_version_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_principal(email: str, user_id: Optional[int] = None):
+    """Drop a cached principal (profile/password change, account removal)."""
+    _principal_cache.pop(email)
+    if user_id is not None:
+        _token_version_cache.pop(user_id)
+
+
+def clear_principal_cache():
+    _principal_cache.clear()
+    _token_version_cache.clear()
+
+
+def _unknown_user() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="User not found",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
 def hash_password(plain_password) -> str:
     if not isinstance(plain_password, str):
         raise TypeError(f"Password must be a str, got {type(plain_password).__name__}")
@@ -54,50 +100,151 @@ def verify_password(plain_password: str, password_hash: str) -> bool:
         raise TypeError(
             f"password_hash must be a str, got {type(password_hash).__name__}"
         )
+    if password_hash == UNUSABLE_PASSWORD:
+        return False
     return pwd_context.verify(plain_password, password_hash)
 
 
-def create_access_token(subject: str) -> str:
-    """Create a JWT token for the given subject (email)"""
+def verify_and_update_password(
+    plain_password: str, password_hash: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and, if the stored hash uses outdated settings
+    (e.g. another BCRYPT_ROUNDS), return a fresh hash to store.
+    Returns (valid, new_hash_or_None).
+    """
+    if not isinstance(plain_password, str):
+        raise TypeError(f"Password must be a str, got {type(plain_password).__name__}")
+    if not isinstance(password_hash, str):
+        raise TypeError(
+            f"password_hash must be a str, got {type(password_hash).__name__}"
+        )
+    if password_hash == UNUSABLE_PASSWORD:
+        return False, None
+    return pwd_context.verify_and_update(plain_password, password_hash)
+
+
+def password_needs_rehash(password_hash: str) -> bool:
+    if password_hash == UNUSABLE_PASSWORD:
+        return False
+    return pwd_context.needs_update(password_hash)
+
+
+# Layout of the token claims. Version 2 adds "uid" (user_id), "ver" and "iat";
+# tokens without them (only "sub" = email) are still accepted and resolved
+# through the email lookup until they expire. "tv" is the user's token
+# version when the token was issued (absent = 0); tokens from an older
+# version are rejected, see revoke_tokens().
+TOKEN_VERSION = 2
+
+
+def token_version_query(user_id: int):
+    """SELECT of (user_id, current token version); no row when the user does not exist."""
+    return (
+        select(models.User.user_id, func.coalesce(models.UserTokenVersion.version, 0))
+        .outerjoin(models.UserTokenVersion, models.UserTokenVersion.user_id == models.User.user_id)
+        .where(models.User.user_id == user_id)
+    )
+
+
+def revoke_tokens(db: Session, user_id: int):
+    """
+    Bump the user's token version (does not commit), so every access token
+    issued before is rejected. Call invalidate_principal(email, user_id)
+    after committing.
+    """
+    stmt = dialect_insert(db, models.UserTokenVersion).values(user_id=user_id, version=1)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"version": models.UserTokenVersion.version + 1},
+        )
+    )
+
+
+def create_access_token(
+    subject: str, user_id: Optional[int] = None, token_version: int = 0
+) -> str:
+    """Create a JWT token for the given subject (email), carrying user_id when known"""
+    issued_at = datetime.now(timezone.utc)
     payload = {
         "sub": subject,
+        "iat": issued_at,
         # Use UTC for token expiration (standard practice)
-        "exp": datetime.now(timezone.utc) + timedelta(minutes=JWT_EXPIRE_MIN),
+        "exp": issued_at + timedelta(minutes=JWT_EXPIRE_MIN),
     }
+    if user_id is not None:
+        payload["uid"] = user_id
+        payload["ver"] = TOKEN_VERSION
+        if token_version:
+            payload["tv"] = token_version
     token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
-    logger.info(f"Created token for {subject}")
+    logger.debug("Created token for %s", subject)
     return token
 
 
-def decode_token(token: str) -> str:
-    """Decode JWT token and return the subject (email)"""
+def decode_claims(token: str) -> dict:
+    """Decode and verify a JWT token, returning all of its claims"""
     try:
         token = token.strip()
         
         if token.startswith("Bearer "):
             token = token[7:]
         
-        logger.debug(f"🔐 Decoding token (length: {len(token)})")
-        logger.debug(f"   Token start: {token[:30]}...")
-        logger.debug(f"   JWT_SECRET: {JWT_SECRET[:20]}... (length: {len(JWT_SECRET)})")
-        logger.debug(f"   Algorithm: {JWT_ALG}")
-        
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-        email = payload.get("sub")
-        logger.info(f"Token decoded successfully for: {email}")
-        return email
+        logger.debug("Token decoded for %s", payload.get("sub"))
+        return payload
     except ExpiredSignatureError:
-        logger.warning("Token has expired")
+        logger.info("Token has expired")
         raise HTTPException(status_code=401, detail="Token expired")
     except InvalidTokenError as e:
-        logger.error(f"Invalid token error: {type(e).__name__}: {e}")
+        logger.info("Invalid token: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error decoding token: {type(e).__name__}: {e}", exc_info=True)
+        logger.error("Unexpected error decoding token: %s: %s", type(e).__name__, e, exc_info=True)
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
 
-def get_current_email(token: str = Depends(oauth2_scheme)) -> str:
+def decode_token(token: str) -> str:
+    """Decode JWT token and return the subject (email)"""
+    return decode_claims(token).get("sub")
+
+
+def _principal_from_claims(claims: dict) -> Optional[Principal]:
+    """Principal from a current-version token (not yet checked against revocation); None for legacy tokens."""
+    user_id = claims.get("uid")
+    email = claims.get("sub")
+    if claims.get("ver") != TOKEN_VERSION or not isinstance(user_id, int) or not email:
+        return None
+    return Principal(user_id=user_id, email=email)
+
+
+def _revoked() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token has been revoked",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _cached_token_version(claims: dict, principal: Principal) -> Optional[int]:
+    """The user's cached token version; None when it must be read (missing, or older than the token's)."""
+    current = _token_version_cache.get(principal.user_id)
+    if current is None or claims.get("tv", 0) > current:
+        return None
+    return current
+
+
+def _read_token_version(principal: Principal, row) -> int:
+    """Cache the token version from a token_version_query row; a missing row means the user is gone."""
+    if row is None:
+        logger.warning("User %s of a token no longer exists", principal.user_id)
+        raise _unknown_user()
+    _token_version_cache.set(principal.user_id, row[1])
+    return row[1]
+
+
+async def get_current_email(token: str = Depends(oauth2_scheme)) -> str:
     """Extract email from token"""
     if token.startswith("Bearer "):
         token = token[7:]
@@ -108,40 +255,91 @@ def get_current_email(token: str = Depends(oauth2_scheme)) -> str:
     return email
 
 
-def get_current_user(
+def get_current_principal(
     db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme),
-) -> models.User:
+) -> Principal:
     """
     Dependency function to retrieve the authenticated user from the JWT token.
+    Current tokens carry user_id; only their token version is checked, through
+    the cache. Legacy tokens are resolved by email through the principal cache.
     """
     try:
-        logger.debug("get_current_user called")
+        claims = decode_claims(token)
+        principal = _principal_from_claims(claims)
+        if principal is not None:
+            current = _cached_token_version(claims, principal)
+            if current is None:
+                row = db.execute(token_version_query(principal.user_id)).first()
+                current = _read_token_version(principal, row)
+            if claims.get("tv", 0) != current:
+                raise _revoked()
+            return principal
 
-        email = decode_token(token)
-        logger.debug(f"Decoded email: {email}")
+        email = claims.get("sub")
+        principal = _principal_cache.get(email)
+        if principal is not None:
+            return principal
 
         from . import crud
         user = crud.get_user_by_email(db, email=email)
 
         if user is None:
-            logger.warning(f"User not found for email: {email}")
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+            logger.warning("User not found for email: %s", email)
+            raise _unknown_user()
 
-        logger.debug(f"Authenticated user: {user.user_id} ({user.email})")
-        return user
+        logger.debug("Authenticated user %s (%s)", user.user_id, user.email)
+        principal = Principal(user_id=user.user_id, email=user.email)
+        _principal_cache.set(email, principal)
+        return principal
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error in get_current_user: {e}", exc_info=True)
+        logger.error("Unexpected error in get_current_principal: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
\ No newline at end of file
+
+
+# Name used by the habit, mood and gratitude routers
+get_current_user = get_current_principal
+
+
+async def get_current_principal_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    """
+    get_current_principal for async routes: same checks, looked up on the AsyncSession.
+    """
+    claims = decode_claims(token)
+    principal = _principal_from_claims(claims)
+    if principal is not None:
+        current = _cached_token_version(claims, principal)
+        if current is None:
+            row = (await db.execute(token_version_query(principal.user_id))).first()
+            current = _read_token_version(principal, row)
+        if claims.get("tv", 0) != current:
+            raise _revoked()
+        return principal
+
+    email = claims.get("sub")
+    principal = _principal_cache.get(email)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(models.User.user_id, models.User.email).where(models.User.email == email)
+    )
+    row = result.first()
+
+    if row is None:
+        logger.warning("User not found for email: %s", email)
+        raise _unknown_user()
+
+    principal = Principal(user_id=row.user_id, email=row.email)
+    _principal_cache.set(email, principal)
+    return principal
@@ -1,5 +1,25 @@
+"""
+Achievement catalog seed.
+
+Startup only compares the stored seed version with the hash of
+ACHIEVEMENTS_SEED (ensure_achievement_seed); the catalog and the
+users x achievements rows are reconciled only when the seed changed.
+
+Apply the seed explicitly (e.g. as a deploy step):
+    python -m app.seed_achievements
+"""
+import hashlib
+import json
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
 from app import models
 from app.db import SessionLocal
+from app.services.achievement_backfill import backfill_achievements
+from app.services import achievement_catalog, resource_versions
+from app.services.achievement_rules import invalidate_rules
 
 ACHIEVEMENTS_SEED = [
     {
@@ -83,61 +103,102 @@ ACHIEVEMENTS_SEED = [
 ]
 
 
-def seed_achievements():
-    db = SessionLocal()
-    try:
-        existing = db.query(models.Achievement).count()
-        if existing > 0:
-            print(f"✓ Achievements already seeded ({existing} records)")
-            # Still create UserAchievement records if they don't exist
-            users = db.query(models.User).all()
-            achievements = db.query(models.Achievement).all()
-
-            for user in users:
-                for achievement in achievements:
-                    existing_ua = (
-                        db.query(models.UserAchievement)
-                        .filter(
-                            models.UserAchievement.user_id == user.user_id,
-                            models.UserAchievement.achievement_id
-                            == achievement.achievement_id,
-                        )
-                        .first()
-                    )
-
-                    if not existing_ua:
-                        ua = models.UserAchievement(
-                            user_id=user.user_id,
-                            achievement_id=achievement.achievement_id,
-                            is_earned=False,
-                            progress=0,
-                            progress_unit_value=0,
-                        )
-                        db.add(ua)
-            db.commit()
-            print("✓ UserAchievement records created!")
-            return
+# seed_versions row for this seed (shared with the in-memory catalog)
+SEED_NAME = achievement_catalog.SEED_NAME
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+_SEED_LOCK_KEY = 724_301_001
+
+
+def seed_version() -> str:
+    """Content hash of ACHIEVEMENTS_SEED; changes whenever the catalog is edited."""
+    payload = json.dumps(ACHIEVEMENTS_SEED, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _applied_version(db: Session) -> Optional[str]:
+    return (
+        db.query(models.SeedVersion.version)
+        .filter(models.SeedVersion.name == SEED_NAME)
+        .scalar()
+    )
 
-        for achievement_data in ACHIEVEMENTS_SEED:
-            requirements_data = achievement_data.pop("requirements")
-            achievement = models.Achievement(**achievement_data)
+
+def apply_achievement_seed(db: Session, version: Optional[str] = None) -> int:
+    """
+    Upsert the catalog by key_name, replace its requirements, create missing
+    UserAchievement rows and record the seed version. Idempotent; commits.
+    """
+    if version is None:
+        version = seed_version()
+
+    existing = {a.key_name: a for a in db.query(models.Achievement).all()}
+    for achievement_data in ACHIEVEMENTS_SEED:
+        fields = {k: v for k, v in achievement_data.items() if k != "requirements"}
+        achievement = existing.get(fields["key_name"])
+        if achievement is None:
+            achievement = models.Achievement(**fields)
             db.add(achievement)
-            db.flush()
+        else:
+            for key, value in fields.items():
+                setattr(achievement, key, value)
+
+        achievement.requirements = [
+            models.AchievementRequirement(**req_data)
+            for req_data in achievement_data["requirements"]
+        ]
+    db.flush()
+
+    backfill_achievements(db, recompute=False, report=lambda message: None)
+    # Titles, icons and points appear in every user's achievement list
+    resource_versions.bump_users(db, resource_versions.ACHIEVEMENTS)
 
-            for req_data in requirements_data:
-                requirement = models.AchievementRequirement(
-                    achievement_id=achievement.achievement_id, **req_data
-                )
-                db.add(requirement)
+    marker = db.get(models.SeedVersion, SEED_NAME)
+    if marker is None:
+        db.add(models.SeedVersion(name=SEED_NAME, version=version))
+    else:
+        marker.version = version
+    db.commit()
+    invalidate_rules()
+    achievement_catalog.invalidate()
+    return len(ACHIEVEMENTS_SEED)
 
-        db.commit()
-        print(f"✓ Successfully seeded {len(ACHIEVEMENTS_SEED)} achievements!")
+
+def ensure_achievement_seed(db: Session, versions: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Startup check: one indexed lookup when the seed is current (none when the
+    markers were already read, see schema.read_versions). Applies the seed
+    only when its version changed; returns True if it did.
+    """
+    version = seed_version()
+    applied = versions.get(SEED_NAME) if versions is not None else _applied_version(db)
+    if applied == version:
+        return False
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Workers booting together apply the seed once; the rest wait here
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SEED_LOCK_KEY})
+        if _applied_version(db) == version:
+            db.commit()
+            return False
+
+    apply_achievement_seed(db, version)
+    return True
+
+
+def seed_achievements():
+    """One-shot command: apply the achievement seed regardless of its version."""
+    db = SessionLocal()
+    try:
+        count = apply_achievement_seed(db)
+        print(f"✓ Applied {count} achievements (seed version {seed_version()[:12]})")
     except Exception as e:
         db.rollback()
         print(f"✗ Error: {e}")
+        raise
     finally:
         db.close()
 
 
 if __name__ == "__main__":
-    seed_achievements()
\ No newline at end of file
+    seed_achievements()
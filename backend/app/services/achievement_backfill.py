@@ -0,0 +1,212 @@
+"""
+Set-based initialization and recomputation of UserAchievement rows.
+
+Instead of one SELECT per (user, achievement) pair, each chunk of users is
+handled by a single INSERT ... SELECT with an ON CONFLICT upsert:
+
+- initialize: users x achievements, ON CONFLICT DO NOTHING
+- missing user_streaks rows: gaps-and-islands over completion days,
+  ON CONFLICT DO NOTHING (streaks.initialize_user_streaks)
+- recompute: per-user metrics (the same aggregates as achievement_rules)
+  joined to achievements, scored in SQL, ON CONFLICT DO UPDATE
+
+Usage (from the backend/ directory):
+    python -m app.services.achievement_backfill              # initialize + recompute
+    python -m app.services.achievement_backfill --init-only
+    python -m app.services.achievement_backfill --chunk-size 5000
+"""
+import argparse
+from datetime import date
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, case, false, func, literal, null, select, true
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..utils.timezone_utils import get_bangkok_today
+from ..utils.upsert import dialect_insert
+from . import resource_versions, streaks
+from .achievement_rules import METRICS, Rule, get_rules
+
+DEFAULT_CHUNK_SIZE = 1000
+
+UA = models.UserAchievement
+
+
+def _user_id_ranges(db: Session, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    low, high = db.query(func.min(models.User.user_id), func.max(models.User.user_id)).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield start, min(start + chunk_size - 1, high)
+
+
+def _least(expressions):
+    """LEAST() that renders on both PostgreSQL and SQLite."""
+    result = expressions[0]
+    for expression in expressions[1:]:
+        result = case((expression < result, expression), else_=result)
+    return result
+
+
+def _rule_progress(value, rule: Rule):
+    if rule.target_value <= 0:
+        return literal(100)
+    return case(
+        (value >= rule.target_value, 100),
+        else_=value * 100 // rule.target_value,
+    )
+
+
+def initialize_user_range(db: Session, low: int, high: int) -> int:
+    """Create missing UserAchievement rows for users in [low, high] (does not commit)."""
+    stmt = (
+        dialect_insert(db, UA)
+        .from_select(
+            ["user_id", "achievement_id", "progress", "progress_unit_value", "is_earned"],
+            select(
+                models.User.user_id,
+                models.Achievement.achievement_id,
+                literal(0),
+                literal(0),
+                false(),
+            )
+            .select_from(models.User)
+            .join(models.Achievement, true())
+            .where(models.User.user_id.between(low, high)),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "achievement_id"])
+    )
+    rows = db.execute(stmt).rowcount
+    if rows:
+        resource_versions.bump_users(db, resource_versions.ACHIEVEMENTS, low, high)
+    return rows
+
+
+def recompute_user_range(
+    db: Session,
+    low: int,
+    high: int,
+    rules: Optional[Dict[int, Tuple[Rule, ...]]] = None,
+    today: Optional[date] = None,
+) -> int:
+    """Upsert scored UserAchievement rows for users in [low, high] (does not commit)."""
+    if rules is None:
+        rules = get_rules(db)
+    if not rules:
+        return 0
+    if today is None:
+        today = get_bangkok_today()
+
+    # Streak metrics read user_streaks; create rows for users that predate it
+    streaks.initialize_user_streaks(db, low, high)
+
+    needed = sorted({rule.requirement_type for rs in rules.values() for rule in rs})
+    metrics = (
+        select(
+            models.User.user_id.label("user_id"),
+            *[
+                func.coalesce(METRICS[name](models.User.user_id, today), 0).label(name)
+                for name in needed
+            ],
+        )
+        .where(models.User.user_id.between(low, high))
+        .subquery("metrics")
+    )
+
+    progress, unit_value, earned = {}, {}, {}
+    for achievement_id, achievement_rules in rules.items():
+        values = [metrics.c[rule.requirement_type] for rule in achievement_rules]
+        progress[achievement_id] = _least(
+            [_rule_progress(v, r) for v, r in zip(values, achievement_rules)]
+        )
+        unit_value[achievement_id] = _least(values)
+        earned[achievement_id] = and_(
+            *[v >= r.target_value for v, r in zip(values, achievement_rules)]
+        )
+
+    achievement_id = models.Achievement.achievement_id
+    earned_expr = case(earned, value=achievement_id, else_=false())
+    scored = (
+        select(
+            metrics.c.user_id,
+            achievement_id,
+            case(progress, value=achievement_id, else_=0),
+            case(unit_value, value=achievement_id, else_=0),
+            earned_expr,
+            case((earned_expr, func.now()), else_=null()),
+        )
+        .select_from(metrics)
+        .join(models.Achievement, true())
+        .where(achievement_id.in_(list(rules)))
+    )
+
+    insert = dialect_insert(db, UA).from_select(
+        ["user_id", "achievement_id", "progress", "progress_unit_value", "is_earned", "earned_date"],
+        scored,
+    )
+    stmt = insert.on_conflict_do_update(
+        index_elements=["user_id", "achievement_id"],
+        set_={
+            "progress": insert.excluded.progress,
+            "progress_unit_value": insert.excluded.progress_unit_value,
+            # Earned achievements stay earned with their original date
+            "is_earned": UA.is_earned | insert.excluded.is_earned,
+            "earned_date": func.coalesce(UA.earned_date, insert.excluded.earned_date),
+        },
+    )
+    rows = db.execute(stmt).rowcount
+    resource_versions.bump_users(db, resource_versions.ACHIEVEMENTS, low, high)
+    return rows
+
+
+def backfill_achievements(
+    db: Session,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    recompute: bool = True,
+    report: Callable[[str], None] = print,
+) -> int:
+    """Initialize (and optionally recompute) achievements for every user, chunked by user_id."""
+    ranges = list(_user_id_ranges(db, chunk_size))
+    if not ranges:
+        report("No users to backfill")
+        return 0
+
+    last = ranges[-1][1]
+    rules = get_rules(db) if recompute else None
+    today = get_bangkok_today()
+    total = 0
+    for low, high in ranges:
+        rows = initialize_user_range(db, low, high)
+        if recompute:
+            rows = recompute_user_range(db, low, high, rules=rules, today=today)
+        db.commit()
+        total += rows
+        report(f"users {low}-{high}: {rows} rows ({high * 100 // last}%)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill UserAchievement rows for all users")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--init-only",
+        action="store_true",
+        help="only create missing rows, do not recompute progress",
+    )
+    args = parser.parse_args()
+
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        total = backfill_achievements(
+            db, chunk_size=args.chunk_size, recompute=not args.init_only
+        )
+        print(f"✓ Backfilled {total} user achievement rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
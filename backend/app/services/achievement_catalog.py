@@ -0,0 +1,100 @@
+"""
+Process-wide, in-memory copy of the achievement catalog.
+
+The catalog (achievements + requirements) only changes when the seed is
+applied, so it is loaded once (at startup, or on first use) and kept keyed
+by achievement_id and key_name. Every ACHIEVEMENT_CATALOG_CHECK_SECONDS the
+stored seed version is compared with the loaded one (one indexed lookup),
+so a seed applied by another process is picked up without a restart;
+apply_achievement_seed() invalidates the local copy directly.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from .. import models, schemas
+
+CHECK_SECONDS = float(os.getenv("ACHIEVEMENT_CATALOG_CHECK_SECONDS", "60"))
+# Cache-Control max-age for the catalog routes; clients revalidate by ETag afterwards
+MAX_AGE_SECONDS = int(os.getenv("ACHIEVEMENT_CATALOG_MAX_AGE", "86400"))
+
+SEED_NAME = "achievements"
+
+_list_adapter = TypeAdapter(Tuple[schemas.AchievementOut, ...])
+
+
+@dataclass(frozen=True)
+class Catalog:
+    version: Optional[str]
+    achievements: Tuple[schemas.AchievementOut, ...]
+    by_id: Dict[int, schemas.AchievementOut] = field(repr=False)
+    by_key: Dict[str, schemas.AchievementOut] = field(repr=False)
+    # GET /achievements response body, encoded once
+    list_json: bytes = field(repr=False)
+
+
+_catalog: Optional[Catalog] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def seed_version_query():
+    """SELECT of the applied achievement seed version (shared with achievement_rules)."""
+    return select(models.SeedVersion.version).where(models.SeedVersion.name == SEED_NAME)
+
+
+def _build(db: Session) -> Catalog:
+    version = db.execute(seed_version_query()).scalar()
+    rows = (
+        db.query(models.Achievement)
+        .options(selectinload(models.Achievement.requirements))
+        .order_by(models.Achievement.achievement_id)
+        .all()
+    )
+    achievements = tuple(schemas.AchievementOut.model_validate(a) for a in rows)
+    return Catalog(
+        version=version,
+        achievements=achievements,
+        by_id={a.achievement_id: a for a in achievements},
+        by_key={a.key_name: a for a in achievements},
+        list_json=_list_adapter.dump_json(achievements),
+    )
+
+
+def load(db: Session) -> Catalog:
+    """(Re)load the catalog from the database and make it current."""
+    global _catalog, _checked_at
+    catalog = _build(db)
+    with _lock:
+        _catalog, _checked_at = catalog, time.monotonic()
+    return catalog
+
+
+def invalidate():
+    """Drop the loaded catalog; the next get_catalog() reloads it."""
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+async def get_catalog(db: AsyncSession, refresh: bool = False) -> Catalog:
+    """
+    The current catalog. Touches the database only on first use, after
+    invalidate(), when refresh is set, or for the periodic version check.
+    """
+    global _checked_at
+    catalog = _catalog
+    if catalog is not None and not refresh:
+        if time.monotonic() - _checked_at < CHECK_SECONDS:
+            return catalog
+        if await db.scalar(seed_version_query()) == catalog.version:
+            _checked_at = time.monotonic()
+            return catalog
+    return await db.run_sync(load)
@@ -0,0 +1,197 @@
+"""
+Outbox-based achievement evaluation.
+
+Write endpoints call emit() inside their own transaction; a background worker
+drains the achievement_events table in batches, coalesces the events of each
+user and evaluates that user's affected achievements once. Request latency
+no longer includes achievement work.
+
+Each user is evaluated in its own SAVEPOINT, so one failing user does not
+hold back the rest of the batch. Their events stay in the outbox with the
+attempt count and last error in achievement_event_failures; after
+ACHIEVEMENT_EVENT_MAX_ATTEMPTS failures the worker skips them (dead letters:
+inspect the failures table, delete the row to retry).
+
+Run the worker in-process (started from main.lifespan unless
+ACHIEVEMENT_WORKER_ENABLED=0) or as its own process:
+    python -m app.services.achievement_events
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Set
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..utils.upsert import dialect_insert
+from .achievement_checker import (
+    GRATITUDE_REQUIREMENTS,
+    HABIT_REQUIREMENTS,
+    MOOD_REQUIREMENTS,
+    STREAK_REQUIREMENTS,
+)
+from .achievement_rules import evaluate_user_achievements
+
+logger = logging.getLogger(__name__)
+
+HABITS_CHANGED = "habits_changed"
+COMPLETIONS_CHANGED = "completions_changed"
+MOOD_CHANGED = "mood_changed"
+GRATITUDE_CHANGED = "gratitude_changed"
+
+# Requirement types to re-evaluate for each event type
+_EVENT_REQUIREMENTS = {
+    HABITS_CHANGED: HABIT_REQUIREMENTS,
+    COMPLETIONS_CHANGED: STREAK_REQUIREMENTS,
+    MOOD_CHANGED: MOOD_REQUIREMENTS,
+    GRATITUDE_CHANGED: GRATITUDE_REQUIREMENTS,
+}
+
+WORKER_ENABLED = os.getenv("ACHIEVEMENT_WORKER_ENABLED", "1") == "1"
+WORKER_INTERVAL_SECONDS = float(os.getenv("ACHIEVEMENT_WORKER_INTERVAL", "2"))
+WORKER_BATCH_SIZE = int(os.getenv("ACHIEVEMENT_WORKER_BATCH_SIZE", "500"))
+MAX_ATTEMPTS = int(os.getenv("ACHIEVEMENT_EVENT_MAX_ATTEMPTS", "5"))
+
+
+def emit(db: Session, user_id: int, event_type: str):
+    """Queue an event in the caller's transaction (does not commit)."""
+    if event_type not in _EVENT_REQUIREMENTS:
+        raise ValueError(f"Unknown achievement event type: {event_type}")
+    db.add(models.AchievementEvent(user_id=user_id, event_type=event_type))
+
+
+def evaluate_user_events(db: Session, pending: Dict[int, Set[str]]):
+    """Evaluate each user once for the union of their events (does not commit)."""
+    for user_id, event_types in pending.items():
+        requirement_types = set()
+        for event_type in event_types:
+            requirement_types |= _EVENT_REQUIREMENTS[event_type]
+        evaluate_user_achievements(db, user_id, requirement_types, commit=False)
+
+
+def _record_failure(db: Session, events: List[models.AchievementEvent], error: Exception):
+    """Count a failed attempt on each event (does not commit)."""
+    F = models.AchievementEventFailure
+    stmt = dialect_insert(db, F).values(
+        [
+            {
+                "event_id": event.event_id,
+                "attempts": 1,
+                "last_error": repr(error)[:1000],
+                "failed_at": datetime.utcnow(),
+            }
+            for event in events
+        ]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["event_id"],
+            set_={
+                "attempts": F.attempts + 1,
+                "last_error": stmt.excluded.last_error,
+                "failed_at": stmt.excluded.failed_at,
+            },
+        )
+    )
+
+
+def process_pending_events(db: Session, batch_size: int = WORKER_BATCH_SIZE) -> int:
+    """
+    Claim up to batch_size events, evaluate them coalesced per user and
+    delete them, committing once. Returns the number of events claimed.
+    SKIP LOCKED lets several workers drain the outbox concurrently. A user
+    whose evaluation raises is rolled back to its savepoint and their events
+    are kept with a failed attempt recorded; events at MAX_ATTEMPTS are not
+    claimed any more.
+    """
+    E, F = models.AchievementEvent, models.AchievementEventFailure
+    events = (
+        db.query(E)
+        .filter(~exists().where(F.event_id == E.event_id, F.attempts >= MAX_ATTEMPTS))
+        .order_by(E.event_id.asc())
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not events:
+        db.rollback()
+        return 0
+
+    by_user: Dict[int, List[models.AchievementEvent]] = defaultdict(list)
+    for event in events:
+        by_user[event.user_id].append(event)
+
+    failed = 0
+    try:
+        for user_id, user_events in by_user.items():
+            try:
+                with db.begin_nested():
+                    evaluate_user_events(db, {user_id: {e.event_type for e in user_events}})
+                    for event in user_events:
+                        db.delete(event)
+            except Exception as e:
+                logger.exception("Achievement evaluation failed for user %s", user_id)
+                _record_failure(db, user_events, e)
+                failed += len(user_events)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.debug(
+        "Processed %d achievement events for %d users (%d failed)", len(events), len(by_user), failed
+    )
+    return len(events)
+
+
+def _drain_once(batch_size: int) -> int:
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return process_pending_events(db, batch_size)
+    finally:
+        db.close()
+
+
+async def run_worker(
+    stop: asyncio.Event,
+    interval: float = WORKER_INTERVAL_SECONDS,
+    batch_size: int = WORKER_BATCH_SIZE,
+):
+    """Drain the outbox until `stop` is set; DB work runs off the event loop."""
+    while not stop.is_set():
+        try:
+            handled = await asyncio.to_thread(_drain_once, batch_size)
+        except Exception:
+            logger.exception("Achievement worker batch failed")
+            handled = 0
+
+        # A full batch means there is probably more waiting
+        if handled < batch_size:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+def main():
+    from ..logging_config import configure_logging
+
+    configure_logging()
+    logger.info("Achievement worker started (interval=%ss)", WORKER_INTERVAL_SECONDS)
+    try:
+        while True:
+            if _drain_once(WORKER_BATCH_SIZE) < WORKER_BATCH_SIZE:
+                time.sleep(WORKER_INTERVAL_SECONDS)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
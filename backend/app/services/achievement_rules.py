@@ -0,0 +1,225 @@
+"""
+Data-driven achievement rules.
+
+Every AchievementRequirement row names a requirement_type and a target_value.
+Each requirement_type maps to one aggregate (a scalar subquery per user), so
+evaluating all of a user's achievements is a single SELECT that returns their
+UserAchievement rows together with every metric the rules need. Adding
+achievements does not add queries; adding a requirement type means adding one
+entry to METRICS.
+
+Rules are read from the database once and cached per process, tagged with
+the achievement seed version. Like the catalog, every
+ACHIEVEMENT_CATALOG_CHECK_SECONDS the stored seed version is compared with
+the cached one, so a seed applied by another process or replica is picked
+up without a restart; invalidate_rules() drops the local copy directly
+(seeding does this).
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, distinct, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..utils.timezone_utils import get_bangkok_today
+from . import achievement_catalog, resource_versions, streaks
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rule:
+    requirement_type: str
+    target_value: int
+
+
+def _count(column, user_column, user_id, *criteria):
+    return (
+        select(func.count(column))
+        .where(user_column == user_id, *criteria)
+        .scalar_subquery()
+    )
+
+
+# requirement_type -> builder(user_id, today) returning a scalar subquery.
+# user_id may be a Python int or a column (for set-based evaluation).
+METRICS: Dict[str, Callable] = {
+    "habit_count": lambda user_id, today: _count(
+        models.Habit.habit_id,
+        models.Habit.user_id,
+        user_id,
+        models.Habit.is_active == True,  # noqa: E712
+    ),
+    "total_habits": lambda user_id, today: _count(
+        models.Habit.habit_id, models.Habit.user_id, user_id
+    ),
+    "gratitude_entries": lambda user_id, today: _count(
+        models.GratitudeEntry.gratitude_id, models.GratitudeEntry.user_id, user_id
+    ),
+    "mood_logs": lambda user_id, today: _count(
+        models.MoodLog.mood_id, models.MoodLog.user_id, user_id
+    ),
+    "total_completions": lambda user_id, today: _count(
+        models.HabitCompletion.completion_id, models.HabitCompletion.user_id, user_id
+    ),
+    "days_tracked": lambda user_id, today: _count(
+        distinct(models.HabitCompletion.completed_on),
+        models.HabitCompletion.user_id,
+        user_id,
+    ),
+    # NULL when the user has no streak row yet (see evaluate_user_achievements)
+    "streak_days": lambda user_id, today: (
+        select(
+            case(
+                (models.UserStreak.last_completed_on == today, models.UserStreak.current_streak),
+                else_=0,
+            )
+        )
+        .where(models.UserStreak.user_id == user_id)
+        .scalar_subquery()
+    ),
+}
+
+@dataclass(frozen=True)
+class _LoadedRules:
+    version: Optional[str]
+    rules: Dict[int, Tuple[Rule, ...]]
+
+
+_loaded: Optional[_LoadedRules] = None
+_checked_at = 0.0
+_rules_lock = threading.Lock()
+
+
+def _load_rules(db: Session) -> _LoadedRules:
+    version = db.execute(achievement_catalog.seed_version_query()).scalar()
+    loaded: Dict[int, list] = {}
+    requirements = db.query(
+        models.AchievementRequirement.achievement_id,
+        models.AchievementRequirement.requirement_type,
+        models.AchievementRequirement.target_value,
+    ).order_by(models.AchievementRequirement.requirement_id)
+    for achievement_id, requirement_type, target_value in requirements:
+        if requirement_type not in METRICS:
+            logger.warning(
+                "Ignoring unknown requirement_type %r (achievement %s)",
+                requirement_type,
+                achievement_id,
+            )
+            continue
+        loaded.setdefault(achievement_id, []).append(Rule(requirement_type, target_value or 0))
+    return _LoadedRules(version, {aid: tuple(rules) for aid, rules in loaded.items()})
+
+
+def get_rules(db: Session) -> Dict[int, Tuple[Rule, ...]]:
+    """
+    achievement_id -> rules. Touches the database only on first use, after
+    invalidate_rules(), or for the periodic seed version check.
+    """
+    global _loaded, _checked_at
+    current = _loaded
+    if current is not None:
+        if time.monotonic() - _checked_at < achievement_catalog.CHECK_SECONDS:
+            return current.rules
+        if db.execute(achievement_catalog.seed_version_query()).scalar() == current.version:
+            _checked_at = time.monotonic()
+            return current.rules
+
+    with _rules_lock:
+        if _loaded is None or _loaded is current:
+            _loaded, _checked_at = _load_rules(db), time.monotonic()
+        return _loaded.rules
+
+
+def invalidate_rules():
+    """Drop the cached rules; the next evaluation reloads them."""
+    global _loaded
+    with _rules_lock:
+        _loaded = None
+
+
+def score(rules: Iterable[Rule], values: Dict[str, int]) -> Tuple[int, int, bool]:
+    """
+    Progress (0-100), progress unit value and earned flag for one achievement.
+    With several requirements the least complete one decides. Integer
+    arithmetic keeps this identical to the SQL scoring in achievement_backfill.
+    """
+    progress = 100
+    unit_value = None
+    for rule in rules:
+        value = values.get(rule.requirement_type) or 0
+        if rule.target_value > 0:
+            progress = min(progress, value * 100 // rule.target_value)
+        unit_value = value if unit_value is None else min(unit_value, value)
+    return progress, unit_value or 0, progress >= 100
+
+
+def evaluate_user_achievements(
+    db: Session,
+    user_id: int,
+    requirement_types: Optional[Iterable[str]] = None,
+    commit: bool = True,
+    today: Optional[date] = None,
+):
+    """
+    Recompute progress for the user's achievements whose rules use any of
+    requirement_types (all achievements when None). Earned achievements stay
+    earned.
+    """
+    rules = get_rules(db)
+    if requirement_types is not None:
+        wanted = set(requirement_types)
+        rules = {
+            aid: achievement_rules
+            for aid, achievement_rules in rules.items()
+            if any(rule.requirement_type in wanted for rule in achievement_rules)
+        }
+    if not rules:
+        return
+
+    if today is None:
+        today = get_bangkok_today()
+    needed = sorted({rule.requirement_type for rs in rules.values() for rule in rs})
+    metric_columns = [METRICS[name](user_id, today).label(name) for name in needed]
+
+    # One round trip: the user's progress rows plus every metric they need
+    rows = (
+        db.query(models.UserAchievement, *metric_columns)
+        .filter(
+            models.UserAchievement.user_id == user_id,
+            models.UserAchievement.achievement_id.in_(list(rules)),
+        )
+        .all()
+    )
+
+    values = None
+    changed = False
+    for row in rows:
+        if values is None:
+            values = dict(zip(needed, row[1:]))
+            if "streak_days" in values and values["streak_days"] is None:
+                values["streak_days"] = streaks.current_user_streak(db, user_id, today)
+
+        user_achievement = row[0]
+        progress, unit_value, earned = score(rules[user_achievement.achievement_id], values)
+        if (progress, unit_value) != (user_achievement.progress, user_achievement.progress_unit_value):
+            user_achievement.progress = progress
+            user_achievement.progress_unit_value = unit_value
+            changed = True
+        if earned and not user_achievement.is_earned:
+            user_achievement.is_earned = True
+            user_achievement.earned_date = func.now()
+            changed = True
+
+    if changed:
+        resource_versions.bump(db, user_id, resource_versions.ACHIEVEMENTS)
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
@@ -0,0 +1,173 @@
+"""
+WebP thumbnail and medium variants of uploaded images.
+
+After an upload is stored, its variants are rendered on a small dedicated
+thread pool (Pillow releases the GIL while decoding and encoding), so the
+upload request does not wait for them. A variant is stored next to its
+original under "<key>.<variant>.webp" and, like the original, is never
+rewritten, so VariantStaticFiles serves everything under /uploads as
+immutable (the S3 backend sets the same Cache-Control on the objects). With
+local storage, until a variant exists (still rendering, or Pillow is not
+installed) its URL falls back to the original, uncached, so clients can
+always use the variant URLs returned by the API.
+
+Pillow is optional: without it no variants are rendered.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import StaticFiles
+
+from .. import metrics
+from .storage import IMMUTABLE, get_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is optional
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+# Variant name -> longest edge in pixels (images are never upscaled)
+VARIANTS: Dict[str, int] = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIZE", "256")),
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIZE", "1024")),
+}
+
+jobs_total = metrics.counter("image_variant_jobs_total", "Uploads whose variants were rendered")
+failures_total = metrics.counter(
+    "image_variant_failures_total", "Uploads whose variants could not be rendered"
+)
+run_seconds = metrics.histogram("image_variant_run_seconds", "Time spent rendering an upload's variants")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return Image is not None
+
+
+def variant_key(key: str, variant: str) -> str:
+    return f"{key}.{variant}.webp"
+
+
+def variant_url(url: Optional[str], variant: str) -> Optional[str]:
+    """URL of a variant of an uploaded image URL (relative or absolute); None for anything else."""
+    if get_storage().key_for_url(url) is None:
+        return None
+    return f"{url}.{variant}.webp"
+
+
+def original_of(path: str) -> Optional[str]:
+    """The original's path for a variant path, or None if path is not a variant."""
+    for variant in VARIANTS:
+        suffix = f".{variant}.webp"
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return None
+
+
+def _save_webp(image, key: str):
+    storage = get_storage()
+    fd, tmp_path = tempfile.mkstemp(dir=storage.staging_dir(), prefix=".variant-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, format="WEBP", quality=WEBP_QUALITY, method=4)
+        storage.put_file(key, tmp_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def generate_variants(key: str) -> Dict[str, str]:
+    """Render and store every variant of the stored image key; returns {variant: key}. Blocking."""
+    if Image is None:
+        return {}
+    started = time.perf_counter()
+    try:
+        with get_storage().local_copy(key) as path, Image.open(path) as image:
+            # Let JPEG decode at reduced scale when the largest variant allows it
+            image.draft("RGB", (max(VARIANTS.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            has_alpha = "A" in image.getbands() or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+            written = {}
+            # Largest first, each variant resized from the previous one
+            for variant, size in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+                image.thumbnail((size, size), Image.LANCZOS)
+                written[variant] = variant_key(key, variant)
+                _save_webp(image, written[variant])
+    except Exception:
+        failures_total.inc()
+        logger.exception("Could not render variants of %s", key)
+        return {}
+    finally:
+        run_seconds.observe(time.perf_counter() - started)
+    jobs_total.inc()
+    return written
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="image-variants")
+        return _executor
+
+
+def schedule(key: str) -> Optional[Future]:
+    """Render the variants of the stored upload key in the background."""
+    if Image is None:
+        return None
+    return _get_executor().submit(generate_variants, key)
+
+
+def shutdown():
+    """Finish queued renders and stop the workers; a later job starts a new pool."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def remove_variants(key: str):
+    """Delete the stored variants of key, if any."""
+    storage = get_storage()
+    for variant in VARIANTS:
+        storage.delete(variant_key(key, variant))
+
+
+class VariantStaticFiles(StaticFiles):
+    """
+    StaticFiles for /uploads: stored files get a year-long immutable
+    Cache-Control, and a variant that does not exist yet is answered with
+    its original (not cached, so the variant is fetched once it exists).
+    """
+
+    async def get_response(self, path: str, scope):
+        try:
+            response = await super().get_response(path, scope)
+        except HTTPException as e:
+            original = original_of(path)
+            if e.status_code != 404 or original is None:
+                raise
+            response = await super().get_response(original, scope)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
@@ -0,0 +1,115 @@
+"""
+Dedicated, bounded pool for bcrypt work.
+
+Password hashing and verification are deliberately slow. Run in Starlette's
+shared threadpool, a burst of logins occupies every thread and stalls all
+other sync endpoints. Here bcrypt runs on its own small thread pool (bcrypt
+releases the GIL) and at most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT
+jobs are admitted at once; beyond that callers get PasswordHashingBusy and
+the route answers 503 so clients back off.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from .. import metrics
+from ..security import hash_password, verify_and_update_password
+
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+
+jobs_total = metrics.counter("password_hash_jobs_total", "Hash/verify jobs run")
+rejected_total = metrics.counter(
+    "password_hash_rejected_total", "Jobs refused because the pool queue was full"
+)
+queue_seconds = metrics.histogram(
+    "password_hash_queue_seconds", "Time a job waited for a hashing worker"
+)
+run_seconds = metrics.histogram(
+    "password_hash_run_seconds",
+    "Time spent hashing or verifying",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full."""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="password-hash")
+        return _executor
+
+
+def shutdown():
+    """Stop the workers (app shutdown); a later job starts a new pool."""
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _admit():
+    global _pending
+    with _lock:
+        if _pending >= WORKERS + QUEUE_LIMIT:
+            rejected_total.inc()
+            raise PasswordHashingBusy()
+        _pending += 1
+
+
+def _release():
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+async def _run(fn: Callable, *args):
+    _admit()
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        queue_seconds.observe(started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            run_seconds.observe(time.perf_counter() - started)
+            jobs_total.inc()
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), job)
+    finally:
+        _release()
+
+
+async def hash_password_async(plain_password: str) -> str:
+    return await _run(hash_password, plain_password)
+
+
+async def verify_and_update_async(
+    plain_password: str, password_hash: str
+) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored hash needs an upgrade."""
+    return await _run(verify_and_update_password, plain_password, password_hash)
+
+
+def pool_status() -> dict:
+    return {
+        "workers": WORKERS,
+        "queue_limit": QUEUE_LIMIT,
+        "pending": _pending,
+        "metrics": metrics.snapshot("password_hash_"),
+    }
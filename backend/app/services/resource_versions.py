@@ -0,0 +1,86 @@
+"""
+Per-user version counters for groups of read endpoints.
+
+Every write that changes what a user's GET endpoints return bumps the
+matching counter in the same transaction; the counter (plus the time of the
+bump) is the validator for conditional GETs (see app/http_cache.py), so an
+unchanged poll is answered from one primary-key lookup. None of these
+functions commit.
+
+    HABITS        /habits/... (habits, categories, sessions, completions)
+    MOOD          /mood/...
+    GRATITUDE     /gratitude/...
+    ACHIEVEMENTS  /achievements/user/...
+"""
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import literal, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..utils.upsert import dialect_insert
+
+HABITS = "habits"
+MOOD = "mood"
+GRATITUDE = "gratitude"
+ACHIEVEMENTS = "achievements"
+
+RV = models.ResourceVersion
+
+
+def _now() -> datetime:
+    """Naive UTC, whole seconds (HTTP dates have no sub-second part)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def _on_conflict_increment(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "resource"],
+        set_={"version": RV.version + 1, "updated_at": stmt.excluded.updated_at},
+    )
+
+
+def bump(db: Session, user_id: int, *resources: str):
+    """Mark the user's resources as changed."""
+    if not resources:
+        return
+    now = _now()
+    stmt = dialect_insert(db, RV).values([
+        {"user_id": user_id, "resource": resource, "version": 1, "updated_at": now}
+        for resource in resources
+    ])
+    db.execute(_on_conflict_increment(stmt))
+
+
+def bump_users(db: Session, resource: str, low: Optional[int] = None, high: Optional[int] = None):
+    """Mark a resource as changed for every user (or users in [low, high]) in one statement."""
+    users = select(
+        models.User.user_id,
+        literal(resource),
+        literal(1),
+        literal(_now()),
+    )
+    # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+    users = users.where(true() if low is None else models.User.user_id.between(low, high))
+    stmt = dialect_insert(db, RV).from_select(
+        ["user_id", "resource", "version", "updated_at"], users
+    )
+    db.execute(_on_conflict_increment(stmt))
+
+
+async def current(
+    db: AsyncSession, user_id: int, resource: str
+) -> Tuple[int, Optional[datetime]]:
+    """(version, updated_at); (0, None) for a resource that was never written."""
+    row = (
+        await db.execute(
+            select(RV.version, RV.updated_at).where(
+                RV.user_id == user_id, RV.resource == resource
+            )
+        )
+    ).first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
@@ -0,0 +1,240 @@
+"""
+Per-user daily totals (daily_user_rollup) for progress reports.
+
+One row per (user, day) holds the number of habit completions, the planned /
+actual session seconds, the number of sessions done and the mood score.
+The write paths keep it current with small upserts in the same transaction
+as the change itself, so reports read O(days) rows instead of scanning
+habit_completions / habit_sessions. None of these functions commit.
+
+Rows are never removed by the incremental path; a day whose activity was
+undone is left at zero, which reports treat the same as a missing row.
+
+Usage (from the backend/ directory):
+    python -m app.services.rollups                 # rebuild every user
+    python -m app.services.rollups --user-id 42
+"""
+import argparse
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from sqlalchemy import Integer, case, cast, delete, func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..utils.upsert import dialect_insert
+
+DEFAULT_CHUNK_SIZE = 1000
+
+Rollup = models.DailyUserRollup
+
+COUNTERS = ("completions", "planned_seconds", "actual_seconds", "sessions_done")
+
+
+def _bump(db: Session, user_id: int, day: date, deltas: Dict[str, int]):
+    """Add deltas to the (user_id, day) row, creating it if needed."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    values = {name: 0 for name in COUNTERS}
+    values.update(deltas)
+    stmt = dialect_insert(db, Rollup).values(user_id=user_id, day=day, **values)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={name: getattr(Rollup, name) + stmt.excluded[name] for name in deltas},
+        )
+    )
+
+
+def add_completion(db: Session, user_id: int, day: date, delta: int = 1):
+    """A completion was logged (+1) or removed (-1) on day."""
+    _bump(db, user_id, day, {"completions": delta})
+
+
+def session_totals(session: Optional[models.HabitSession]) -> Dict[str, int]:
+    """The rollup counters one session contributes to its day."""
+    if session is None:
+        return {name: 0 for name in COUNTERS if name != "completions"}
+    return {
+        "planned_seconds": session.planned_duration_seconds or 0,
+        "actual_seconds": session.actual_duration_seconds or 0,
+        "sessions_done": 1 if session.status == "done" else 0,
+    }
+
+
+def apply_session_change(
+    db: Session,
+    user_id: int,
+    day: date,
+    before: Dict[str, int],
+    after: Dict[str, int],
+):
+    """
+    Apply the difference between two session_totals() snapshots.
+    Creating a session is before=session_totals(None), deleting one is after=session_totals(None).
+    """
+    _bump(db, user_id, day, {name: after[name] - before[name] for name in after})
+
+
+def set_mood(db: Session, user_id: int, day: date, mood_score: Optional[int]):
+    """Record the day's mood score (None once the mood log is deleted)."""
+    values = {name: 0 for name in COUNTERS}
+    stmt = dialect_insert(db, Rollup).values(
+        user_id=user_id, day=day, mood_score=mood_score, **values
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "day"],
+            set_={"mood_score": stmt.excluded.mood_score},
+        )
+    )
+
+
+def habit_days(db: Session, habit_id: int) -> Set[date]:
+    """Days a habit contributes to; collect them before deleting the habit."""
+    completed = db.query(models.HabitCompletion.completed_on).filter(
+        models.HabitCompletion.habit_id == habit_id
+    )
+    sessions = db.query(models.HabitSession.session_date).filter(
+        models.HabitSession.habit_id == habit_id
+    )
+    return {day for (day,) in completed.union(sessions)}
+
+
+def _zero():
+    return literal(0, Integer)
+
+
+def _daily_totals(low: int, high: int, days: Optional[Iterable[date]] = None):
+    """SELECT user_id, day, <counters>, mood_score for users in [low, high]."""
+    HC, HS, ML = models.HabitCompletion, models.HabitSession, models.MoodLog
+    no_mood = cast(null(), Integer)
+
+    completions = select(
+        HC.user_id,
+        HC.completed_on.label("day"),
+        func.count().label("completions"),
+        _zero().label("planned_seconds"),
+        _zero().label("actual_seconds"),
+        _zero().label("sessions_done"),
+        no_mood.label("mood_score"),
+    ).where(HC.user_id.between(low, high))
+
+    sessions = select(
+        HS.user_id,
+        HS.session_date,
+        _zero(),
+        func.sum(HS.planned_duration_seconds),
+        func.sum(func.coalesce(HS.actual_duration_seconds, 0)),
+        func.sum(case((HS.status == "done", 1), else_=0)),
+        no_mood,
+    ).where(HS.user_id.between(low, high))
+
+    moods = select(
+        ML.user_id,
+        ML.logged_on,
+        _zero(),
+        _zero(),
+        _zero(),
+        _zero(),
+        ML.mood_score,
+    ).where(ML.user_id.between(low, high))
+
+    if days is not None:
+        days = list(days)
+        completions = completions.where(HC.completed_on.in_(days))
+        sessions = sessions.where(HS.session_date.in_(days))
+        moods = moods.where(ML.logged_on.in_(days))
+
+    parts = union_all(
+        completions.group_by(HC.user_id, HC.completed_on),
+        sessions.group_by(HS.user_id, HS.session_date),
+        moods,
+    ).subquery()
+
+    return select(
+        parts.c.user_id,
+        parts.c.day,
+        func.sum(parts.c.completions),
+        func.sum(parts.c.planned_seconds),
+        func.sum(parts.c.actual_seconds),
+        func.sum(parts.c.sessions_done),
+        func.max(parts.c.mood_score),
+    ).group_by(parts.c.user_id, parts.c.day)
+
+
+def rebuild_range(
+    db: Session, low: int, high: int, days: Optional[Iterable[date]] = None
+) -> int:
+    """
+    Recompute rollup rows for users in [low, high] (optionally only some days)
+    from the source tables. Returns the number of rows written; does not commit.
+    """
+    if days is not None:
+        days = list(days)
+        if not days:
+            return 0
+
+    stmt = delete(Rollup).where(Rollup.user_id.between(low, high))
+    if days is not None:
+        stmt = stmt.where(Rollup.day.in_(days))
+    db.execute(stmt)
+
+    insert = dialect_insert(db, Rollup).from_select(
+        ["user_id", "day", *COUNTERS, "mood_score"],
+        _daily_totals(low, high, days),
+    )
+    return db.execute(insert).rowcount
+
+
+def rebuild_days(db: Session, user_id: int, days: Iterable[date]) -> int:
+    """Recompute a user's rows for the given days (e.g. after deleting a habit)."""
+    return rebuild_range(db, user_id, user_id, days)
+
+
+def _user_id_ranges(db: Session, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    low, high = db.query(func.min(models.User.user_id), func.max(models.User.user_id)).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield start, min(start + chunk_size - 1, high)
+
+
+def rebuild_all(
+    db: Session,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    report: Callable[[str], None] = print,
+) -> int:
+    """Rebuild the whole table, committing once per chunk of users."""
+    total = 0
+    for low, high in _user_id_ranges(db, chunk_size):
+        written = rebuild_range(db, low, high)
+        db.commit()
+        total += written
+        report(f"users {low}-{high}: {written} rows")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild daily_user_rollup from the source tables")
+    parser.add_argument("--user-id", type=int, help="Rebuild a single user")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.user_id is not None:
+            written = rebuild_range(db, args.user_id, args.user_id)
+            db.commit()
+        else:
+            written = rebuild_all(db, chunk_size=args.chunk_size)
+        print(f"Rebuilt {written} rollup rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Blob storage for uploads: local disk or an S3-compatible bucket.
+
+Objects are addressed by a key such as "3f/3fa9...c1.png" (see uploads.py),
+and each backend maps keys to public URLs and back:
+
+    local  UPLOAD_ROOT/<key>, served by the API at /uploads/<key>
+    s3     s3://S3_BUCKET/S3_PREFIX<key>, served at S3_PUBLIC_BASE_URL/S3_PREFIX<key>
+           (S3_ENDPOINT_URL selects MinIO or another S3-compatible service)
+
+STORAGE_BACKEND picks the backend (default local). With s3 every API
+replica reads and writes the same bucket, so any replica can serve any
+image. Objects are written once under a content-derived key and never
+changed, so they are stored with an immutable Cache-Control.
+
+boto3 is needed only for the s3 backend.
+"""
+import abc
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import ContextManager, Iterable, Iterator, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - boto3 is optional
+    boto3 = None
+    ClientError = Exception
+
+BACKEND = os.getenv("STORAGE_BACKEND", "local")
+# Local backend: directory served at UPLOAD_URL_PREFIX (see main.py)
+UPLOAD_ROOT = os.getenv("UPLOAD_ROOT", "uploads")
+UPLOAD_URL_PREFIX = "/uploads"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+
+def content_type(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    # Aware UTC; last write or touch()
+    modified: datetime
+
+
+class Storage(abc.ABC):
+    """Backend interface. Keys are relative, "/"-separated paths."""
+
+    @abc.abstractmethod
+    def staging_dir(self) -> str:
+        """Directory for temporary files that will be passed to put_file()."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def modified(self, key: str) -> Optional[datetime]:
+        """Aware UTC time of key's last write or touch(); None if it does not exist."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def put_file(self, key: str, path: str):
+        """Store the file at path under key. The file is consumed (moved or removed)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove key; False if it did not exist."""
+        raise NotImplementedError
+
+    def delete_many(self, keys: Iterable[str]):
+        """Remove several keys (missing ones are ignored)."""
+        for key in keys:
+            self.delete(key)
+
+    @abc.abstractmethod
+    def touch(self, key: str):
+        """Mark key as just written (keeps a reused object out of the GC grace window)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def iter_objects(self) -> Iterator[StoredObject]:
+        """Every stored object, streamed in backend order."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL of key."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        """Inverse of url() (relative or absolute form); None for URLs this backend does not serve."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def local_copy(self, key: str) -> ContextManager[str]:
+        """Context manager giving a local file path with key's content."""
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """Files under root, served by the API's /uploads mount."""
+
+    def __init__(self, root: str = UPLOAD_ROOT):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        root = os.path.normpath(self.root)
+        path = os.path.normpath(os.path.join(root, key))
+        # Never follow a key outside the upload directory
+        if os.path.commonpath([path, root]) != root or path == root:
+            raise ValueError(f"Invalid storage key: {key!r}")
+        return path
+
+    def staging_dir(self) -> str:
+        # Same filesystem as the destination, so put_file() is a rename
+        directory = os.path.join(self.root, ".staging")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self._path(key))
+
+    def modified(self, key: str) -> Optional[datetime]:
+        try:
+            mtime = os.stat(self._path(key)).st_mtime
+        except FileNotFoundError:
+            return None
+        return datetime.fromtimestamp(mtime, timezone.utc)
+
+    def put_file(self, key: str, path: str):
+        destination = self._path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def touch(self, key: str):
+        os.utime(self._path(key))
+
+    def iter_objects(self) -> Iterator[StoredObject]:
+        pending = [self.root]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        yield StoredObject(
+                            key=os.path.relpath(entry.path, self.root).replace(os.sep, "/"),
+                            size=stat.st_size,
+                            modified=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+                        )
+
+    def url(self, key: str) -> str:
+        return f"{UPLOAD_URL_PREFIX}/{key}"
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        if not url:
+            return None
+        path = urlsplit(url).path
+        if not path.startswith(UPLOAD_URL_PREFIX + "/"):
+            return None
+        key = path[len(UPLOAD_URL_PREFIX) + 1:]
+        try:
+            self._path(key)
+        except ValueError:
+            return None
+        return key
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        yield self._path(key)
+
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket, served from public_base_url."""
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        public_base_url: Optional[str] = None,
+        client=None,
+    ):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires boto3")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        if public_base_url is None:
+            public_base_url = (
+                f"{endpoint_url.rstrip('/')}/{bucket}"
+                if endpoint_url
+                else f"https://{bucket}.s3.amazonaws.com"
+            )
+        self.public_base_url = public_base_url.rstrip("/")
+
+    def _object(self, key: str) -> str:
+        return self.prefix + key
+
+    def staging_dir(self) -> str:
+        return tempfile.gettempdir()
+
+    def exists(self, key: str) -> bool:
+        return self.modified(key) is not None
+
+    def modified(self, key: str) -> Optional[datetime]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["LastModified"]
+
+    def put_file(self, key: str, path: str):
+        try:
+            self.client.upload_file(
+                path,
+                self.bucket,
+                self._object(key),
+                ExtraArgs={"ContentType": content_type(key), "CacheControl": IMMUTABLE},
+            )
+        finally:
+            os.remove(path)
+
+    def delete(self, key: str) -> bool:
+        if not self.exists(key):
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._object(key))
+        return True
+
+    def delete_many(self, keys: Iterable[str]):
+        keys = list(keys)
+        # DeleteObjects takes at most 1000 keys
+        for start in range(0, len(keys), 1000):
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={
+                    "Objects": [{"Key": self._object(k)} for k in keys[start:start + 1000]],
+                    "Quiet": True,
+                },
+            )
+
+    def touch(self, key: str):
+        # A copy onto itself is the only way to refresh LastModified
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=self._object(key),
+            CopySource={"Bucket": self.bucket, "Key": self._object(key)},
+            MetadataDirective="REPLACE",
+            ContentType=content_type(key),
+            CacheControl=IMMUTABLE,
+        )
+
+    def iter_objects(self) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                yield StoredObject(
+                    key=item["Key"][len(self.prefix):],
+                    size=item["Size"],
+                    modified=item["LastModified"],
+                )
+
+    def url(self, key: str) -> str:
+        return f"{self.public_base_url}/{self._object(key)}"
+
+    def key_for_url(self, url: Optional[str]) -> Optional[str]:
+        base = f"{self.public_base_url}/{self.prefix}"
+        if not url or not url.startswith(base):
+            return None
+        return url[len(base):] or None
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        fd, path = tempfile.mkstemp(suffix="." + key.rsplit(".", 1)[-1])
+        try:
+            with os.fdopen(fd, "wb") as out:
+                self.client.download_fileobj(self.bucket, self._object(key), out)
+            yield path
+        finally:
+            os.remove(path)
+
+
+_storage: Optional[Storage] = None
+_lock = threading.Lock()
+
+
+def _from_env() -> Storage:
+    if BACKEND == "local":
+        return LocalStorage(UPLOAD_ROOT)
+    if BACKEND == "s3":
+        return S3Storage(
+            bucket=os.environ["S3_BUCKET"],
+            prefix=os.getenv("S3_PREFIX", ""),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            region=os.getenv("S3_REGION") or None,
+            public_base_url=os.getenv("S3_PUBLIC_BASE_URL") or None,
+        )
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {BACKEND!r}")
+
+
+def get_storage() -> Storage:
+    """The configured backend (built from the environment on first use)."""
+    global _storage
+    with _lock:
+        if _storage is None:
+            _storage = _from_env()
+        return _storage
+
@@ -0,0 +1,294 @@
+"""
+Incremental streak tracking for habits and users.
+
+HabitStreak / UserStreak rows hold the length of the run of consecutive days
+ending on last_completed_on plus the best run seen. Marking or unmarking a day
+at the end of the run is applied in O(1); anything else (backfilled dates,
+deleting a day inside a run, shrinking the best run) falls back to a rebuild
+from the completion history. None of these functions commit: call them after
+the completion row has been added or deleted, inside the same transaction.
+"""
+from datetime import date, timedelta
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..utils.sql_dates import day_number
+from ..utils.timezone_utils import get_bangkok_today
+from ..utils.upsert import dialect_insert
+
+ONE_DAY = timedelta(days=1)
+
+
+def _walk_runs(days: Iterable[date]) -> Tuple[int, int, Optional[date]]:
+    """
+    Walk distinct dates in ascending order.
+    Returns (length of the run ending on the last date, best run, last date).
+    """
+    current = best = 0
+    last = None
+    for day in days:
+        if last is not None and day - last == ONE_DAY:
+            current += 1
+        else:
+            current = 1
+        best = max(best, current)
+        last = day
+    return current, best, last
+
+
+def _advance(streak, day: date) -> bool:
+    """Apply a newly completed day. Returns False if a rebuild is needed."""
+    last = streak.last_completed_on
+    if last is None or day > last + ONE_DAY:
+        streak.current_streak = 1
+    elif day == last + ONE_DAY:
+        streak.current_streak += 1
+    elif day == last:
+        return True
+    else:
+        # Backfilled day: it may join runs we know nothing about
+        return False
+
+    streak.last_completed_on = day
+    streak.best_streak = max(streak.best_streak or 0, streak.current_streak)
+    return True
+
+
+def _retreat(streak, day: date) -> bool:
+    """Remove a completed day. Returns False if a rebuild is needed."""
+    last = streak.last_completed_on
+    if last is None or day > last:
+        return True
+
+    # Dropping the last day of a run that is neither a single day nor the
+    # best run only shortens it; anything else needs the history.
+    if day == last and 1 < streak.current_streak < (streak.best_streak or 0):
+        streak.current_streak -= 1
+        streak.last_completed_on = day - ONE_DAY
+        return True
+    return False
+
+
+def _sync_habit_best_streak(db: Session, streak: models.HabitStreak):
+    """Mirror the tracked best streak onto Habit.best_streak."""
+    db.query(models.Habit).filter(
+        models.Habit.habit_id == streak.habit_id,
+        models.Habit.best_streak.is_distinct_from(streak.best_streak),
+    ).update({"best_streak": streak.best_streak}, synchronize_session="fetch")
+
+
+def _user_has_completion_on(db: Session, user_id: int, day: date, at_least: int) -> bool:
+    count = (
+        db.query(func.count(models.HabitCompletion.completion_id))
+        .filter(
+            models.HabitCompletion.user_id == user_id,
+            models.HabitCompletion.completed_on == day,
+        )
+        .scalar()
+    )
+    return count >= at_least
+
+
+def rebuild_habit_streak(db: Session, habit_id: int, user_id: int) -> models.HabitStreak:
+    """Recompute a habit's streak state from its full completion history."""
+    days = (
+        day
+        for (day,) in db.query(models.HabitCompletion.completed_on)
+        .filter(models.HabitCompletion.habit_id == habit_id)
+        .distinct()
+        .order_by(models.HabitCompletion.completed_on.asc())
+    )
+    current, best, last = _walk_runs(days)
+
+    streak = db.get(models.HabitStreak, habit_id)
+    if streak is None:
+        streak = models.HabitStreak(habit_id=habit_id, user_id=user_id)
+        db.add(streak)
+    streak.current_streak = current
+    streak.best_streak = best
+    streak.last_completed_on = last
+    db.flush()
+
+    _sync_habit_best_streak(db, streak)
+    return streak
+
+
+def rebuild_user_streak(db: Session, user_id: int) -> models.UserStreak:
+    """Recompute a user's streak state from all of their completion dates."""
+    days = (
+        day
+        for (day,) in db.query(models.HabitCompletion.completed_on)
+        .filter(models.HabitCompletion.user_id == user_id)
+        .distinct()
+        .order_by(models.HabitCompletion.completed_on.asc())
+    )
+    current, best, last = _walk_runs(days)
+
+    streak = db.get(models.UserStreak, user_id)
+    if streak is None:
+        streak = models.UserStreak(user_id=user_id)
+        db.add(streak)
+    streak.current_streak = current
+    streak.best_streak = best
+    streak.last_completed_on = last
+    db.flush()
+    return streak
+
+
+def initialize_user_streaks(db: Session, low: int, high: int) -> int:
+    """
+    Create the UserStreak rows missing for users in [low, high] in one
+    INSERT ... SELECT (does not commit); the set-based equivalent of
+    rebuild_user_streak for each of them. Distinct completion days are
+    numbered per user; consecutive days share day_number - row_number, so
+    each such group is a run. Returns the number of rows created.
+    """
+    HC, US, User = models.HabitCompletion, models.UserStreak, models.User
+    missing = ~exists().where(US.user_id == User.user_id)
+
+    days = (
+        select(HC.user_id, HC.completed_on)
+        .join(User, User.user_id == HC.user_id)
+        .where(User.user_id.between(low, high), missing)
+        .distinct()
+        .subquery("days")
+    )
+    numbered = select(
+        days.c.user_id,
+        days.c.completed_on,
+        (
+            day_number(db, days.c.completed_on)
+            - func.row_number().over(partition_by=days.c.user_id, order_by=days.c.completed_on)
+        ).label("island"),
+    ).subquery("numbered")
+    runs = (
+        select(
+            numbered.c.user_id,
+            func.count().label("length"),
+            func.max(numbered.c.completed_on).label("last_day"),
+        )
+        .group_by(numbered.c.user_id, numbered.c.island)
+        .subquery("runs")
+    )
+    ranked = select(
+        runs.c.user_id,
+        runs.c.length,
+        runs.c.last_day,
+        func.max(runs.c.length).over(partition_by=runs.c.user_id).label("best"),
+        func.row_number()
+        .over(partition_by=runs.c.user_id, order_by=runs.c.last_day.desc())
+        .label("rn"),
+    ).subquery("ranked")
+    latest = select(ranked).where(ranked.c.rn == 1).subquery("latest")
+
+    rows = (
+        select(
+            User.user_id,
+            func.coalesce(latest.c.length, 0),
+            func.coalesce(latest.c.best, 0),
+            latest.c.last_day,
+        )
+        .outerjoin(latest, latest.c.user_id == User.user_id)
+        .where(User.user_id.between(low, high), missing)
+    )
+    stmt = (
+        dialect_insert(db, US)
+        .from_select(["user_id", "current_streak", "best_streak", "last_completed_on"], rows)
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    return db.execute(stmt).rowcount
+
+
+def _locked(db: Session, model, key):
+    return (
+        db.query(model)
+        .filter(model.__mapper__.primary_key[0] == key)
+        .with_for_update()
+        .first()
+    )
+
+
+def record_completion(db: Session, habit_id: int, user_id: int, day: date):
+    """Update habit and user streaks after a completion for `day` was added."""
+    db.flush()
+
+    habit_streak = _locked(db, models.HabitStreak, habit_id)
+    if habit_streak is None:
+        rebuild_habit_streak(db, habit_id, user_id)
+    elif _advance(habit_streak, day):
+        _sync_habit_best_streak(db, habit_streak)
+    else:
+        rebuild_habit_streak(db, habit_id, user_id)
+
+    user_streak = _locked(db, models.UserStreak, user_id)
+    if user_streak is None:
+        rebuild_user_streak(db, user_id)
+    elif day < (user_streak.last_completed_on or day) and _user_has_completion_on(
+        db, user_id, day, at_least=2
+    ):
+        # Another habit already covered this day for the user
+        pass
+    elif not _advance(user_streak, day):
+        rebuild_user_streak(db, user_id)
+    db.flush()
+
+
+def record_uncompletion(db: Session, habit_id: int, user_id: int, day: date):
+    """Update habit and user streaks after the completion for `day` was removed."""
+    db.flush()
+
+    habit_streak = _locked(db, models.HabitStreak, habit_id)
+    if habit_streak is None or not _retreat(habit_streak, day):
+        rebuild_habit_streak(db, habit_id, user_id)
+
+    user_streak = _locked(db, models.UserStreak, user_id)
+    if user_streak is None:
+        rebuild_user_streak(db, user_id)
+    elif _user_has_completion_on(db, user_id, day, at_least=1):
+        # The user still completed another habit that day
+        pass
+    elif not _retreat(user_streak, day):
+        rebuild_user_streak(db, user_id)
+    db.flush()
+
+
+def current_user_streak(db: Session, user_id: int, today: Optional[date] = None) -> int:
+    """Length of the user's streak ending today (0 if nothing was completed today)."""
+    if today is None:
+        today = get_bangkok_today()
+
+    streak = db.get(models.UserStreak, user_id)
+    if streak is None:
+        streak = rebuild_user_streak(db, user_id)
+
+    if streak.last_completed_on == today:
+        return streak.current_streak
+    return 0
+
+
+def rebuild_all_streaks(db: Session) -> int:
+    """Rebuild every habit and user streak (after backfills or bulk deletes)."""
+    habits = db.query(models.Habit.habit_id, models.Habit.user_id).all()
+    for habit_id, user_id in habits:
+        rebuild_habit_streak(db, habit_id, user_id)
+
+    user_ids = [user_id for (user_id,) in db.query(models.User.user_id)]
+    for user_id in user_ids:
+        rebuild_user_streak(db, user_id)
+
+    db.commit()
+    return len(habits)
+
+
+if __name__ == "__main__":
+    from ..db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        count = rebuild_all_streaks(session)
+        print(f"✓ Rebuilt streaks for {count} habits")
+    finally:
+        session.close()
@@ -0,0 +1,139 @@
+"""
+Garbage collection of orphaned uploads.
+
+Objects become orphans when a row that referenced them goes away without
+calling uploads.release() (user cascade deletes, replaced avatars before
+release existed), when release() skipped them because they were still inside
+the grace period, or when a request fails after its upload was stored. The
+collector:
+
+  1. streams gratitude_entries.image_url and users.profile_picture (yield_per
+     batches) into the set of referenced storage keys,
+  2. streams the storage listing and deletes, in batches, every object that
+     is not referenced (a variant counts as referenced when its original is)
+     and was last written before the grace period.
+
+The grace period covers uploads whose row is not committed yet; a
+deduplicated upload touches its object, so reusing an old object restarts
+its grace period too. Run it from cron:
+
+    python -m app.services.upload_gc [--dry-run] [--grace-hours 24] [--batch-size 1000]
+"""
+import argparse
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import image_variants
+from .storage import Storage, StoredObject, get_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRACE_HOURS = float(os.getenv("UPLOAD_GC_GRACE_HOURS", "24"))
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class GcReport:
+    scanned: int = 0
+    scanned_bytes: int = 0
+    referenced: int = 0
+    # Unreferenced, but still inside the grace period
+    recent: int = 0
+    deleted: int = 0
+    reclaimed_bytes: int = 0
+    dry_run: bool = False
+
+    def summary(self) -> str:
+        verb = "Would delete" if self.dry_run else "Deleted"
+        return (
+            f"Scanned {self.scanned} objects ({self.scanned_bytes} bytes): "
+            f"{self.referenced} referenced, {self.recent} within grace period; "
+            f"{verb} {self.deleted} objects, reclaiming {self.reclaimed_bytes} bytes"
+        )
+
+
+def referenced_keys(db: Session, storage: Storage, batch_size: int = DEFAULT_BATCH_SIZE) -> Set[str]:
+    """Storage keys of every image_url and profile_picture, streamed from the database."""
+    keys = set()
+    for column in (models.GratitudeEntry.image_url, models.User.profile_picture):
+        urls = db.scalars(
+            select(column).where(column.isnot(None)).execution_options(yield_per=batch_size)
+        )
+        for url in urls:
+            key = storage.key_for_url(url)
+            if key is not None:
+                keys.add(key)
+    return keys
+
+
+def collect(
+    db: Session,
+    storage: Optional[Storage] = None,
+    grace: timedelta = timedelta(hours=DEFAULT_GRACE_HOURS),
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+) -> GcReport:
+    """Delete unreferenced objects older than grace; with dry_run only count them."""
+    storage = storage or get_storage()
+    # References first: anything stored after this point is inside the grace period
+    referenced = referenced_keys(db, storage, batch_size)
+    cutoff = (now or datetime.now(timezone.utc)) - grace
+    report = GcReport(dry_run=dry_run)
+    batch: List[StoredObject] = []
+
+    def flush():
+        if not dry_run:
+            storage.delete_many(obj.key for obj in batch)
+        report.deleted += len(batch)
+        report.reclaimed_bytes += sum(obj.size for obj in batch)
+        logger.info("Upload GC: %s %d objects", "would delete" if dry_run else "deleted", len(batch))
+        batch.clear()
+
+    for obj in storage.iter_objects():
+        report.scanned += 1
+        report.scanned_bytes += obj.size
+        if (image_variants.original_of(obj.key) or obj.key) in referenced:
+            report.referenced += 1
+        elif obj.modified > cutoff:
+            report.recent += 1
+        else:
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete uploaded files no longer referenced")
+    parser.add_argument("--dry-run", action="store_true", help="Report without deleting")
+    parser.add_argument("--grace-hours", type=float, default=DEFAULT_GRACE_HOURS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from ..db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        report = collect(
+            db,
+            grace=timedelta(hours=args.grace_hours),
+            batch_size=args.batch_size,
+            dry_run=args.dry_run,
+        )
+        print(report.summary())
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Streaming, size-enforced, content-addressed storage for user uploads
+(gratitude images, avatars).
+
+The upload is copied in UPLOAD_CHUNK_SIZE pieces to a staging file, so memory
+use per upload stays at one chunk whatever the client sends. The byte limit
+is enforced while copying (the client-supplied size is never trusted), the
+type is taken from the file's magic bytes rather than its name, and the
+SHA-256 of the content is computed on the way. The content is stored under
+"<hash[:2]>/<hash>.<ext>" in the configured backend (storage.py), so
+identical files are stored once and a partially written file is never
+served. WebP variants of new content are then rendered in the background
+(image_variants.py).
+
+Since one object may back several entries and avatars, release() deletes it
+only when nothing references it any more and it was not written or touched
+within the GC grace period: a concurrent upload of the same bytes may have
+been deduplicated onto it without having committed its row yet. Objects
+skipped that way are left to upload_gc.
+
+The storage key behind each gratitude image and avatar is kept in
+upload_references (set whenever image_url or profile_picture is assigned),
+so that check is an indexed equality lookup rather than a scan of both
+tables. ensure_references() fills it in once for rows written before it
+existed.
+
+Refusals raise UploadRejected subclasses carrying the HTTP status a route
+should answer with (413 too large, 415 unsupported type).
+"""
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import event, exists, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from ..utils.upsert import dialect_insert
+from . import image_variants, upload_gc
+from .storage import get_storage
+
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+MAX_GRATITUDE_IMAGE_BYTES = int(os.getenv("MAX_GRATITUDE_IMAGE_BYTES", str(5 * 1024 * 1024)))
+MAX_AVATAR_BYTES = int(os.getenv("MAX_AVATAR_BYTES", str(2 * 1024 * 1024)))
+
+# Enough of the header to recognise every allowed type
+_SNIFF_BYTES = 12
+
+# seed_versions marker of the upload_references backfill
+REFERENCES_NAME = "upload_references"
+REFERENCES_VERSION = "1"
+
+
+class UploadRejected(Exception):
+    """Base class for uploads refused by store_upload()."""
+    status_code = 400
+
+
+class UploadTooLarge(UploadRejected):
+    """Raised when an upload exceeds its byte limit."""
+    status_code = 413
+
+
+class UnsupportedUploadType(UploadRejected):
+    """Raised when the content is not one of the allowed image types."""
+    status_code = 415
+
+
+def sniff_image_type(header: bytes) -> Optional[str]:
+    """File extension for the image type in header (the first bytes), or None."""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def content_key(digest: str, ext: str) -> str:
+    """Storage key for content with this SHA-256 hex digest."""
+    return f"{digest[:2]}/{digest}.{ext}"
+
+
+def store_upload(source: BinaryIO, max_bytes: int) -> str:
+    """
+    Store the content of source (deduplicated) and return its public URL.
+    Blocking; async callers use save_upload().
+    """
+    storage = get_storage()
+    fd, tmp_path = tempfile.mkstemp(dir=storage.staging_dir(), prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            header = source.read(_SNIFF_BYTES)
+            ext = sniff_image_type(header)
+            if ext is None:
+                raise UnsupportedUploadType("Only PNG, JPEG, GIF and WebP images are allowed")
+            digest = hashlib.sha256(header)
+            written = len(header)
+            out.write(header)
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                out.write(chunk)
+
+        key = content_key(digest.hexdigest(), ext)
+        if storage.exists(key):
+            os.remove(tmp_path)
+            # Restart the GC grace period: the object is about to be referenced again
+            storage.touch(key)
+            return storage.url(key)
+        storage.put_file(key, tmp_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    image_variants.schedule(key)
+    return storage.url(key)
+
+
+async def save_upload(file: UploadFile, max_bytes: int) -> str:
+    """store_upload() on the threadpool, so the event loop never blocks on I/O."""
+    await file.seek(0)
+    return await run_in_threadpool(store_upload, file.file, max_bytes)
+
+
+def _reference(current: Optional[models.UploadReference], url: Optional[str]):
+    key = get_storage().key_for_url(url)
+    if key is None:
+        return None
+    if current is None:
+        return models.UploadReference(key=key)
+    # Updated in place: a replacement row would be inserted before the old one is deleted
+    current.key = key
+    return current
+
+
+@event.listens_for(models.GratitudeEntry.image_url, "set")
+def _track_image(entry, url, previous, initiator):
+    if url != previous:
+        entry.image_reference = _reference(entry.image_reference, url)
+
+
+@event.listens_for(models.User.profile_picture, "set")
+def _track_avatar(user, url, previous, initiator):
+    if url != previous:
+        user.avatar_reference = _reference(user.avatar_reference, url)
+
+
+def is_referenced(db: Session, key: str) -> bool:
+    """Whether any gratitude entry or avatar still points at key."""
+    return db.scalar(select(exists().where(models.UploadReference.key == key)))
+
+
+def backfill_references(db: Session, batch_size: int = 1000):
+    """Reference rows for images and avatars that have none (does not commit). Idempotent."""
+    storage = get_storage()
+    R = models.UploadReference
+    owners = (
+        (models.GratitudeEntry.gratitude_id, models.GratitudeEntry.image_url, "gratitude_id"),
+        (models.User.user_id, models.User.profile_picture, "avatar_user_id"),
+    )
+    for owner_id, url_column, field in owners:
+        rows = db.execute(
+            select(owner_id, url_column)
+            .where(url_column.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        for partition in rows.partitions():
+            values = []
+            for owner, url in partition:
+                key = storage.key_for_url(url)
+                if key is not None:
+                    values.append({"key": key, field: owner})
+            if values:
+                db.execute(dialect_insert(db, R).values(values).on_conflict_do_nothing())
+
+
+def ensure_references(db: Session, versions: Optional[Dict[str, str]] = None) -> bool:
+    """
+    Startup check: backfill upload_references once (versions as returned by
+    schema.read_versions). Returns True if it ran; commits.
+    """
+    if versions is not None:
+        applied = versions.get(REFERENCES_NAME)
+    else:
+        applied = db.scalar(
+            select(models.SeedVersion.version).where(models.SeedVersion.name == REFERENCES_NAME)
+        )
+    if applied == REFERENCES_VERSION:
+        return False
+
+    backfill_references(db)
+    stmt = dialect_insert(db, models.SeedVersion).values(
+        name=REFERENCES_NAME, version=REFERENCES_VERSION
+    )
+    db.execute(
+        stmt.on_conflict_do_update(index_elements=["name"], set_={"version": REFERENCES_VERSION})
+    )
+    db.commit()
+    return True
+
+
+def release(db: Session, url: Optional[str]) -> bool:
+    """
+    Delete the object behind url and its variants if nothing references it
+    any more and it is older than the GC grace period (call after the
+    referencing row is gone); True if deleted.
+    """
+    storage = get_storage()
+    key = storage.key_for_url(url)
+    if key is None or is_referenced(db, key):
+        return False
+    modified = storage.modified(key)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=upload_gc.DEFAULT_GRACE_HOURS)
+    if modified is None or modified > cutoff:
+        return False
+    image_variants.remove_variants(key)
+    return storage.delete(key)
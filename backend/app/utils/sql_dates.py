@@ -0,0 +1,16 @@
+from datetime import date
+
+from sqlalchemy import Date, Integer, cast, func, literal
+from sqlalchemy.orm import Session
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(db: Session, column):
+    """
+    Days since 1970-01-01 as an integer expression, so runs of consecutive
+    dates can be grouped (gaps-and-islands) on PostgreSQL and SQLite alike.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.julianday(column) - 2440587.5, Integer)
+    return column - cast(literal(EPOCH), Date)
@@ -0,0 +1,19 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session, table):
+    """
+    INSERT construct for the session's dialect, with on_conflict_do_nothing /
+    on_conflict_do_update support (PostgreSQL in production, SQLite in tests).
+
+    Usage:
+        stmt = dialect_insert(db, models.HabitCompletion).values(...)
+        db.execute(stmt.on_conflict_do_nothing())
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upserts are not supported on {dialect}")
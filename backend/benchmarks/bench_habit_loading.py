@@ -0,0 +1,256 @@
+"""
+Benchmark for the habit list loading strategy.
+
+Compares the old joinedload(category, completions, sessions) query with the
+current joinedload(category) + selectinload(completions/sessions) strategy at
+10/100/1000 completions (and sessions) per habit. For each case it reports
+the number of SQL statements, the total number of rows the database returned
+for them and the median latency of a full load. The joinedload case returns
+completions x sessions rows per habit, so at 1000 it takes minutes to run.
+
+The tables are dropped and recreated for every size, so they never live
+next to application data: on PostgreSQL the run creates its own schema
+(bench_<random>) and drops it afterwards. Any other database except the
+default in-memory SQLite is refused unless --scratch says it is disposable.
+
+Usage (from the backend/ directory):
+    python -m benchmarks.bench_habit_loading
+    python -m benchmarks.bench_habit_loading --habits 20 --repeat 5
+    python -m benchmarks.bench_habit_loading --url postgresql://localhost/bench_scratch
+"""
+import argparse
+import os
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from typing import Optional
+
+os.environ.setdefault("TESTING", "1")
+
+from sqlalchemy import JSON, create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.sqlite import base as sqlite_base
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# SQLite has no JSONB; compile it as JSON (same patch as tests/conftest.py)
+_original_process = sqlite_base.SQLiteTypeCompiler.process
+
+
+def _patched_process(self, type_, **kw):
+    if isinstance(type_, JSONB):
+        return self.process(JSON(), **kw)
+    return _original_process(self, type_, **kw)
+
+
+sqlite_base.SQLiteTypeCompiler.process = _patched_process
+
+from app import models  # noqa: E402
+from app.db import Base  # noqa: E402
+
+STRATEGIES = {
+    "joinedload": lambda: (
+        joinedload(models.Habit.category),
+        joinedload(models.Habit.completions),
+        joinedload(models.Habit.sessions),
+    ),
+    "selectinload": lambda: (
+        joinedload(models.Habit.category),
+        selectinload(models.Habit.completions),
+        selectinload(models.Habit.sessions),
+    ),
+}
+
+
+def _make_engine(url: str, schema: Optional[str] = None):
+    if url.startswith("sqlite"):
+        return create_engine(
+            url, connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+    engine = create_engine(url)
+    if schema is not None:
+
+        @event.listens_for(engine, "connect")
+        def use_schema(dbapi_connection, connection_record):
+            # Outside a transaction, so the pool's reset rollback keeps it
+            autocommit = dbapi_connection.autocommit
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET SESSION search_path TO "{schema}"')
+            cursor.close()
+            dbapi_connection.autocommit = autocommit
+
+    return engine
+
+
+def _is_scratch(url: str) -> bool:
+    """Whether dropping every table at url can only hit benchmark data."""
+    return url.startswith("sqlite") and (url.endswith(":memory:") or url.rstrip("/") == "sqlite:")
+
+
+def _seed(Session, habits: int, per_habit: int) -> int:
+    db = Session()
+    try:
+        user = models.User(
+            email=f"bench-{per_habit}@example.com",
+            name="Bench",
+            password_hash="x",
+        )
+        db.add(user)
+        db.flush()
+        category = models.HabitCategory(
+            user_id=user.user_id, category_name="Bench", color="#ede9ff"
+        )
+        db.add(category)
+        db.flush()
+
+        start = date(2020, 1, 1)
+        for i in range(habits):
+            habit = models.Habit(
+                user_id=user.user_id,
+                category_id=category.category_id,
+                habit_name=f"Habit {i}",
+                start_date=start,
+            )
+            db.add(habit)
+            db.flush()
+            days = [start + timedelta(days=d) for d in range(per_habit)]
+            db.bulk_insert_mappings(
+                models.HabitCompletion,
+                [
+                    {"habit_id": habit.habit_id, "user_id": user.user_id, "completed_on": d}
+                    for d in days
+                ],
+            )
+            db.bulk_insert_mappings(
+                models.HabitSession,
+                [
+                    {
+                        "habit_id": habit.habit_id,
+                        "user_id": user.user_id,
+                        "session_date": d,
+                        "status": "done",
+                        "planned_duration_seconds": 1800,
+                        "actual_duration_seconds": 1800,
+                        "meta": {},
+                    }
+                    for d in days
+                ],
+            )
+        db.commit()
+        return user.user_id
+    finally:
+        db.close()
+
+
+def _load(Session, user_id: int, strategy: str):
+    db = Session()
+    try:
+        habits = (
+            db.query(models.Habit)
+            .options(*STRATEGIES[strategy]())
+            .filter(models.Habit.user_id == user_id)
+            .order_by(models.Habit.habit_id.asc())
+            .all()
+        )
+        # Touch the collections the way _build_habit_response does
+        return sum(len(h.completions) + len(h.sessions) for h in habits)
+    finally:
+        db.close()
+
+
+def _count_rows(engine, Session, user_id: int, strategy: str):
+    """Capture the SQL a load issues, then replay it to count returned rows."""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        _load(Session, user_id, strategy)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    with engine.connect() as conn:
+        rows = sum(
+            len(conn.exec_driver_sql(statement, parameters).fetchall())
+            for statement, parameters in captured
+        )
+    return len(captured), rows
+
+
+def run(url: str, habits: int, sizes, repeat: int, scratch: bool = False):
+    schema = None
+    if make_url(url).get_backend_name() == "postgresql":
+        schema = f"bench_{uuid.uuid4().hex[:12]}"
+        admin = create_engine(url)
+        with admin.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    elif not (scratch or _is_scratch(url)):
+        raise SystemExit(
+            f"Refusing to drop and recreate every table at {url}; "
+            "pass --scratch if it is a disposable database"
+        )
+
+    engine = None
+    try:
+        engine = _make_engine(url, schema)
+        _run_sizes(engine, habits, sizes, repeat)
+    finally:
+        if engine is not None:
+            engine.dispose()
+        if schema is not None:
+            with admin.begin() as conn:
+                conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+            admin.dispose()
+
+
+def _run_sizes(engine, habits: int, sizes, repeat: int):
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    print(f"{habits} habits per user, median of {repeat} loads ({engine.dialect.name})")
+    print(
+        f"{'per habit':>10} {'strategy':>13} {'queries':>8} {'rows':>10} "
+        f"{'objects':>9} {'median ms':>10}"
+    )
+    for per_habit in sizes:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        user_id = _seed(Session, habits, per_habit)
+
+        for strategy in STRATEGIES:
+            queries, rows = _count_rows(engine, Session, user_id, strategy)
+            timings = []
+            objects = 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                objects = _load(Session, user_id, strategy)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f"{per_habit:>10} {strategy:>13} {queries:>8} {rows:>10} "
+                f"{objects:>9} {statistics.median(timings):>10.1f}"
+            )
+
+    Base.metadata.drop_all(bind=engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///:memory:"))
+    parser.add_argument("--habits", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scratch",
+        action="store_true",
+        help="Allow a non-PostgreSQL --url whose tables may all be dropped",
+    )
+    args = parser.parse_args()
+    run(args.url, args.habits, args.sizes, args.repeat, args.scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,12 @@
-from app import models
 from app.db import SessionLocal
-from app.services.achievement_checker import initialize_user_achievements
+from app.services.achievement_backfill import backfill_achievements
 
+# Creates missing UserAchievement rows for every user in chunked set-based
+# INSERT ... SELECT statements. For a full progress recompute as well, run:
+#     python -m app.services.achievement_backfill
 db = SessionLocal()
 try:
-    users = db.query(models.User).all()
-    for user in users:
-        # Check if user already has achievements
-        existing = (
-            db.query(models.UserAchievement)
-            .filter(models.UserAchievement.user_id == user.user_id)
-            .first()
-        )
-
-        if not existing:
-            print(f"Initializing achievements for user: {user.email}")
-            initialize_user_achievements(db, user.user_id)
-
+    backfill_achievements(db, recompute=False)
     print("✓ All existing users initialized with achievements!")
 finally:
     db.close()
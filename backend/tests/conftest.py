@@ -1,15 +1,20 @@
 import sys
 import os
 os.environ["TESTING"] = "1"
+# Minimum bcrypt cost keeps password hashing fast in tests
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
 from pathlib import Path
 
 # backend path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import tempfile
+
 import pytest
 from sqlalchemy import create_engine, JSON
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.sqlite import base as sqlite_base
 
@@ -23,8 +28,10 @@ def patched_process(self, type_, **kw):
 
 sqlite_base.SQLiteTypeCompiler.process = patched_process
 
-# Create test database engine
-TEST_DATABASE_URL = "sqlite:///:memory:"
+# Create test database engines. A file database (rather than :memory:) lets
+# the sync engine and the aiosqlite engine used by async routes share data.
+TEST_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="bloomup-tests-"), "test.db")
+TEST_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
 engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
@@ -32,7 +39,15 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-from app.db import Base, get_db
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{TEST_DB_PATH}",
+    poolclass=NullPool,
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+from app.db import Base, get_async_db, get_db
 from app import models
 from app.security import hash_password, create_access_token
 from app.main import app
@@ -40,6 +55,21 @@ from app.utils.timezone_utils import get_bangkok_today
 from fastapi.testclient import TestClient
 
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Process-wide caches must not leak between test databases"""
+    from app.security import clear_principal_cache
+    from app.services import achievement_catalog, achievement_rules
+
+    achievement_rules.invalidate_rules()
+    achievement_catalog.invalidate()
+    clear_principal_cache()
+    yield
+    achievement_rules.invalidate_rules()
+    achievement_catalog.invalidate()
+    clear_principal_cache()
+
+
 @pytest.fixture(scope="function")
 def db():
     """Create test database and tables"""
@@ -59,7 +89,12 @@ def client(db):
         finally:
             pass
     
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as async_db:
+            yield async_db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     yield TestClient(app)
     app.dependency_overrides.clear()
 
@@ -95,7 +130,7 @@ def test_user2(db):
 @pytest.fixture
 def test_token(test_user):
     """Create JWT token for test user"""
-    return create_access_token(subject=test_user.email)
+    return create_access_token(subject=test_user.email, user_id=test_user.user_id)
 
 
 @pytest.fixture
@@ -128,4 +163,58 @@ def test_habit(db, test_user, test_category):
     db.add(habit)
     db.commit()
     db.refresh(habit)
-    return habit
\ No newline at end of file
+    return habit
+
+@pytest.fixture
+def seeded_achievements(db):
+    """Insert the achievement catalog from ACHIEVEMENTS_SEED"""
+    from app.seed_achievements import ACHIEVEMENTS_SEED
+
+    achievements = []
+    for data in ACHIEVEMENTS_SEED:
+        fields = {k: v for k, v in data.items() if k != "requirements"}
+        achievement = models.Achievement(**fields)
+        achievement.requirements = [
+            models.AchievementRequirement(**req) for req in data["requirements"]
+        ]
+        db.add(achievement)
+        achievements.append(achievement)
+    db.commit()
+    return achievements
+
+
+@pytest.fixture
+def user_achievements(db, test_user, seeded_achievements):
+    """Initialize achievement progress rows for test user"""
+    from app.services.achievement_checker import initialize_user_achievements
+
+    initialize_user_achievements(db, test_user.user_id)
+    return {
+        ua.achievement.key_name: ua
+        for ua in db.query(models.UserAchievement)
+        .filter(models.UserAchievement.user_id == test_user.user_id)
+        .all()
+    }
+
+
+@pytest.fixture
+def upload_root(tmp_path, monkeypatch):
+    """Local upload storage in a temporary directory, also served at /uploads"""
+    from app.services import image_variants, storage
+
+    monkeypatch.setattr(storage, "_storage", storage.LocalStorage(str(tmp_path)))
+    mount = next(route for route in app.routes if getattr(route, "name", None) == "uploads")
+    monkeypatch.setattr(mount.app, "directory", str(tmp_path))
+    monkeypatch.setattr(mount.app, "all_directories", [str(tmp_path)])
+    yield tmp_path
+    # Background renders must not outlive the directory
+    image_variants.shutdown()
+
+
+@pytest.fixture
+def metrics_headers(monkeypatch):
+    """Enable the internal /metrics endpoints and return the header that unlocks them"""
+    from app.routers import metrics as metrics_router
+
+    monkeypatch.setattr(metrics_router, "METRICS_TOKEN", "test-metrics-token")
+    return {"X-Metrics-Token": "test-metrics-token"}
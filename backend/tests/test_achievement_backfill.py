@@ -0,0 +1,90 @@
+"""
+Tests for services/achievement_backfill.py
+Set-based initialization and recomputation must match per-user evaluation
+"""
+from datetime import timedelta
+
+from app import models
+from app.crud import log_habit_completion
+from app.services.achievement_backfill import backfill_achievements
+from app.services.achievement_rules import evaluate_user_achievements
+from app.utils.timezone_utils import get_bangkok_today
+
+
+def _progress(db, user_id):
+    db.expire_all()
+    return {
+        ua.achievement.key_name: (ua.progress, ua.progress_unit_value, ua.is_earned)
+        for ua in db.query(models.UserAchievement)
+        .filter(models.UserAchievement.user_id == user_id)
+        .all()
+    }
+
+
+def _add_activity(db, user, habit):
+    today = get_bangkok_today()
+    for offset in range(7, -1, -1):
+        log_habit_completion(db, habit.habit_id, user.user_id, today - timedelta(days=offset))
+    for i in range(12):
+        db.add(models.GratitudeEntry(user_id=user.user_id, body=f"Thing {i}"))
+    for offset in range(3):
+        db.add(models.MoodLog(
+            user_id=user.user_id, mood_score=4, logged_on=today - timedelta(days=offset)
+        ))
+    db.commit()
+
+
+class TestBackfillAchievements:
+    """Chunked INSERT ... SELECT backfill"""
+
+    def test_init_only_creates_missing_rows(self, db, test_user, test_user2, seeded_achievements):
+        """Every user gets one row per achievement, progress untouched"""
+        total = backfill_achievements(db, recompute=False, report=lambda message: None)
+
+        assert total == 2 * len(seeded_achievements)
+        assert set(_progress(db, test_user2.user_id).values()) == {(0, 0, False)}
+
+    def test_init_is_idempotent(self, db, test_user, seeded_achievements):
+        """Running again does not duplicate rows"""
+        backfill_achievements(db, recompute=False, report=lambda message: None)
+        assert backfill_achievements(db, recompute=False, report=lambda message: None) == 0
+        assert db.query(models.UserAchievement).count() == len(seeded_achievements)
+
+    def test_recompute_matches_per_user_evaluation(
+        self, db, test_user, test_user2, test_habit, seeded_achievements
+    ):
+        """SQL scoring produces the same progress as evaluate_user_achievements"""
+        _add_activity(db, test_user, test_habit)
+
+        backfill_achievements(db, chunk_size=1, report=lambda message: None)
+        backfilled = _progress(db, test_user.user_id)
+
+        db.query(models.UserAchievement).update({"is_earned": False, "earned_date": None})
+        db.commit()
+        evaluate_user_achievements(db, test_user.user_id)
+
+        assert backfilled == _progress(db, test_user.user_id)
+        assert backfilled["streak_master"] == (100, 8, True)
+        assert backfilled["gratitude_pro"] == (100, 12, True)
+        assert backfilled["mood_tracker"] == (15, 3, False)
+
+    def test_recompute_keeps_earned_achievements(self, db, test_user, user_achievements):
+        """Achievements earned earlier are not revoked"""
+        earned = user_achievements["gratitude_pro"]
+        earned.is_earned = True
+        earned.progress = 100
+        db.commit()
+
+        backfill_achievements(db, report=lambda message: None)
+
+        db.refresh(earned)
+        assert earned.is_earned is True
+        assert earned.progress == 0
+
+    def test_reports_progress_per_chunk(self, db, test_user, test_user2, seeded_achievements):
+        """One progress line per user_id chunk"""
+        messages = []
+        backfill_achievements(db, chunk_size=1, report=messages.append)
+
+        assert len(messages) == 2
+        assert messages[-1].endswith("(100%)")
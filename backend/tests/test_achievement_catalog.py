@@ -0,0 +1,125 @@
+"""
+Tests for services/achievement_catalog.py and the catalog routes
+"""
+from app import models
+from app.seed_achievements import SEED_NAME, apply_achievement_seed
+from app.services import achievement_catalog
+
+
+def _set_seed_version(db, version):
+    marker = db.get(models.SeedVersion, SEED_NAME)
+    if marker is None:
+        db.add(models.SeedVersion(name=SEED_NAME, version=version))
+    else:
+        marker.version = version
+    db.commit()
+
+
+def _rename_all(db, title):
+    db.query(models.Achievement).update({"title": title})
+    db.commit()
+
+
+class TestCatalogRoutes:
+    """GET /achievements, /achievements/{id}, /achievements/by-key/{key}"""
+
+    def test_served_from_memory(self, client, db, seeded_achievements):
+        """After the first load, table changes without a new seed version are not read"""
+        first = client.get("/achievements").json()
+        _rename_all(db, "Changed")
+
+        second = client.get("/achievements").json()
+
+        assert second == first
+        assert len(second) == len(seeded_achievements)
+
+    def test_lookup_by_id_and_key(self, client, seeded_achievements):
+        """Both indexes return the same achievement with its requirements"""
+        achievement = seeded_achievements[0]
+
+        by_id = client.get(f"/achievements/{achievement.achievement_id}").json()
+        by_key = client.get(f"/achievements/by-key/{achievement.key_name}").json()
+
+        assert by_id == by_key
+        assert by_id["key_name"] == achievement.key_name
+        assert len(by_id["requirements"]) == len(achievement.requirements)
+
+    def test_unknown_achievement_404(self, client, seeded_achievements):
+        """Missing ids and keys are 404s"""
+        assert client.get("/achievements/999999").status_code == 404
+        assert client.get("/achievements/by-key/nope").status_code == 404
+
+    def test_long_lived_cache_control(self, client, seeded_achievements):
+        """Catalog responses may be cached for MAX_AGE_SECONDS"""
+        response = client.get("/achievements/by-key/" + seeded_achievements[0].key_name)
+        assert response.headers["cache-control"] == (
+            f"public, max-age={achievement_catalog.MAX_AGE_SECONDS}"
+        )
+
+
+class TestCatalogRefresh:
+    """Reload on seed-version change"""
+
+    def test_version_change_reloads_after_check_interval(
+        self, client, db, seeded_achievements, monkeypatch
+    ):
+        """Another process applying a seed is noticed at the next version check"""
+        _set_seed_version(db, "v1")
+        old_etag = client.get("/achievements").headers["etag"]
+        _rename_all(db, "Renamed")
+        _set_seed_version(db, "v2")
+        monkeypatch.setattr(achievement_catalog, "CHECK_SECONDS", 0)
+
+        response = client.get("/achievements")
+
+        assert {a["title"] for a in response.json()} == {"Renamed"}
+        assert response.headers["etag"] != old_etag
+
+    def test_unchanged_version_keeps_catalog(self, client, db, seeded_achievements, monkeypatch):
+        """A version check that matches does not reload"""
+        _set_seed_version(db, "v1")
+        client.get("/achievements")
+        _rename_all(db, "Renamed")
+        monkeypatch.setattr(achievement_catalog, "CHECK_SECONDS", 0)
+
+        titles = {a["title"] for a in client.get("/achievements").json()}
+
+        assert "Renamed" not in titles
+
+    def test_apply_seed_invalidates(self, client, db, test_user):
+        """Applying the seed in this process drops the loaded catalog"""
+        assert client.get("/achievements").json() == []
+
+        apply_achievement_seed(db)
+
+        assert len(client.get("/achievements").json()) > 0
+
+
+class TestUserSummaries:
+    """User achievement lists take titles from the catalog"""
+
+    def test_titles_from_catalog(self, client, db, test_token, user_achievements):
+        """Every progress row is returned with its catalog entry"""
+        response = client.get(
+            "/achievements/user/all", headers={"Authorization": f"Bearer {test_token}"}
+        )
+
+        titles = {item["title"] for item in response.json()}
+        assert titles == {ua.achievement.title for ua in user_achievements.values()}
+
+    def test_new_achievement_forces_reload(
+        self, client, db, test_token, test_user, user_achievements
+    ):
+        """A progress row for an achievement the catalog lacks triggers a reload"""
+        client.get("/achievements")
+        extra = models.Achievement(key_name="late_addition", title="Late addition", points=5)
+        db.add(extra)
+        db.flush()
+        db.add(models.UserAchievement(user_id=test_user.user_id, achievement_id=extra.achievement_id))
+        db.commit()
+
+        response = client.get(
+            "/achievements/user/all", headers={"Authorization": f"Bearer {test_token}"}
+        )
+
+        assert "Late addition" in {item["title"] for item in response.json()}
@@ -0,0 +1,171 @@
+"""
+Tests for services/achievement_events.py
+Outbox events are queued by writes and evaluated in coalesced batches
+"""
+import pytest
+
+from app import models
+from app.services import achievement_events
+from app.utils.timezone_utils import get_bangkok_today
+
+
+def _pending(db):
+    return db.query(models.AchievementEvent).count()
+
+
+class TestEmit:
+    """Writes queue events instead of evaluating achievements"""
+
+    def test_create_habit_queues_event(self, client, db, test_token, user_achievements):
+        """Creating a habit leaves achievements untouched until the worker runs"""
+        response = client.post(
+            "/habits/",
+            json={"name": "Stretch"},
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        assert response.status_code == 201
+        assert _pending(db) == 1
+        assert user_achievements["first_steps"].is_earned is False
+
+    def test_mark_complete_queues_event(self, client, db, test_token, test_habit):
+        """Completion toggles queue an event"""
+        client.post(
+            f"/habits/{test_habit.habit_id}/complete",
+            params={"on": get_bangkok_today()},
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        event = db.query(models.AchievementEvent).one()
+        assert event.event_type == achievement_events.COMPLETIONS_CHANGED
+
+    def test_emit_unknown_type(self, db, test_user):
+        """Unknown event types are rejected"""
+        with pytest.raises(ValueError):
+            achievement_events.emit(db, test_user.user_id, "nope")
+
+
+    @pytest.mark.parametrize(
+        "method, path, body",
+        [
+            ("post", "/gratitude/", {"data": {"text": "Tea"}}),
+            ("put", "/mood/{id}", {"json": {"mood_score": 9}}),
+            ("delete", "/mood/{id}", {}),
+        ],
+    )
+    def test_failed_emit_rolls_back_write(
+        self, client, db, test_token, test_user, monkeypatch, method, path, body
+    ):
+        """The write and its event commit together: if emit fails, the write is not kept"""
+        mood = models.MoodLog(user_id=test_user.user_id, mood_score=5, logged_on=get_bangkok_today())
+        db.add(mood)
+        db.commit()
+
+        def broken_emit(*args, **kwargs):
+            raise RuntimeError("outbox unavailable")
+
+        monkeypatch.setattr(achievement_events, "emit", broken_emit)
+        with pytest.raises(RuntimeError):
+            getattr(client, method)(
+                path.format(id=mood.mood_id),
+                headers={"Authorization": f"Bearer {test_token}"},
+                **body,
+            )
+        # The request's session is closed (rolled back) after the error
+        db.rollback()
+        db.expire_all()
+
+        assert db.query(models.GratitudeEntry).count() == 0
+        assert db.get(models.MoodLog, mood.mood_id).mood_score == 5
+        assert _pending(db) == 0
+
+
+class TestProcessPendingEvents:
+    """Worker batch processing"""
+
+    def test_process_evaluates_and_clears(self, client, db, test_token, user_achievements):
+        """Processing a batch updates achievements and empties the outbox"""
+        client.post(
+            "/habits/",
+            json={"name": "Stretch"},
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+
+        assert achievement_events.process_pending_events(db) == 1
+        assert _pending(db) == 0
+
+        db.refresh(user_achievements["first_steps"])
+        assert user_achievements["first_steps"].is_earned is True
+
+    def test_events_coalesced_per_user(self, db, test_user, user_achievements, monkeypatch):
+        """Many events for a user trigger one evaluation"""
+        calls = []
+        monkeypatch.setattr(
+            achievement_events,
+            "evaluate_user_achievements",
+            lambda db, user_id, types, commit: calls.append((user_id, set(types))),
+        )
+        for _ in range(3):
+            achievement_events.emit(db, test_user.user_id, achievement_events.MOOD_CHANGED)
+        achievement_events.emit(db, test_user.user_id, achievement_events.GRATITUDE_CHANGED)
+        db.commit()
+
+        assert achievement_events.process_pending_events(db) == 4
+        assert calls == [(test_user.user_id, {"mood_logs", "gratitude_entries"})]
+
+    def test_batch_size_limits_claim(self, db, test_user):
+        """Only batch_size events are claimed per pass"""
+        for _ in range(3):
+            achievement_events.emit(db, test_user.user_id, achievement_events.HABITS_CHANGED)
+        db.commit()
+
+        assert achievement_events.process_pending_events(db, batch_size=2) == 2
+        assert _pending(db) == 1
+
+    def test_empty_outbox(self, db):
+        """Nothing to do returns zero"""
+        assert achievement_events.process_pending_events(db) == 0
+
+
+class TestFailedEvaluation:
+    """A user whose evaluation raises does not stall the outbox"""
+
+    @pytest.fixture
+    def failing_user2(self, db, test_user2, monkeypatch):
+        """Evaluation writes then raises for test_user2, and records other users"""
+        evaluated = []
+
+        def evaluate(db, user_id, types, commit):
+            if user_id == test_user2.user_id:
+                db.add(models.HabitCategory(user_id=user_id, category_name="Partial", color="#fff"))
+                db.flush()
+                raise RuntimeError("boom")
+            evaluated.append(user_id)
+
+        monkeypatch.setattr(achievement_events, "evaluate_user_achievements", evaluate)
+        return evaluated
+
+    def test_other_users_still_processed(self, db, test_user, test_user2, failing_user2):
+        """The failing user's work is rolled back to its savepoint; the rest commits"""
+        achievement_events.emit(db, test_user2.user_id, achievement_events.MOOD_CHANGED)
+        achievement_events.emit(db, test_user.user_id, achievement_events.MOOD_CHANGED)
+        db.commit()
+
+        assert achievement_events.process_pending_events(db) == 2
+
+        assert failing_user2 == [test_user.user_id]
+        remaining = db.query(models.AchievementEvent).one()
+        assert remaining.user_id == test_user2.user_id
+        failure = db.get(models.AchievementEventFailure, remaining.event_id)
+        assert failure.attempts == 1 and "boom" in failure.last_error
+        assert db.query(models.HabitCategory).filter_by(category_name="Partial").count() == 0
+
+    def test_skipped_after_max_attempts(self, db, test_user2, failing_user2, monkeypatch):
+        """Events that keep failing are retried up to MAX_ATTEMPTS, then left alone"""
+        monkeypatch.setattr(achievement_events, "MAX_ATTEMPTS", 2)
+        achievement_events.emit(db, test_user2.user_id, achievement_events.MOOD_CHANGED)
+        db.commit()
+
+        handled = [achievement_events.process_pending_events(db) for _ in range(3)]
+
+        assert handled == [1, 1, 0]
+        assert _pending(db) == 1
+        assert db.query(models.AchievementEventFailure).one().attempts == 2
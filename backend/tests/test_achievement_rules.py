@@ -0,0 +1,147 @@
+"""
+Tests for services/achievement_rules.py
+Requirement rows are compiled into one aggregate query per evaluation
+"""
+import pytest
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from app import models
+from app.crud import log_habit_completion
+from app.services import achievement_catalog, achievement_rules, streaks
+from app.services.achievement_rules import Rule, evaluate_user_achievements, score
+from app.utils.timezone_utils import get_bangkok_today
+
+
+class TestScore:
+    """Progress calculation for a set of rules"""
+
+    def test_partial_progress(self):
+        """Progress is the percentage of the target"""
+        assert score([Rule("mood_logs", 20)], {"mood_logs": 5}) == (25, 5, False)
+
+    def test_progress_capped(self):
+        """Progress never exceeds 100"""
+        assert score([Rule("mood_logs", 20)], {"mood_logs": 50}) == (100, 50, True)
+
+    def test_least_complete_requirement_decides(self):
+        """With several requirements, all must be met"""
+        rules = [Rule("mood_logs", 10), Rule("gratitude_entries", 10)]
+        values = {"mood_logs": 10, "gratitude_entries": 3}
+        assert score(rules, values) == (30, 3, False)
+
+
+class TestGetRules:
+    """Rule loading and caching"""
+
+    def test_rules_cover_seeded_requirements(self, db, seeded_achievements):
+        """Every seeded requirement type has a metric"""
+        rules = achievement_rules.get_rules(db)
+        assert len(rules) == len(seeded_achievements)
+
+    def test_unknown_requirement_type_ignored(self, db, seeded_achievements):
+        """Requirements without a metric are skipped"""
+        db.add(models.AchievementRequirement(
+            achievement_id=seeded_achievements[0].achievement_id,
+            requirement_type="moon_phase",
+            target_value=1,
+        ))
+        db.commit()
+
+        rules = achievement_rules.get_rules(db)
+        types = {r.requirement_type for r in rules[seeded_achievements[0].achievement_id]}
+        assert "moon_phase" not in types
+
+    def test_rules_cached_until_invalidated(self, db, seeded_achievements):
+        """Rules are read once per process"""
+        first = achievement_rules.get_rules(db)
+        assert achievement_rules.get_rules(db) is first
+
+        achievement_rules.invalidate_rules()
+        assert achievement_rules.get_rules(db) is not first
+
+    def test_seed_applied_elsewhere_reloads(self, db, seeded_achievements, monkeypatch):
+        """A new seed version written by another process is noticed at the next check"""
+        first = achievement_rules.get_rules(db)
+        db.query(models.AchievementRequirement).update({"target_value": 999})
+        db.merge(models.SeedVersion(name=achievement_catalog.SEED_NAME, version="other-process"))
+        db.commit()
+        assert achievement_rules.get_rules(db) is first
+
+        monkeypatch.setattr(achievement_catalog, "CHECK_SECONDS", 0)
+        rules = achievement_rules.get_rules(db)
+
+        assert rules is not first
+        assert {r.target_value for rs in rules.values() for r in rs} == {999}
+
+    def test_unchanged_seed_version_keeps_rules(self, db, seeded_achievements, monkeypatch):
+        """A version check that matches does not reload"""
+        first = achievement_rules.get_rules(db)
+        monkeypatch.setattr(achievement_catalog, "CHECK_SECONDS", 0)
+
+        assert achievement_rules.get_rules(db) is first
+
+
+class TestEvaluateUserAchievements:
+    """End-to-end evaluation against the database"""
+
+    def test_all_metrics_in_one_query(self, db, test_user, user_achievements):
+        """A full evaluation issues a single SELECT"""
+        achievement_rules.get_rules(db)
+        user_id = test_user.user_id
+        streaks.rebuild_user_streak(db, user_id)
+        db.commit()
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            evaluate_user_achievements(db, user_id, commit=False)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        assert len(statements) == 1
+
+    def test_habit_achievements(self, db, test_user, test_habit, user_achievements):
+        """Creating a habit earns first_steps and progresses habit_collector"""
+        evaluate_user_achievements(db, test_user.user_id)
+
+        assert user_achievements["first_steps"].is_earned is True
+        assert user_achievements["habit_collector"].progress == 10
+        assert user_achievements["habit_collector"].progress_unit_value == 1
+
+    def test_completion_achievements(self, db, test_user, test_habit, user_achievements):
+        """Completions drive streak, days tracked and total completions"""
+        today = get_bangkok_today()
+        for offset in range(7):
+            log_habit_completion(
+                db, test_habit.habit_id, test_user.user_id, today - timedelta(days=offset)
+            )
+
+        evaluate_user_achievements(db, test_user.user_id)
+
+        assert user_achievements["streak_master"].is_earned is True
+        assert user_achievements["consistency_king"].progress_unit_value == 7
+        assert user_achievements["wellness_warrior"].progress == 7
+
+    def test_filter_by_requirement_type(self, db, test_user, test_habit, user_achievements):
+        """Only achievements using the given requirement types are touched"""
+        evaluate_user_achievements(db, test_user.user_id, {"mood_logs"})
+
+        assert user_achievements["first_steps"].is_earned is False
+
+    def test_earned_is_never_revoked(self, db, test_user, test_habit, user_achievements):
+        """Dropping below the target keeps the badge"""
+        evaluate_user_achievements(db, test_user.user_id)
+        db.delete(test_habit)
+        db.commit()
+
+        evaluate_user_achievements(db, test_user.user_id)
+
+        assert user_achievements["first_steps"].is_earned is True
+        assert user_achievements["first_steps"].progress == 0
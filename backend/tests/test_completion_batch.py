@@ -0,0 +1,165 @@
+"""
+Tests for POST /habits/completions/batch and crud.apply_completion_batch
+"""
+from datetime import date, timedelta
+
+from app import models, schemas
+from app.services import streaks
+
+MONDAY = date(2025, 3, 10)
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _week(habit_id, done=True, start=MONDAY, days=7):
+    return [
+        {"habit_id": habit_id, "on": (start + timedelta(days=i)).isoformat(), "done": done}
+        for i in range(days)
+    ]
+
+
+def _completed_days(db, habit_id):
+    db.expire_all()
+    return sorted(
+        day
+        for (day,) in db.query(models.HabitCompletion.completed_on).filter(
+            models.HabitCompletion.habit_id == habit_id
+        )
+    )
+
+
+def _new_habit(db, user, name="Reading"):
+    habit = models.Habit(
+        user_id=user.user_id, habit_name=name, emoji="📚", duration_minutes=10, start_date=MONDAY
+    )
+    db.add(habit)
+    db.commit()
+    return habit
+
+
+class TestCompletionBatchRoute:
+    """POST /habits/completions/batch"""
+
+    def test_marks_a_week(self, client, db, test_token, test_habit):
+        """A week of cells is applied in one request"""
+        response = client.post(
+            "/habits/completions/batch",
+            json={"items": _week(test_habit.habit_id)},
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"added": 7, "removed": 0}
+        assert len(_completed_days(db, test_habit.habit_id)) == 7
+
+    def test_existing_cells_are_not_counted(self, client, db, test_token, test_habit):
+        """Setting an already-done day or clearing an empty one is a no-op"""
+        client.post(f"/habits/{test_habit.habit_id}/complete?on={MONDAY}", headers=_auth(test_token))
+
+        response = client.post(
+            "/habits/completions/batch",
+            json={"items": [
+                {"habit_id": test_habit.habit_id, "on": str(MONDAY), "done": True},
+                {"habit_id": test_habit.habit_id, "on": str(MONDAY + timedelta(days=1)), "done": False},
+            ]},
+            headers=_auth(test_token),
+        )
+
+        assert response.json() == {"added": 0, "removed": 0}
+        assert _completed_days(db, test_habit.habit_id) == [MONDAY]
+
+    def test_mixed_set_and_clear(self, client, db, test_token, test_user, test_habit):
+        """Sets and clears across habits in one batch; the last toggle of a cell wins"""
+        other = _new_habit(db, test_user)
+        client.post("/habits/completions/batch", json={"items": _week(test_habit.habit_id)}, headers=_auth(test_token))
+
+        response = client.post(
+            "/habits/completions/batch",
+            json={"items": [
+                {"habit_id": test_habit.habit_id, "date": str(MONDAY), "done": False},
+                {"habit_id": other.habit_id, "date": str(MONDAY), "done": True},
+                {"habit_id": other.habit_id, "date": str(MONDAY), "done": False},
+                {"habit_id": other.habit_id, "date": str(MONDAY + timedelta(days=2))},
+            ]},
+            headers=_auth(test_token),
+        )
+
+        assert response.json() == {"added": 1, "removed": 1}
+        assert MONDAY not in _completed_days(db, test_habit.habit_id)
+        assert _completed_days(db, other.habit_id) == [MONDAY + timedelta(days=2)]
+
+    def test_unowned_habit_rejects_whole_batch(self, client, db, test_token, test_habit, test_user2):
+        """One foreign habit is a 404 and nothing is applied"""
+        foreign = _new_habit(db, test_user2, "Not mine")
+
+        response = client.post(
+            "/habits/completions/batch",
+            json={"items": _week(test_habit.habit_id) + _week(foreign.habit_id, days=1)},
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 404
+        assert str(foreign.habit_id) in response.json()["detail"]
+        assert _completed_days(db, test_habit.habit_id) == []
+
+    def test_batch_size_limits(self, client, test_token, test_habit):
+        """Empty and oversized batches are 422"""
+        too_many = _week(test_habit.habit_id, days=schemas.MAX_COMPLETION_BATCH + 1)
+
+        empty = client.post("/habits/completions/batch", json={"items": []}, headers=_auth(test_token))
+        large = client.post("/habits/completions/batch", json={"items": too_many}, headers=_auth(test_token))
+
+        assert empty.status_code == 422
+        assert large.status_code == 422
+
+    def test_one_achievement_event(self, client, db, test_token, test_habit):
+        """The batch queues a single achievement evaluation; a no-op batch queues none"""
+        client.post("/habits/completions/batch", json={"items": _week(test_habit.habit_id)}, headers=_auth(test_token))
+        client.post("/habits/completions/batch", json={"items": _week(test_habit.habit_id)}, headers=_auth(test_token))
+
+        assert db.query(models.AchievementEvent).count() == 1
+
+
+class TestDerivedState:
+    """Streaks and rollups after a batch match the per-cell endpoints"""
+
+    def test_streaks_match_rebuild(self, client, db, test_token, test_user, test_habit):
+        """Habit and user streaks equal a full rebuild"""
+        items = _week(test_habit.habit_id) + [
+            {"habit_id": test_habit.habit_id, "on": str(MONDAY + timedelta(days=3)), "done": False}
+        ]
+        client.post("/habits/completions/batch", json={"items": items}, headers=_auth(test_token))
+        db.expire_all()
+
+        habit_streak = db.get(models.HabitStreak, test_habit.habit_id)
+        user_streak = db.get(models.UserStreak, test_user.user_id)
+        stored = (habit_streak.best_streak, user_streak.best_streak, user_streak.last_completed_on)
+
+        rebuilt_habit = streaks.rebuild_habit_streak(db, test_habit.habit_id, test_user.user_id)
+        rebuilt_user = streaks.rebuild_user_streak(db, test_user.user_id)
+        assert stored == (rebuilt_habit.best_streak, rebuilt_user.best_streak, rebuilt_user.last_completed_on)
+        assert habit_streak.best_streak == 3
+
+    def test_rollups_net_per_day(self, client, db, test_token, test_user, test_habit):
+        """Daily rollup completions reflect the net change per day"""
+        other = _new_habit(db, test_user)
+        client.post(
+            "/habits/completions/batch",
+            json={"items": _week(test_habit.habit_id, days=2) + _week(other.habit_id, days=1)},
+            headers=_auth(test_token),
+        )
+        client.post(
+            "/habits/completions/batch",
+            json={"items": _week(test_habit.habit_id, done=False, days=1)},
+            headers=_auth(test_token),
+        )
+        db.expire_all()
+
+        rollup = {
+            row.day: row.completions
+            for row in db.query(models.DailyUserRollup).filter_by(user_id=test_user.user_id)
+        }
+        assert rollup[MONDAY] == 1
+        assert rollup[MONDAY + timedelta(days=1)] == 1
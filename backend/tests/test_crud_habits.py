@@ -85,6 +85,20 @@ class TestGetHabitsForUser:
         assert "history" in habits[0]
         assert str(date.today()) in habits[0]["history"]
     
+    def test_get_habits_for_user_history_window(self, db, test_user, test_habit):
+        """History is limited to the requested window"""
+        from datetime import timedelta
+        
+        today = date.today()
+        old_day = today - timedelta(days=40)
+        log_habit_completion(db, test_habit.habit_id, test_user.user_id, today)
+        log_habit_completion(db, test_habit.habit_id, test_user.user_id, old_day)
+        
+        habits = get_habits_for_user(
+            db, test_user.user_id, start_date=today - timedelta(days=7)
+        )
+        assert habits[0]["history"] == {str(today): True}
+    
     def test_get_habits_for_user_isolated_by_user(self, db, test_user, test_user2):
         """Each user only sees their own habits"""
         from app import models
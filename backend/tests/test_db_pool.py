@@ -0,0 +1,157 @@
+"""
+Tests for the instrumented connection pool and /metrics/db-pool
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import db as app_db
+from app import metrics
+from app.db import InstrumentedAsyncQueuePool, InstrumentedQueuePool, pool_status
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    """File-backed SQLite engine with a 1 + 1 instrumented pool"""
+    metrics.reset("db_pool_")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+    )
+    app_db._instrument(engine)
+    yield engine
+    engine.dispose()
+    metrics.reset("db_pool_")
+
+
+class TestHistogram:
+    """Bucketed latency histogram"""
+
+    def test_cumulative_buckets(self):
+        """Bucket counts are cumulative and +Inf holds every observation"""
+        histogram = metrics.Histogram("test_seconds", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["buckets"] == {"0.1": 1, "1.0": 2, "+Inf": 3}
+        assert snapshot["max"] == 5.0
+
+
+class TestInstrumentedQueuePool:
+    """Checkout, overflow, wait and timeout accounting"""
+
+    def test_overflow_wait_and_timeout(self, small_engine):
+        """Exhausting pool_size + max_overflow is visible in the counters"""
+        first = small_engine.connect()
+        second = small_engine.connect()
+        with pytest.raises(exc.TimeoutError):
+            small_engine.connect()
+
+        status = pool_status(small_engine.pool)
+        counters = status["metrics"]
+        assert status["checked_out"] == 2
+        assert status["overflow"] == 1
+        assert counters["db_pool_checkouts_total"] == 2
+        assert counters["db_pool_overflow_total"] == 1
+        assert counters["db_pool_waits_total"] == 1
+        assert counters["db_pool_timeouts_total"] == 1
+        assert counters["db_pool_checkout_seconds"]["count"] == 3
+
+        first.close()
+        second.close()
+
+    def test_reused_connection_is_not_counted_as_wait(self, small_engine):
+        """Checking out an idle pooled connection does not wait"""
+        small_engine.connect().close()
+        small_engine.connect().close()
+
+        counters = metrics.snapshot("db_pool_")
+        assert counters["db_pool_connects_total"] == 1
+        assert counters["db_pool_waits_total"] == 0
+        assert counters["db_pool_overflow_total"] == 0
+
+
+    def test_returned_connection_reuse_is_not_overflow(self, small_engine):
+        """Reusing a pooled connection while an overflow one is out is not another overflow"""
+        first = small_engine.connect()
+        second = small_engine.connect()
+        first.close()
+        third = small_engine.connect()
+
+        counters = metrics.snapshot("db_pool_")
+        assert counters["db_pool_overflow_total"] == 1
+        assert counters["db_pool_waits_total"] == 0
+
+        second.close()
+        third.close()
+
+
+class TestInstrumentedAsyncQueuePool:
+    """The async engine's pool reports to its own metrics"""
+
+    def test_async_overflow_wait_and_timeout(self, tmp_path):
+        """Async checkouts are classified like sync ones, under db_async_pool_*"""
+        metrics.reset("db_")
+
+        async def exercise():
+            engine = create_async_engine(
+                f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+                poolclass=InstrumentedAsyncQueuePool,
+                pool_size=1,
+                max_overflow=1,
+                pool_timeout=0.05,
+            )
+            app_db._instrument(engine.sync_engine, app_db.async_pool_metrics)
+            first = await engine.connect()
+            second = await engine.connect()
+            await second.execute(text("SELECT 1"))
+            with pytest.raises(exc.TimeoutError):
+                await engine.connect()
+            status = pool_status(engine.sync_engine.pool)
+            await first.close()
+            await second.close()
+            await engine.dispose()
+            return status
+
+        status = asyncio.run(exercise())
+
+        counters = status["metrics"]
+        assert status["pool_class"] == "InstrumentedAsyncQueuePool"
+        assert status["max_overflow"] == 1
+        assert counters["db_async_pool_checkouts_total"] == 2
+        assert counters["db_async_pool_overflow_total"] == 1
+        assert counters["db_async_pool_waits_total"] == 1
+        assert counters["db_async_pool_timeouts_total"] == 1
+        assert metrics.snapshot("db_pool_")["db_pool_checkouts_total"] == 0
+        metrics.reset("db_")
+
+
+class TestPoolMetricsEndpoint:
+    """GET /metrics/db-pool"""
+
+    def test_returns_both_pools(self, client, metrics_headers):
+        """The endpoint reports the sync and the async engine's pool"""
+        response = client.get("/metrics/db-pool", headers=metrics_headers)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert "pool_class" in data["sync"]
+        assert "db_pool_checkout_seconds" in data["sync"]["metrics"]
+        assert "db_async_pool_checkout_seconds" in data["async"]["metrics"]
+
+    def test_requires_metrics_token(self, client, metrics_headers):
+        """Requests without the internal token are refused"""
+        missing = client.get("/metrics/db-pool")
+        wrong = client.get("/metrics/password-hashing", headers={"X-Metrics-Token": "guess"})
+
+        assert missing.status_code == wrong.status_code == 403
+
+    def test_disabled_without_token(self, client):
+        """Without METRICS_TOKEN the endpoints are not served"""
+        assert client.get("/metrics/db-pool").status_code == 404
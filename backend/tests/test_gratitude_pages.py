@@ -0,0 +1,146 @@
+"""
+Tests for keyset-paginated gratitude listing (GET /gratitude/page) and the NDJSON export
+"""
+import json
+from datetime import datetime, timedelta
+
+from app import crud, models
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _add_entries(db, user_id, count, start=datetime(2025, 3, 1, 9, 0), step=timedelta(hours=6), **fields):
+    entries = [
+        models.GratitudeEntry(
+            user_id=user_id, body=f"Entry {i}", created_at=start + i * step, **fields
+        )
+        for i in range(count)
+    ]
+    db.add_all(entries)
+    db.commit()
+    return entries
+
+
+def _all_pages(client, token, **params):
+    ids, cursor = [], None
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        body = client.get("/gratitude/page", params=query, headers=_auth(token)).json()
+        ids.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+class TestGratitudePage:
+    """GET /gratitude/page"""
+
+    def test_pages_cover_every_entry_once(self, client, db, test_user, test_token):
+        """Walking next_cursor returns each entry exactly once, newest first"""
+        entries = _add_entries(db, test_user.user_id, 12)
+
+        ids = _all_pages(client, test_token, limit=5)
+
+        assert ids == [e.gratitude_id for e in reversed(entries)]
+
+    def test_same_timestamp_uses_id_tiebreak(self, client, db, test_user, test_token):
+        """Entries created in the same instant are neither skipped nor repeated"""
+        entries = _add_entries(db, test_user.user_id, 7, step=timedelta(0))
+
+        ids = _all_pages(client, test_token, limit=3)
+
+        assert sorted(ids, reverse=True) == ids
+        assert set(ids) == {e.gratitude_id for e in entries}
+
+    def test_last_page_has_no_cursor(self, client, db, test_user, test_token):
+        """A page that reaches the end returns next_cursor null"""
+        _add_entries(db, test_user.user_id, 3)
+
+        body = client.get("/gratitude/page?limit=3", headers=_auth(test_token)).json()
+
+        assert len(body["items"]) == 3
+        assert body["next_cursor"] is None
+
+    def test_item_shape_matches_list(self, client, test_token):
+        """Page items have the same fields as GET /gratitude/"""
+        client.post("/gratitude/", data={"text": "Tea", "category": "Food"}, headers=_auth(test_token))
+
+        listed = client.get("/gratitude/", headers=_auth(test_token)).json()
+        paged = client.get("/gratitude/page", headers=_auth(test_token)).json()["items"]
+
+        assert paged[0]["id"] == listed[0]["id"]
+        assert paged[0]["date"] == listed[0]["date"]
+        assert paged[0]["category"] == "Food"
+
+    def test_category_and_date_filters(self, client, db, test_user, test_token):
+        """category, from and to narrow the listing"""
+        _add_entries(db, test_user.user_id, 4, step=timedelta(days=1), category="Family")
+        _add_entries(db, test_user.user_id, 4, step=timedelta(days=1), category="Work")
+
+        family = _all_pages(client, test_token, category="Family")
+        window = _all_pages(client, test_token, **{"from": "2025-03-02", "to": "2025-03-03"})
+
+        assert len(family) == 4
+        assert len(window) == 4
+
+    def test_other_users_entries_excluded(self, client, db, test_user2, test_token):
+        """Only the caller's entries are listed"""
+        _add_entries(db, test_user2.user_id, 3)
+
+        assert _all_pages(client, test_token) == []
+
+    def test_invalid_cursor_400(self, client, test_token):
+        """A cursor that was not issued by the server is rejected"""
+        response = client.get("/gratitude/page?cursor=not-a-cursor", headers=_auth(test_token))
+        assert response.status_code == 400
+
+    def test_reversed_range_400(self, client, test_token):
+        """from after to is rejected"""
+        response = client.get(
+            "/gratitude/page?from=2025-03-05&to=2025-03-01", headers=_auth(test_token)
+        )
+        assert response.status_code == 400
+
+    def test_limit_bounds(self, client, test_token):
+        """limit must be within 1..MAX_PAGE_SIZE"""
+        assert client.get("/gratitude/page?limit=0", headers=_auth(test_token)).status_code == 422
+        assert client.get("/gratitude/page?limit=1000", headers=_auth(test_token)).status_code == 422
+
+
+class TestGratitudeExport:
+    """GET /gratitude/export.ndjson"""
+
+    def test_one_line_per_entry(self, client, db, test_user, test_token, monkeypatch):
+        """Every entry is exported once, across several batches"""
+        from app.routers import gratitude
+
+        monkeypatch.setattr(gratitude, "EXPORT_BATCH_SIZE", 4)
+        entries = _add_entries(db, test_user.user_id, 10)
+
+        response = client.get("/gratitude/export.ndjson", headers=_auth(test_token))
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["id"] for line in lines] == [e.gratitude_id for e in reversed(entries)]
+
+    def test_empty_export(self, client, test_token):
+        """No entries gives an empty body"""
+        response = client.get("/gratitude/export.ndjson", headers=_auth(test_token))
+        assert response.status_code == 200
+        assert response.text == ""
+
+
+class TestGratitudePageCrud:
+    """crud.get_gratitude_page"""
+
+    def test_next_after_is_last_item(self, db, test_user):
+        """The returned position is the last item's (created_at, id)"""
+        entries = _add_entries(db, test_user.user_id, 3)
+
+        items, next_after = crud.get_gratitude_page(db, test_user.user_id, limit=2)
+
+        assert [i["id"] for i in items] == [entries[2].gratitude_id, entries[1].gratitude_id]
+        assert next_after == (entries[1].created_at, entries[1].gratitude_id)
@@ -0,0 +1,155 @@
+"""
+Tests for conditional GET (app/http_cache.py) and services/resource_versions.py
+"""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from app import crud, models
+from app.routers import mood as mood_router
+from app.security import create_access_token
+from app.services import resource_versions
+from app.services.achievement_rules import evaluate_user_achievements
+
+
+def _auth(token, **extra):
+    return {"Authorization": f"Bearer {token}", **extra}
+
+
+def _version(db, user_id, resource):
+    db.expire_all()
+    row = db.get(models.ResourceVersion, (user_id, resource))
+    return 0 if row is None else row.version
+
+
+class TestValidators:
+    """ETag / Last-Modified / Cache-Control on opted-in GET routes"""
+
+    def test_headers_present(self, client, test_token):
+        """A 200 carries a weak ETag and private revalidation headers"""
+        response = client.get("/mood/", headers=_auth(test_token))
+
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('W/"')
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert response.headers["vary"] == "Authorization"
+        assert "last-modified" in response.headers
+
+    def test_not_opted_in_route_has_no_etag(self, client, test_token):
+        """Routes without the dependency are untouched"""
+        response = client.get("/users/me", headers=_auth(test_token))
+        assert "etag" not in response.headers
+
+    def test_query_string_changes_etag(self, client, test_token):
+        """Different parameters of the same resource do not share a validator"""
+        first = client.get("/mood/stats?days=7", headers=_auth(test_token))
+        second = client.get("/mood/stats?days=30", headers=_auth(test_token))
+        assert first.headers["etag"] != second.headers["etag"]
+
+
+class TestConditionalGet:
+    """If-None-Match / If-Modified-Since"""
+
+    def test_matching_etag_is_304_without_running_route(self, client, test_token, monkeypatch):
+        """An unchanged poll gets 304 and the route's query never runs"""
+        etag = client.get("/mood/", headers=_auth(test_token)).headers["etag"]
+
+        def fail(*args, **kwargs):
+            raise AssertionError("route body ran")
+
+        monkeypatch.setattr(mood_router.crud, "get_user_mood_logs", fail)
+        response = client.get("/mood/", headers=_auth(test_token, **{"If-None-Match": etag}))
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_write_changes_etag(self, client, test_token):
+        """Creating a mood log invalidates the old validator"""
+        etag = client.get("/mood/", headers=_auth(test_token)).headers["etag"]
+        client.post("/mood/", json={"mood_score": 7}, headers=_auth(test_token))
+
+        response = client.get("/mood/", headers=_auth(test_token, **{"If-None-Match": etag}))
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert len(response.json()) == 1
+
+    def test_strong_form_and_lists_match(self, client, test_token):
+        """Weak comparison: W/ prefix optional, any entry of a list may match"""
+        etag = client.get("/gratitude/", headers=_auth(test_token)).headers["etag"]
+        header = f'"other", {etag.removeprefix("W/")}'
+
+        response = client.get("/gratitude/", headers=_auth(test_token, **{"If-None-Match": header}))
+
+        assert response.status_code == 304
+
+    def test_if_modified_since(self, client, test_token):
+        """Without If-None-Match, a recent enough date gives 304"""
+        future = format_datetime(datetime.now(timezone.utc) + timedelta(minutes=1), usegmt=True)
+        past = format_datetime(datetime.now(timezone.utc) - timedelta(days=2), usegmt=True)
+
+        fresh = client.get("/habits/", headers=_auth(test_token, **{"If-Modified-Since": future}))
+        stale = client.get("/habits/", headers=_auth(test_token, **{"If-Modified-Since": past}))
+
+        assert fresh.status_code == 304
+        assert stale.status_code == 200
+
+    def test_versions_are_per_user(self, client, db, test_token, test_user2):
+        """Another user's writes do not invalidate this user's validator"""
+        etag = client.get("/gratitude/", headers=_auth(test_token)).headers["etag"]
+        other_token = create_access_token(test_user2.email, user_id=test_user2.user_id)
+        client.post("/gratitude/", data={"text": "Sunshine"}, headers=_auth(other_token))
+
+        response = client.get("/gratitude/", headers=_auth(test_token, **{"If-None-Match": etag}))
+
+        assert response.status_code == 304
+
+    def test_catalog_etag_is_public(self, client):
+        """The achievement catalog needs no login and revalidates on the seed version"""
+        first = client.get("/achievements")
+        second = client.get("/achievements", headers={"If-None-Match": first.headers["etag"]})
+
+        assert first.headers["cache-control"].startswith("public, max-age=")
+        assert second.status_code == 304
+
+
+class TestResourceVersions:
+    """Write paths bump the right counter"""
+
+    def test_habit_writes_bump_habits(self, client, db, test_token, test_user, test_habit):
+        """Completing a habit bumps only the habits counter"""
+        client.post(f"/habits/{test_habit.habit_id}/complete?on=2025-03-10", headers=_auth(test_token))
+
+        assert _version(db, test_user.user_id, resource_versions.HABITS) == 1
+        assert _version(db, test_user.user_id, resource_versions.MOOD) == 0
+
+    def test_crud_writes_bump(self, db, test_user):
+        """crud mood and gratitude writes bump their counters"""
+        log = crud.create_mood_log(db, test_user.user_id, 5)
+        crud.update_mood_log(db, log.mood_id, test_user.user_id, note="later")
+        crud.create_gratitude_entry(db, test_user.user_id, "Tea")
+
+        assert _version(db, test_user.user_id, resource_versions.MOOD) == 2
+        assert _version(db, test_user.user_id, resource_versions.GRATITUDE) == 1
+
+    def test_evaluation_bumps_only_on_change(self, db, test_user, user_achievements):
+        """Re-evaluating with nothing new leaves the achievements counter alone"""
+        crud.create_gratitude_entry(db, test_user.user_id, "Tea")
+        evaluate_user_achievements(db, test_user.user_id)
+        after_first = _version(db, test_user.user_id, resource_versions.ACHIEVEMENTS)
+
+        evaluate_user_achievements(db, test_user.user_id)
+
+        assert after_first > 0
+        assert _version(db, test_user.user_id, resource_versions.ACHIEVEMENTS) == after_first
+
+    def test_bump_users(self, db, test_user, test_user2):
+        """bump_users covers every user (or a user_id range) in one statement"""
+        resource_versions.bump_users(db, resource_versions.ACHIEVEMENTS)
+        resource_versions.bump_users(
+            db, resource_versions.ACHIEVEMENTS, test_user.user_id, test_user.user_id
+        )
+        db.commit()
+
+        assert _version(db, test_user.user_id, resource_versions.ACHIEVEMENTS) == 2
+        assert _version(db, test_user2.user_id, resource_versions.ACHIEVEMENTS) == 1
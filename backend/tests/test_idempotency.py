@@ -0,0 +1,164 @@
+"""
+Tests for app/idempotency.py and the idempotent create routes
+"""
+from datetime import date, datetime, timedelta
+
+from app import crud, idempotency, models
+from app.security import create_access_token
+
+DAY = date(2025, 3, 10)
+
+
+def _auth(token, key=None):
+    headers = {"Authorization": f"Bearer {token}"}
+    if key is not None:
+        headers[idempotency.HEADER] = key
+    return headers
+
+
+def _completions(db, habit_id):
+    db.expire_all()
+    return db.query(models.HabitCompletion).filter_by(habit_id=habit_id).count()
+
+
+class TestMarkComplete:
+    """POST /habits/{id}/complete"""
+
+    def test_double_click_is_a_no_op(self, client, db, test_token, test_user, test_habit):
+        """Completing a done day again is a 204 with no second row or event"""
+        url = f"/habits/{test_habit.habit_id}/complete?on={DAY}"
+
+        first = client.post(url, headers=_auth(test_token))
+        second = client.post(url, headers=_auth(test_token))
+
+        assert (first.status_code, second.status_code) == (204, 204)
+        assert _completions(db, test_habit.habit_id) == 1
+        assert db.query(models.AchievementEvent).count() == 1
+        assert db.get(models.DailyUserRollup, (test_user.user_id, DAY)).completions == 1
+
+    def test_retry_with_key_is_replayed(self, client, db, test_token, test_habit):
+        """A retried request with the same key is answered from the stored response"""
+        url = f"/habits/{test_habit.habit_id}/complete?on={DAY}"
+
+        client.post(url, headers=_auth(test_token, "k-1"))
+        retry = client.post(url, headers=_auth(test_token, "k-1"))
+
+        assert retry.status_code == 204
+        assert retry.headers[idempotency.REPLAYED_HEADER] == "true"
+        assert _completions(db, test_habit.habit_id) == 1
+
+    def test_crud_helper_is_idempotent(self, db, test_user, test_habit):
+        """log_habit_completion returns the existing row instead of raising"""
+        first = crud.log_habit_completion(db, test_habit.habit_id, test_user.user_id, DAY)
+        second = crud.log_habit_completion(db, test_habit.habit_id, test_user.user_id, DAY)
+
+        assert first.completion_id == second.completion_id
+
+
+class TestMoodCreate:
+    """POST /mood/ with an Idempotency-Key"""
+
+    def test_retry_returns_same_body(self, client, db, test_token):
+        """The retry gets the original 201 and no second log"""
+        payload = {"mood_score": 7, "logged_on": str(DAY)}
+
+        first = client.post("/mood/", json=payload, headers=_auth(test_token, "mood-1"))
+        retry = client.post("/mood/", json=payload, headers=_auth(test_token, "mood-1"))
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers[idempotency.REPLAYED_HEADER] == "true"
+        assert idempotency.REPLAYED_HEADER not in first.headers
+        assert db.query(models.MoodLog).count() == 1
+
+    def test_key_reused_for_other_request(self, client, test_token):
+        """The same key with a different body is a 422"""
+        client.post("/mood/", json={"mood_score": 7, "logged_on": str(DAY)}, headers=_auth(test_token, "mood-1"))
+
+        response = client.post(
+            "/mood/", json={"mood_score": 2, "logged_on": str(DAY)}, headers=_auth(test_token, "mood-1")
+        )
+
+        assert response.status_code == 422
+
+    def test_new_key_for_existing_day(self, client, test_token):
+        """A different key for a day that already has a log is still a 400"""
+        payload = {"mood_score": 7, "logged_on": str(DAY)}
+        client.post("/mood/", json=payload, headers=_auth(test_token, "mood-1"))
+
+        response = client.post("/mood/", json=payload, headers=_auth(test_token, "mood-2"))
+
+        assert response.status_code == 400
+
+    def test_failed_request_is_not_stored(self, client, db, test_token):
+        """An error response does not keep the key, so the retry runs again"""
+        payload = {"mood_score": 7, "logged_on": str(DAY)}
+        client.post("/mood/", json=payload, headers=_auth(test_token))
+        client.post("/mood/", json=payload, headers=_auth(test_token, "mood-1"))
+
+        assert db.query(models.IdempotencyKey).count() == 0
+
+    def test_keys_are_per_user(self, client, test_token, test_user2):
+        """Two users may use the same key"""
+        test_token2 = create_access_token(subject=test_user2.email, user_id=test_user2.user_id)
+        payload = {"mood_score": 7, "logged_on": str(DAY)}
+
+        first = client.post("/mood/", json=payload, headers=_auth(test_token, "shared"))
+        second = client.post("/mood/", json=payload, headers=_auth(test_token2, "shared"))
+
+        assert first.status_code == second.status_code == 201
+        assert first.json()["mood_id"] != second.json()["mood_id"]
+
+
+class TestSessionCreate:
+    """POST /habits/{id}/sessions with an Idempotency-Key"""
+
+    def test_retry_returns_same_session(self, client, db, test_token, test_habit):
+        """The retry replays the created session"""
+        url = f"/habits/{test_habit.habit_id}/sessions"
+        payload = {"planned_duration_seconds": 600, "session_date": str(DAY)}
+
+        first = client.post(url, json=payload, headers=_auth(test_token, "s-1"))
+        retry = client.post(url, json=payload, headers=_auth(test_token, "s-1"))
+        duplicate = client.post(url, json=payload, headers=_auth(test_token))
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.json() == first.json()
+        assert duplicate.status_code == 400
+        assert db.query(models.HabitSession).count() == 1
+
+
+class TestExpiry:
+    """Expired keys"""
+
+    def _backdate(self, db, hours):
+        db.query(models.IdempotencyKey).update(
+            {models.IdempotencyKey.created_at: datetime.utcnow() - timedelta(hours=hours)}
+        )
+        db.commit()
+
+    def test_expired_key_is_reused(self, client, db, test_token):
+        """After the TTL a key starts a new request"""
+        client.post("/mood/", json={"mood_score": 7, "logged_on": str(DAY)}, headers=_auth(test_token, "k"))
+        self._backdate(db, idempotency.TTL_HOURS + 1)
+
+        response = client.post(
+            "/mood/",
+            json={"mood_score": 3, "logged_on": str(DAY + timedelta(days=1))},
+            headers=_auth(test_token, "k"),
+        )
+
+        assert response.status_code == 201
+        assert idempotency.REPLAYED_HEADER not in response.headers
+
+    def test_purge_expired(self, client, db, test_token):
+        """purge_expired deletes only keys older than the TTL"""
+        client.post("/mood/", json={"mood_score": 7, "logged_on": str(DAY)}, headers=_auth(test_token, "old"))
+        self._backdate(db, idempotency.TTL_HOURS + 1)
+        client.post("/mood/", json={"mood_score": 7, "logged_on": str(DAY + timedelta(days=1))}, headers=_auth(test_token, "new"))
+
+        removed = idempotency.purge_expired(db)
+        db.commit()
+
+        assert removed == 1
+        assert [row.key for row in db.query(models.IdempotencyKey)] == ["new"]
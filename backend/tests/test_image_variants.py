@@ -0,0 +1,127 @@
+"""
+Tests for services/image_variants.py and variant serving under /uploads
+"""
+import io
+
+import pytest
+
+from app.services import image_variants
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _jpeg(width, height):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class TestVariantUrls:
+    """variant_url / original_of"""
+
+    def test_upload_urls_get_variants(self, upload_root):
+        """Relative and absolute /uploads URLs map to <url>.<variant>.webp"""
+        assert image_variants.variant_url("/uploads/gratitude/a.png", "thumb") == (
+            "/uploads/gratitude/a.png.thumb.webp"
+        )
+        assert image_variants.variant_url("http://api/uploads/avatars/a.jpg", "medium") == (
+            "http://api/uploads/avatars/a.jpg.medium.webp"
+        )
+
+    def test_foreign_urls_have_none(self, upload_root):
+        """External pictures (e.g. Google avatars) and missing images have no variants"""
+        assert image_variants.variant_url("https://lh3.googleusercontent.com/a/x", "thumb") is None
+        assert image_variants.variant_url(None, "thumb") is None
+
+    def test_original_of(self):
+        """Variant paths map back to their original"""
+        assert image_variants.original_of("gratitude/a.png.thumb.webp") == "gratitude/a.png"
+        assert image_variants.original_of("gratitude/a.png") is None
+
+
+class TestGenerateVariants:
+    """generate_variants"""
+
+    def test_sizes_and_format(self, upload_root):
+        """Each variant is WebP, bounded by its size and keeps the aspect ratio"""
+        Image = pytest.importorskip("PIL.Image")
+        (upload_root / "photo.jpg").write_bytes(_jpeg(3000, 1500))
+
+        written = image_variants.generate_variants("photo.jpg")
+
+        assert written == {v: f"photo.jpg.{v}.webp" for v in image_variants.VARIANTS}
+        for variant, key in written.items():
+            with Image.open(upload_root / key) as image:
+                assert image.format == "WEBP"
+                assert max(image.size) == image_variants.VARIANTS[variant]
+                assert image.size[0] == 2 * image.size[1]
+
+    def test_small_images_not_upscaled(self, upload_root):
+        """Images smaller than a variant keep their size"""
+        Image = pytest.importorskip("PIL.Image")
+        (upload_root / "small.jpg").write_bytes(_jpeg(100, 80))
+
+        written = image_variants.generate_variants("small.jpg")
+
+        with Image.open(upload_root / written["medium"]) as image:
+            assert image.size == (100, 80)
+
+    def test_undecodable_image_is_logged_not_raised(self, upload_root):
+        """A file Pillow cannot read yields no variants"""
+        pytest.importorskip("PIL.Image")
+        (upload_root / "broken.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+
+        assert image_variants.generate_variants("broken.png") == {}
+
+
+class TestServing:
+    """GET /uploads/..."""
+
+    def test_upload_renders_variants_in_background(self, client, test_token, upload_root):
+        """Gratitude responses carry variant URLs that resolve once rendered"""
+        pytest.importorskip("PIL.Image")
+        created = client.post(
+            "/gratitude/",
+            data={"text": "Sunset"},
+            files={"file": ("photo.jpg", _jpeg(2000, 1000), "image/jpeg")},
+            headers=_auth(test_token),
+        ).json()
+        image_variants.shutdown()
+
+        response = client.get(created["image_thumb"])
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["cache-control"] == image_variants.IMMUTABLE
+        assert len(response.content) < len(client.get(created["image"]).content)
+
+    def test_missing_variant_falls_back_to_original(self, client, upload_root):
+        """Before a variant exists its URL serves the original, uncached"""
+        (upload_root / "gratitude").mkdir()
+        (upload_root / "gratitude" / "a.png").write_bytes(b"original")
+
+        response = client.get("/uploads/gratitude/a.png.thumb.webp")
+
+        assert response.status_code == 200
+        assert response.content == b"original"
+        assert response.headers["cache-control"] == "no-cache"
+
+    def test_unknown_file_404(self, client, upload_root):
+        """Neither variant nor original: 404"""
+        assert client.get("/uploads/gratitude/none.png.thumb.webp").status_code == 404
+
+    def test_avatar_variant_fields(self, client, test_token, upload_root):
+        """User responses include the avatar's variant URLs"""
+        pytest.importorskip("PIL.Image")
+        user = client.post(
+            "/users/me/avatar",
+            files={"file": ("me.jpg", _jpeg(600, 600), "image/jpeg")},
+            headers=_auth(test_token),
+        ).json()
+        image_variants.shutdown()
+
+        assert user["profile_picture_thumb"] == user["profile_picture"] + ".thumb.webp"
+        assert user["profile_picture_medium"] == user["profile_picture"] + ".medium.webp"
@@ -0,0 +1,73 @@
+"""
+Tests for logging_config.py
+Level-gated logging configured from the environment
+"""
+import json
+import logging
+
+import pytest
+
+from app.logging_config import JsonFormatter, configure_logging, parse_levels
+from app.security import JWT_SECRET, create_access_token, decode_claims
+
+
+@pytest.fixture
+def restore_levels():
+    """Put logger levels back after a test reconfigures them"""
+    saved = {name: logging.getLogger(name).level for name in ("", "app.security", "app.routers")}
+    yield
+    for name, level in saved.items():
+        logging.getLogger(name).setLevel(level)
+
+
+class TestParseLevels:
+    """LOG_LEVELS parsing"""
+
+    def test_module_overrides(self):
+        """Comma-separated module=LEVEL pairs"""
+        assert parse_levels("app.security=DEBUG, app.routers=warning") == {
+            "app.security": logging.DEBUG,
+            "app.routers": logging.WARNING,
+        }
+
+    def test_empty_spec(self):
+        """An empty value means no overrides"""
+        assert parse_levels("") == {}
+
+    def test_unknown_level_rejected(self):
+        """Typos fail loudly instead of silently logging everything"""
+        with pytest.raises(ValueError):
+            parse_levels("app.security=LOUD")
+
+
+class TestConfigureLogging:
+    """Root and per-module levels"""
+
+    def test_per_module_level(self, restore_levels):
+        """A module can be more verbose than the root logger"""
+        configure_logging(level="WARNING", levels="app.security=DEBUG")
+
+        assert logging.getLogger().level == logging.WARNING
+        assert logging.getLogger("app.security").isEnabledFor(logging.DEBUG)
+        assert not logging.getLogger("app.routers.habits").isEnabledFor(logging.INFO)
+
+    def test_json_formatter(self):
+        """JSON output is one parseable object per record"""
+        record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "hello world"
+        assert entry["logger"] == "app.test"
+
+
+class TestAuthLogging:
+    """The auth hot path"""
+
+    def test_secret_and_token_never_logged(self, caplog):
+        """Even at DEBUG, neither the secret nor the token is written"""
+        token = create_access_token("a@example.com", user_id=1)
+        with caplog.at_level(logging.DEBUG, logger="app.security"):
+            decode_claims(token)
+
+        assert JWT_SECRET not in caplog.text
+        assert token[:30] not in caplog.text
@@ -0,0 +1,146 @@
+"""
+Parity tests for crud.get_mood_statistics
+Both the single-statement SQL version and the SQLite fallback must return
+exactly what the original two-query implementation returned.
+"""
+import random
+from datetime import timedelta
+
+import pytest
+
+from app import crud, models
+from app.utils.timezone_utils import get_bangkok_today
+
+
+def _legacy_mood_statistics(db, user_id, days=30):
+    """The implementation before the single-query rewrite, kept verbatim as the reference"""
+    start_date = get_bangkok_today() - timedelta(days=days)
+
+    logs = crud.get_user_mood_logs(db, user_id=user_id, start_date=start_date, limit=days)
+
+    if not logs:
+        return {
+            "average_mood": 0,
+            "total_logs": 0,
+            "highest_mood": 0,
+            "lowest_mood": 0,
+            "current_streak": 0,
+            "best_streak": 0,
+            "logs_this_week": 0,
+            "logs_this_month": 0,
+        }
+
+    mood_scores = [log.mood_score for log in logs]
+    average_mood = sum(mood_scores) / len(mood_scores)
+
+    today = get_bangkok_today()
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    logs_this_week = sum(1 for log in logs if log.logged_on >= week_ago)
+    logs_this_month = sum(1 for log in logs if log.logged_on >= month_ago)
+
+    all_logs = crud.get_user_mood_logs(db, user_id=user_id, limit=365)
+
+    current_streak = 0
+    best_streak = 0
+    temp_streak = 0
+
+    if all_logs:
+        sorted_logs = sorted(all_logs, key=lambda x: x.logged_on, reverse=True)
+
+        check_date = today
+        for log in sorted_logs:
+            if log.logged_on == check_date:
+                current_streak += 1
+                check_date -= timedelta(days=1)
+            elif log.logged_on < check_date:
+                break
+
+        prev_date = None
+        for log in sorted(all_logs, key=lambda x: x.logged_on):
+            if prev_date is None:
+                temp_streak = 1
+            elif (log.logged_on - prev_date).days == 1:
+                temp_streak += 1
+            else:
+                best_streak = max(best_streak, temp_streak)
+                temp_streak = 1
+
+            prev_date = log.logged_on
+
+        best_streak = max(best_streak, temp_streak)
+
+    return {
+        "average_mood": round(average_mood, 1),
+        "total_logs": len(logs),
+        "highest_mood": max(mood_scores),
+        "lowest_mood": min(mood_scores),
+        "current_streak": current_streak,
+        "best_streak": best_streak,
+        "logs_this_week": logs_this_week,
+        "logs_this_month": logs_this_month,
+    }
+
+
+def _log_days(db, user_id, offsets, seed=0):
+    """Mood logs on today - offset (negative offsets are future-dated)"""
+    rng = random.Random(seed)
+    today = get_bangkok_today()
+    for offset in offsets:
+        db.add(models.MoodLog(
+            user_id=user_id,
+            mood_score=rng.randint(1, 10),
+            logged_on=today - timedelta(days=offset),
+        ))
+    db.commit()
+
+
+def _assert_parity(db, user_id, days_values=(1, 7, 30, 90, 365)):
+    today = get_bangkok_today()
+    for days in days_values:
+        expected = _legacy_mood_statistics(db, user_id, days=days)
+        assert crud.get_mood_statistics(db, user_id, days=days) == expected, days
+        assert crud._mood_statistics_sql(db, user_id, days, today) == expected, days
+        assert crud._mood_statistics_python(db, user_id, days, today) == expected, days
+
+
+SCENARIOS = {
+    "no_logs": [],
+    "today_only": [0],
+    "unbroken_run": range(0, 20),
+    "run_ending_yesterday": range(1, 6),
+    "gaps": [0, 1, 2, 4, 5, 9, 10, 11, 12, 30, 31, 60],
+    "old_logs_only": range(100, 130),
+    "future_dated": [-2, -1, 0, 1, 2, 5],
+    "future_gap": [-3, 0, 1],
+}
+
+
+class TestMoodStatisticsParity:
+    """New implementations agree with the original"""
+
+    @pytest.mark.parametrize("offsets", SCENARIOS.values(), ids=SCENARIOS.keys())
+    def test_scenarios(self, db, test_user, offsets):
+        """Hand-picked layouts of logged days"""
+        _log_days(db, test_user.user_id, offsets)
+        _assert_parity(db, test_user.user_id)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random_history(self, db, test_user, seed):
+        """Random sparse histories"""
+        rng = random.Random(seed)
+        offsets = sorted(rng.sample(range(-3, 200), rng.randint(1, 120)))
+        _log_days(db, test_user.user_id, offsets, seed=seed)
+        _assert_parity(db, test_user.user_id, days_values=(1, 3, 7, 30, 45, 120, 365))
+
+    def test_streaks_only_see_latest_year_of_logs(self, db, test_user):
+        """Runs beyond the newest 365 logs are ignored, as before"""
+        _log_days(db, test_user.user_id, list(range(0, 300)) + list(range(301, 801)))
+        _assert_parity(db, test_user.user_id, days_values=(30, 365))
+
+    def test_other_users_ignored(self, db, test_user, test_user2):
+        """Only the requested user's logs count"""
+        _log_days(db, test_user.user_id, range(0, 10))
+        _log_days(db, test_user2.user_id, range(0, 40), seed=1)
+        _assert_parity(db, test_user.user_id)
@@ -0,0 +1,147 @@
+"""
+Tests for services/password_hashing.py
+Configurable bcrypt cost, rehash on login and the bounded hashing pool
+"""
+from passlib.context import CryptContext
+
+from app import metrics, models
+from app.db import get_db
+from app.main import app
+from app.routers import auth
+from app.security import (
+    BCRYPT_ROUNDS,
+    UNUSABLE_PASSWORD,
+    create_access_token,
+    hash_password,
+    password_needs_rehash,
+)
+from app.services import password_hashing
+
+LOGIN = {"email": "test@example.com", "password": "TestPassword123!"}
+
+
+class TestWorkFactor:
+    """BCRYPT_ROUNDS controls new hashes"""
+
+    def test_hash_uses_configured_rounds(self):
+        """New hashes carry the configured cost"""
+        assert hash_password("secret").startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+
+    def test_other_rounds_need_rehash(self):
+        """Hashes made with another cost are flagged for upgrade"""
+        old = CryptContext(schemes=["bcrypt"], bcrypt__rounds=BCRYPT_ROUNDS + 1).hash("secret")
+        assert password_needs_rehash(old)
+        assert not password_needs_rehash(hash_password("secret"))
+
+
+class TestLoginRehash:
+    """Rehash-on-login"""
+
+    def test_outdated_hash_upgraded_on_login(self, client, db, test_user):
+        """A successful login stores a hash with the current cost"""
+        test_user.password_hash = CryptContext(
+            schemes=["bcrypt"], bcrypt__rounds=BCRYPT_ROUNDS + 1
+        ).hash(LOGIN["password"])
+        db.commit()
+
+        response = client.post("/auth/login", json=LOGIN)
+
+        assert response.status_code == 200
+        db.expire_all()
+        stored = db.get(models.User, test_user.user_id).password_hash
+        assert stored.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+
+    def test_current_hash_left_alone(self, client, db, test_user):
+        """Up-to-date hashes are not rewritten"""
+        before = test_user.password_hash
+
+        client.post("/auth/login", json=LOGIN)
+
+        db.expire_all()
+        assert db.get(models.User, test_user.user_id).password_hash == before
+
+
+class TestHashingPool:
+    """Bounded pool admission and metrics"""
+
+    def test_full_queue_returns_503(self, client, test_user, monkeypatch):
+        """When no slot is free the login is refused with Retry-After"""
+        monkeypatch.setattr(password_hashing, "WORKERS", 0)
+        monkeypatch.setattr(password_hashing, "QUEUE_LIMIT", 0)
+
+        response = client.post("/auth/login", json=LOGIN)
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+    def test_jobs_are_measured(self, client, test_user, metrics_headers):
+        """Each verification is counted and timed"""
+        metrics.reset("password_hash_")
+
+        client.post("/auth/login", json=LOGIN)
+
+        status = client.get("/metrics/password-hashing", headers=metrics_headers).json()
+        assert status["pending"] == 0
+        assert status["metrics"]["password_hash_jobs_total"] == 1
+        assert status["metrics"]["password_hash_queue_seconds"]["count"] == 1
+
+    def test_password_change_uses_pool(self, client, test_user, monkeypatch):
+        """PUT /users/me hashes on the bounded pool and is refused when it is full"""
+        token = create_access_token(subject=test_user.email, user_id=test_user.user_id)
+        headers = {"Authorization": f"Bearer {token}"}
+        metrics.reset("password_hash_")
+
+        with monkeypatch.context() as full:
+            full.setattr(password_hashing, "WORKERS", 0)
+            full.setattr(password_hashing, "QUEUE_LIMIT", 0)
+            refused = client.put("/users/me", json={"password": "Other123!"}, headers=headers)
+        changed = client.put("/users/me", json={"password": "NewPassword123!"}, headers=headers)
+
+        assert changed.status_code == 200
+        assert metrics.snapshot("password_hash_")["password_hash_jobs_total"] == 1
+        assert refused.status_code == 503
+        assert refused.headers["Retry-After"] == "1"
+
+    def test_profile_update_uses_async_session(self, client, db, test_user, monkeypatch):
+        """PUT /users/me does its database work on the async session, not a blocking one"""
+        token = create_access_token(subject=test_user.email, user_id=test_user.user_id)
+
+        def no_sync_session():
+            raise AssertionError("sync session used from an async route")
+
+        monkeypatch.setitem(app.dependency_overrides, get_db, no_sync_session)
+        response = client.put(
+            "/users/me",
+            json={"name": "Renamed", "password": "NewPassword123!"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        assert response.status_code == 200
+        assert response.json()["name"] == "Renamed"
+        db.expire_all()
+        assert db.get(models.UserTokenVersion, test_user.user_id).version == 1
+
+
+class TestGoogleAccounts:
+    """Accounts created by Google sign-in have no usable password"""
+
+    def test_google_signup_stores_unusable_password(self, client, db, monkeypatch):
+        """No bcrypt work is done and the marker never matches a password"""
+        monkeypatch.setattr(auth, "GOOGLE_CLIENT_ID", "client-id")
+        monkeypatch.setattr(
+            auth.id_token,
+            "verify_oauth2_token",
+            lambda token, request, audience: {"email": "g@example.com", "name": "G"},
+        )
+        metrics.reset("password_hash_")
+
+        response = client.post("/auth/google-login", json={"token": "t"})
+
+        assert response.status_code == 200
+        user = db.query(models.User).filter_by(email="g@example.com").one()
+        assert user.password_hash == UNUSABLE_PASSWORD
+        assert metrics.snapshot("password_hash_")["password_hash_jobs_total"] == 0
+        assert not password_needs_rehash(UNUSABLE_PASSWORD)
+
+        login = client.post("/auth/login", json={"email": "g@example.com", "password": UNUSABLE_PASSWORD})
+        assert login.status_code == 401
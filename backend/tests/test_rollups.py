@@ -0,0 +1,167 @@
+"""
+Tests for services/rollups.py and the /reports endpoints
+The incrementally maintained daily_user_rollup must match a rebuild
+"""
+from datetime import date, timedelta
+
+from app import crud, models
+from app.services import rollups
+from app.utils.timezone_utils import get_bangkok_today
+
+
+def _rollup(db, user_id):
+    """{day: counters} for days with any activity"""
+    db.expire_all()
+    rows = {}
+    for row in db.query(models.DailyUserRollup).filter(models.DailyUserRollup.user_id == user_id):
+        values = (row.completions, row.planned_seconds, row.actual_seconds, row.sessions_done, row.mood_score)
+        if any(values[:4]) or row.mood_score is not None:
+            rows[row.day] = values
+    return rows
+
+
+def _rebuilt(db, user_id):
+    rollups.rebuild_range(db, user_id, user_id)
+    db.commit()
+    return _rollup(db, user_id)
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestIncrementalRollup:
+    """Write paths keep the rollup current"""
+
+    def test_completions_and_mood_match_rebuild(self, db, test_user, test_habit):
+        """crud completion and mood writes agree with a full rebuild"""
+        today = get_bangkok_today()
+        uid = test_user.user_id
+        for offset in range(3):
+            crud.log_habit_completion(db, test_habit.habit_id, uid, today - timedelta(days=offset))
+        crud.remove_habit_completion(db, test_habit.habit_id, uid, today - timedelta(days=1))
+        mood = crud.create_mood_log(db, uid, 6, logged_on=today)
+        crud.update_mood_log(db, mood.mood_id, uid, mood_score=8)
+
+        incremental = _rollup(db, uid)
+        assert incremental[today] == (1, 0, 0, 0, 8)
+        assert today - timedelta(days=1) not in incremental
+        assert incremental == _rebuilt(db, uid)
+
+    def test_deleting_mood_clears_score(self, db, test_user):
+        """A deleted mood log leaves no score behind"""
+        mood = crud.create_mood_log(db, test_user.user_id, 5)
+        crud.delete_mood_log(db, mood.mood_id, test_user.user_id)
+
+        assert _rollup(db, test_user.user_id) == {}
+
+    def test_session_routes_apply_deltas(self, client, db, test_token, test_user, test_habit):
+        """Creating, updating and deleting sessions adjusts the day's totals"""
+        day = date(2025, 3, 10)
+        url = f"/habits/{test_habit.habit_id}/sessions"
+        created = client.post(
+            url,
+            json={"session_date": day.isoformat(), "planned_duration_seconds": 600},
+            headers=_auth(test_token),
+        ).json()
+        assert _rollup(db, test_user.user_id)[day] == (0, 600, 0, 0, None)
+
+        client.put(
+            f"{url}/{created['session_id']}",
+            json={"status": "done", "actual_duration_seconds": 650},
+            headers=_auth(test_token),
+        )
+        assert _rollup(db, test_user.user_id)[day] == (0, 600, 650, 1, None)
+        assert _rollup(db, test_user.user_id) == _rebuilt(db, test_user.user_id)
+
+        client.delete(f"{url}/{created['session_id']}", headers=_auth(test_token))
+        assert _rollup(db, test_user.user_id) == {}
+
+    def test_deleting_habit_rebuilds_its_days(self, client, db, test_token, test_user, test_habit):
+        """Days the habit contributed to are recomputed without it"""
+        day = get_bangkok_today()
+        other = models.Habit(
+            user_id=test_user.user_id, habit_name="Read", start_date=day, best_streak=0
+        )
+        db.add(other)
+        db.commit()
+        client.post(f"/habits/{test_habit.habit_id}/complete?on={day}", headers=_auth(test_token))
+        client.post(f"/habits/{other.habit_id}/complete?on={day}", headers=_auth(test_token))
+        assert _rollup(db, test_user.user_id)[day][0] == 2
+
+        client.delete(f"/habits/{test_habit.habit_id}", headers=_auth(test_token))
+
+        assert _rollup(db, test_user.user_id)[day][0] == 1
+
+    def test_rebuild_all_restores_table(self, db, test_user, test_habit):
+        """The rebuild command recreates rows from the source tables"""
+        today = get_bangkok_today()
+        crud.log_habit_completion(db, test_habit.habit_id, test_user.user_id, today)
+        expected = _rollup(db, test_user.user_id)
+        db.query(models.DailyUserRollup).delete()
+        db.commit()
+
+        rollups.rebuild_all(db, report=lambda message: None)
+
+        assert _rollup(db, test_user.user_id) == expected
+
+
+class TestReports:
+    """GET /reports/daily and /reports/summary"""
+
+    def test_daily_is_zero_filled(self, client, db, test_token, test_user, test_habit):
+        """Every day in the window is returned, with activity where present"""
+        day = date(2025, 3, 10)
+        crud.log_habit_completion(db, test_habit.habit_id, test_user.user_id, day)
+
+        response = client.get(
+            "/reports/daily?from=2025-03-09&to=2025-03-11", headers=_auth(test_token)
+        )
+
+        assert response.status_code == 200
+        assert [entry["completions"] for entry in response.json()] == [0, 1, 0]
+
+    def test_weekly_summary(self, client, db, test_token, test_user, test_habit):
+        """Days are grouped into Monday-based weeks with an average mood"""
+        uid = test_user.user_id
+        for day in (date(2025, 3, 10), date(2025, 3, 11), date(2025, 3, 17)):
+            crud.log_habit_completion(db, test_habit.habit_id, uid, day)
+        crud.create_mood_log(db, uid, 6, logged_on=date(2025, 3, 10))
+        crud.create_mood_log(db, uid, 9, logged_on=date(2025, 3, 12))
+
+        response = client.get(
+            "/reports/summary?period=week&from=2025-03-10&to=2025-03-23",
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 200
+        first, second = response.json()
+        assert first["period_start"] == "2025-03-10"
+        assert first["completions"] == 2
+        assert first["active_days"] == 2
+        assert first["average_mood"] == 7.5
+        assert second["completions"] == 1
+        assert second["average_mood"] is None
+
+    def test_monthly_summary_bounds(self, client, test_token):
+        """Monthly buckets run from the 1st to the last day of the month"""
+        response = client.get(
+            "/reports/summary?period=month&from=2024-02-10&to=2024-03-05",
+            headers=_auth(test_token),
+        )
+
+        assert [(p["period_start"], p["period_end"]) for p in response.json()] == [
+            ("2024-02-01", "2024-02-29"),
+            ("2024-03-01", "2024-03-31"),
+        ]
+
+    def test_window_too_long(self, client, test_token):
+        """Windows longer than a year are rejected"""
+        response = client.get(
+            "/reports/daily?from=2023-01-01&to=2025-01-01", headers=_auth(test_token)
+        )
+        assert response.status_code == 400
+
+    def test_requires_auth(self, client):
+        """Reports need a token"""
+        assert client.get("/reports/daily").status_code == 401
@@ -30,6 +30,77 @@ class TestListHabits:
         assert response.status_code == 401
 
 
+class TestListHabitsBulk:
+    """Tests for GET /habits/bulk"""
+    
+    def test_bulk_includes_aggregates(self, client, db, test_token, test_habit):
+        """Rows carry category info and completion aggregates"""
+        from app import models
+        from app.utils.timezone_utils import get_bangkok_today
+        
+        today = get_bangkok_today()
+        for offset in (0, 2, 10):
+            db.add(models.HabitCompletion(
+                habit_id=test_habit.habit_id,
+                user_id=test_habit.user_id,
+                completed_on=today - timedelta(days=offset),
+            ))
+        db.commit()
+        
+        response = client.get(
+            "/habits/bulk",
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["next_after_id"] is None
+        row = data["items"][0]
+        assert row["category_name"] == "Test Category"
+        assert row["color"] == "#ff0000"
+        assert row["completed_today"] is True
+        assert row["week_completion"] == 2
+        assert "history" not in row
+    
+    def test_bulk_keyset_pagination(self, client, db, test_token, test_user):
+        """Cursor walks through all habits without repeats"""
+        from app import models
+        
+        db.add_all([
+            models.Habit(
+                user_id=test_user.user_id,
+                habit_name=f"Habit {i}",
+                start_date=date.today(),
+            )
+            for i in range(5)
+        ])
+        db.commit()
+        
+        seen = []
+        after_id = None
+        while True:
+            params = {"limit": 2}
+            if after_id is not None:
+                params["after_id"] = after_id
+            response = client.get(
+                "/habits/bulk",
+                params=params,
+                headers={"Authorization": f"Bearer {test_token}"},
+            )
+            assert response.status_code == 200
+            data = response.json()
+            seen.extend(row["habit_name"] for row in data["items"])
+            after_id = data["next_after_id"]
+            if after_id is None:
+                break
+        
+        assert seen == [f"Habit {i}" for i in range(5)]
+    
+    def test_bulk_unauthorized(self, client):
+        """Bulk list requires authentication"""
+        response = client.get("/habits/bulk")
+        assert response.status_code == 401
+
+
 class TestCreateHabit:
     """Tests for POST /habits/"""
     
@@ -108,6 +179,65 @@ class TestGetHabit:
         assert response.status_code == 404
 
 
+class TestHabitHistoryWindow:
+    """Tests for the from/to/days history window on GET /habits/"""
+    
+    @pytest.fixture
+    def completed_habit(self, db, test_habit):
+        from app import models
+        
+        today = date.today()
+        for offset in (0, 3, 30):
+            db.add(models.HabitCompletion(
+                habit_id=test_habit.habit_id,
+                user_id=test_habit.user_id,
+                completed_on=today - timedelta(days=offset),
+            ))
+        db.commit()
+        return test_habit
+    
+    def test_list_without_window_returns_full_history(self, client, test_token, completed_habit):
+        """No window keeps the full history"""
+        response = client.get(
+            "/habits/",
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        assert response.status_code == 200
+        assert len(response.json()[0]["history"]) == 3
+    
+    def test_list_with_from_to(self, client, test_token, completed_habit):
+        """Only completions inside [from, to] are returned"""
+        today = date.today()
+        response = client.get(
+            "/habits/",
+            params={"from": today - timedelta(days=5), "to": today - timedelta(days=1)},
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["history"] == {
+            str(today - timedelta(days=3)): True
+        }
+    
+    def test_get_habit_with_days(self, client, test_token, completed_habit):
+        """days=N limits the history to the last N days"""
+        response = client.get(
+            f"/habits/{completed_habit.habit_id}",
+            params={"days": 7, "to": date.today()},
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        assert response.status_code == 200
+        assert len(response.json()["history"]) == 2
+    
+    def test_from_and_days_conflict(self, client, test_token, completed_habit):
+        """from and days cannot be combined"""
+        response = client.get(
+            "/habits/",
+            params={"from": date.today(), "days": 7},
+            headers={"Authorization": f"Bearer {test_token}"},
+        )
+        assert response.status_code == 400
+
+
 class TestUpdateHabit:
     """Tests for PUT /habits/{habit_id}"""
     
@@ -0,0 +1,86 @@
+"""
+Tests for app/schema.py and the startup path in main.init_database
+"""
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+from app import main, models, schema
+
+
+@pytest.fixture
+def fresh_engine(tmp_path):
+    """An empty file database, separate from the test database"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _statements(engine, fn):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lstrip().upper())
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+class TestEnsureSchema:
+    """Versioned schema creation"""
+
+    def test_fresh_database(self, fresh_engine):
+        """Without a marker table the schema is created and its version recorded"""
+        assert schema.read_versions(fresh_engine) is None
+
+        assert schema.ensure_schema(fresh_engine, None) is True
+
+        assert "user_token_versions" in inspect(fresh_engine).get_table_names()
+        assert schema.read_versions(fresh_engine) == {schema.SCHEMA_NAME: schema.schema_version()}
+
+    def test_current_schema_runs_no_ddl(self, fresh_engine):
+        """A matching version costs the one marker query and nothing else"""
+        schema.apply_schema(fresh_engine)
+
+        statements = _statements(
+            fresh_engine, lambda: schema.ensure_schema(fresh_engine, schema.read_versions(fresh_engine))
+        )
+
+        assert len(statements) == 1
+        assert "SEED_VERSIONS" in statements[0]
+
+    def test_changed_version_reapplies(self, fresh_engine):
+        """A different recorded version runs the DDL pass again"""
+        schema.apply_schema(fresh_engine, version="old")
+
+        assert schema.ensure_schema(fresh_engine, schema.read_versions(fresh_engine)) is True
+        assert schema.read_versions(fresh_engine)[schema.SCHEMA_NAME] == schema.schema_version()
+
+    def test_version_tracks_declared_indexes(self, monkeypatch):
+        """Changing a declared index changes the schema version"""
+        before = schema.schema_version()
+        table = models.IdempotencyKey.__table__
+        index = next(iter(table.indexes))
+        monkeypatch.setattr(index, "name", "ix_renamed")
+
+        assert schema.schema_version() != before
+
+
+class TestInitDatabase:
+    """Startup cost when nothing changed"""
+
+    def test_second_boot_skips_schema_and_seed(self, fresh_engine, monkeypatch):
+        """A boot with current markers issues no DDL and no seed or purge writes"""
+        monkeypatch.setattr(main, "engine", fresh_engine)
+        monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=fresh_engine))
+        main.init_database()
+
+        statements = _statements(fresh_engine, main.init_database)
+
+        assert statements
+        assert all(s.startswith("SELECT") for s in statements), statements
+        assert not any("FROM USERS" in s or "IDEMPOTENCY_KEYS" in s for s in statements)
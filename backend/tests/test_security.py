@@ -2,13 +2,26 @@
 Tests for security.py module
 Tests password hashing, token creation, and JWT operations
 """
+import jwt
 import pytest
+from sqlalchemy import event
+
+from app import models
 from app.security import (
+    TOKEN_VERSION,
+    Principal,
     hash_password,
     verify_password,
     create_access_token,
+    decode_claims,
     decode_token,
+    get_current_principal,
+    get_current_user,
+    invalidate_principal,
+    JWT_ALG,
+    JWT_SECRET,
 )
+from app.utils.ttl_cache import TTLCache
 from fastapi import HTTPException
 
 
@@ -109,4 +122,183 @@ class TestTokenDecoding:
         with pytest.raises(HTTPException) as exc_info:
             decode_token("")
         assert exc_info.value.status_code == 401
-        
\ No newline at end of file
+        
+
+
+class TestTTLCache:
+    """Expiring LRU cache used for authenticated principals"""
+
+    def test_entries_expire(self):
+        """Entries are dropped once their TTL has passed"""
+        now = [0.0]
+        cache = TTLCache(maxsize=10, ttl=5, timer=lambda: now[0])
+        cache.set("a", 1)
+
+        now[0] = 4.9
+        assert cache.get("a") == 1
+        now[0] = 5.0
+        assert cache.get("a") is None
+
+    def test_least_recently_used_evicted(self):
+        """Exceeding maxsize evicts the least recently used entry"""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert len(cache) == 2
+
+
+def _count_statements(db, fn):
+    """Run fn and return (result, number of SQL statements it executed)"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return result, len(statements)
+
+
+@pytest.fixture
+def legacy_token(test_user):
+    """Token issued before user_id was embedded (only "sub")"""
+    return create_access_token(subject=test_user.email)
+
+
+class TestPrincipalCache:
+    """Legacy tokens resolve through the principal cache"""
+
+    def test_second_request_skips_database(self, db, test_user, legacy_token):
+        """Only the first resolution of a subject reads the users table"""
+        first, first_queries = _count_statements(db, lambda: get_current_user(db, legacy_token))
+        second, second_queries = _count_statements(db, lambda: get_current_user(db, legacy_token))
+
+        assert first == second == Principal(test_user.user_id, test_user.email)
+        assert first_queries == 1
+        assert second_queries == 0
+
+    def test_invalidate_forces_lookup(self, db, test_user, legacy_token):
+        """Invalidated principals are read again"""
+        get_current_user(db, legacy_token)
+        invalidate_principal(test_user.email)
+
+        _, queries = _count_statements(db, lambda: get_current_user(db, legacy_token))
+        assert queries == 1
+
+    def test_unknown_user_not_cached(self, db):
+        """Tokens for missing users keep failing"""
+        token = create_access_token("ghost@example.com")
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                get_current_user(db, token)
+            assert exc_info.value.status_code == 401
+
+    def test_profile_update_invalidates(self, client, db, test_user, legacy_token, monkeypatch):
+        """PUT /users/me drops the cached principal"""
+        calls = []
+        monkeypatch.setattr(
+            "app.routers.users.invalidate_principal", lambda *args: calls.append(args)
+        )
+
+        response = client.put(
+            "/users/me",
+            json={"password": "NewPassword123!"},
+            headers={"Authorization": f"Bearer {legacy_token}"},
+        )
+
+        assert response.status_code == 200
+        assert calls == [(test_user.email, test_user.user_id)]
+
+
+class TestTokenClaims:
+    """user_id, version and issued-at claims"""
+
+    def test_token_carries_user_id(self):
+        """New tokens embed uid, ver and iat"""
+        claims = decode_claims(create_access_token("a@example.com", user_id=7))
+
+        assert claims["sub"] == "a@example.com"
+        assert claims["uid"] == 7
+        assert claims["ver"] == TOKEN_VERSION
+        assert claims["iat"] <= claims["exp"]
+
+    def test_principal_from_claims_uses_cache(self, db, test_user, test_token):
+        """Current tokens check the user's token version once, then from the cache"""
+        first, first_queries = _count_statements(db, lambda: get_current_principal(db, test_token))
+        second, second_queries = _count_statements(db, lambda: get_current_principal(db, test_token))
+
+        assert first == second == Principal(test_user.user_id, test_user.email)
+        assert (first_queries, second_queries) == (1, 0)
+
+    def test_legacy_token_still_accepted(self, client, legacy_token, test_user):
+        """Tokens without uid keep working during the migration"""
+        response = client.get(
+            "/users/me", headers={"Authorization": f"Bearer {legacy_token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["email"] == test_user.email
+
+    def test_unknown_version_falls_back_to_email(self, db, test_user):
+        """A uid without the expected version is not trusted on its own"""
+        token = jwt.encode(
+            {"sub": test_user.email, "uid": 999, "ver": 1, "exp": 4102444800},
+            JWT_SECRET,
+            algorithm=JWT_ALG,
+        )
+
+        assert get_current_principal(db, token).user_id == test_user.user_id
+
+
+class TestTokenRevocation:
+    """Per-user token versions"""
+
+    def test_deleted_user_token_rejected(self, client, db, test_user, test_token):
+        """A current-version token stops working once its user is removed"""
+        headers = {"Authorization": f"Bearer {test_token}"}
+        assert client.get("/users/me", headers=headers).status_code == 200
+
+        db.delete(test_user)
+        db.commit()
+        invalidate_principal(test_user.email, test_user.user_id)
+
+        assert client.get("/users/me", headers=headers).status_code == 401
+        assert client.get("/habits/", headers=headers).status_code == 401
+
+    def test_password_change_revokes_old_tokens(self, client, db, test_user, test_token):
+        """Tokens issued before a password change are rejected, new ones work"""
+        old = {"Authorization": f"Bearer {test_token}"}
+
+        changed = client.put("/users/me", json={"password": "NewPassword123!"}, headers=old)
+        login = client.post(
+            "/auth/login", json={"email": test_user.email, "password": "NewPassword123!"}
+        )
+        new = {"Authorization": f"Bearer {login.json()['token']}"}
+
+        assert changed.status_code == 200
+        assert client.get("/users/me", headers=old).json()["detail"] == "Token has been revoked"
+        assert client.get("/habits/", headers=old).status_code == 401
+        assert decode_claims(login.json()["token"])["tv"] == 1
+        assert client.get("/users/me", headers=new).status_code == 200
+        assert client.get("/habits/", headers=new).status_code == 200
+
+    def test_newer_token_than_cache_rereads_version(self, db, test_user, test_token):
+        """A token from a revocation made in another process refreshes the cached version"""
+        get_current_principal(db, test_token)
+        db.add(models.UserTokenVersion(user_id=test_user.user_id, version=1))
+        db.commit()
+        newer = create_access_token(test_user.email, user_id=test_user.user_id, token_version=1)
+
+        assert get_current_principal(db, newer).user_id == test_user.user_id
+        with pytest.raises(HTTPException) as exc_info:
+            get_current_principal(db, test_token)
+        assert exc_info.value.status_code == 401
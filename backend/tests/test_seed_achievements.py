@@ -0,0 +1,85 @@
+"""
+Tests for seed_achievements.py
+Versioned, idempotent achievement seeding
+"""
+import copy
+
+from sqlalchemy import event
+
+from app import models, seed_achievements
+from app.seed_achievements import (
+    ACHIEVEMENTS_SEED,
+    SEED_NAME,
+    apply_achievement_seed,
+    ensure_achievement_seed,
+    seed_version,
+)
+
+
+class TestEnsureAchievementSeed:
+    """Startup seed check"""
+
+    def test_first_boot_applies_seed(self, db, test_user):
+        """An empty database gets the catalog, user rows and a version marker"""
+        assert ensure_achievement_seed(db) is True
+
+        assert db.query(models.Achievement).count() == len(ACHIEVEMENTS_SEED)
+        assert db.query(models.UserAchievement).filter_by(
+            user_id=test_user.user_id
+        ).count() == len(ACHIEVEMENTS_SEED)
+        assert db.get(models.SeedVersion, SEED_NAME).version == seed_version()
+
+    def test_unchanged_seed_is_one_select(self, db, test_user):
+        """When the version matches, startup does a single lookup and no writes"""
+        ensure_achievement_seed(db)
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.get_bind()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            assert ensure_achievement_seed(db) is False
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+
+        assert len(statements) == 1
+        assert "seed_versions" in statements[0]
+
+    def test_changed_seed_upserts_by_key_name(self, db, test_user, monkeypatch):
+        """Editing the seed updates existing achievements and adds new ones"""
+        ensure_achievement_seed(db)
+        changed = copy.deepcopy(ACHIEVEMENTS_SEED)
+        changed[0]["title"] = "Baby Steps"
+        changed.append({
+            "key_name": "early_bird",
+            "title": "Early Bird",
+            "description": "Logged mood 5 times",
+            "icon": "🐦",
+            "points": 5,
+            "requirements": [
+                {"requirement_type": "mood_logs", "target_value": 5, "unit": "logs"}
+            ],
+        })
+        monkeypatch.setattr(seed_achievements, "ACHIEVEMENTS_SEED", changed)
+
+        assert ensure_achievement_seed(db) is True
+
+        assert db.query(models.Achievement).count() == len(changed)
+        first = db.query(models.Achievement).filter_by(key_name=changed[0]["key_name"]).one()
+        assert first.title == "Baby Steps"
+        assert len(first.requirements) == 1
+        assert db.query(models.UserAchievement).filter_by(
+            user_id=test_user.user_id
+        ).count() == len(changed)
+
+    def test_apply_does_not_mutate_seed(self, db):
+        """Applying twice keeps the requirements in ACHIEVEMENTS_SEED"""
+        apply_achievement_seed(db)
+        apply_achievement_seed(db)
+
+        assert all("requirements" in data for data in ACHIEVEMENTS_SEED)
+        assert db.query(models.AchievementRequirement).count() == sum(
+            len(data["requirements"]) for data in ACHIEVEMENTS_SEED
+        )
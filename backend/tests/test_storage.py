@@ -0,0 +1,156 @@
+"""
+Tests for services/storage.py (local and S3 backends) and uploads through them
+"""
+import io
+import os
+import tempfile
+
+import pytest
+
+from app.services import image_variants, storage, uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def _staged(backend, content):
+    fd, path = tempfile.mkstemp(dir=backend.staging_dir(), suffix=".part")
+    with os.fdopen(fd, "wb") as out:
+        out.write(content)
+    return path
+
+
+@pytest.fixture
+def s3_storage(monkeypatch):
+    """S3Storage against moto's in-process S3, installed as the current backend"""
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="bloomup-test")
+        backend = storage.S3Storage(
+            "bloomup-test",
+            prefix="uploads/",
+            public_base_url="https://cdn.example.com",
+            client=client,
+        )
+        monkeypatch.setattr(storage, "_storage", backend)
+        yield backend
+        image_variants.shutdown()
+
+
+class TestStorageInterface:
+    """Storage base class"""
+
+    def test_incomplete_backend_fails_at_instantiation(self):
+        """A backend missing an abstract method cannot be constructed"""
+
+        class Partial(storage.Storage):
+            def exists(self, key):
+                return False
+
+        with pytest.raises(TypeError, match="abstract"):
+            Partial()
+
+
+class TestLocalStorage:
+    """LocalStorage"""
+
+    def test_put_exists_delete(self, tmp_path):
+        """put_file moves the staged file into place"""
+        backend = storage.LocalStorage(str(tmp_path))
+        staged = _staged(backend, PNG)
+
+        backend.put_file("ab/abc.png", staged)
+
+        assert backend.exists("ab/abc.png")
+        assert (tmp_path / "ab" / "abc.png").read_bytes() == PNG
+        assert backend.delete("ab/abc.png") is True
+        assert backend.delete("ab/abc.png") is False
+
+    def test_url_round_trip(self, tmp_path):
+        """Relative and absolute URLs map back to the key"""
+        backend = storage.LocalStorage(str(tmp_path))
+
+        assert backend.url("ab/abc.png") == "/uploads/ab/abc.png"
+        assert backend.key_for_url("/uploads/ab/abc.png") == "ab/abc.png"
+        assert backend.key_for_url("http://api:8000/uploads/ab/abc.png") == "ab/abc.png"
+        assert backend.key_for_url("https://elsewhere.example.com/a.png") is None
+
+    def test_keys_cannot_escape_root(self, tmp_path):
+        """Keys resolving outside the root are rejected"""
+        backend = storage.LocalStorage(str(tmp_path))
+
+        with pytest.raises(ValueError):
+            backend.exists("../secret")
+        assert backend.key_for_url("/uploads/../secret") is None
+
+
+class TestS3Storage:
+    """S3Storage (moto)"""
+
+    def test_put_sets_headers_and_removes_staged_file(self, s3_storage):
+        """Objects get their content type and an immutable Cache-Control"""
+        staged = _staged(s3_storage, PNG)
+
+        s3_storage.put_file("ab/abc.png", staged)
+
+        head = s3_storage.client.head_object(Bucket="bloomup-test", Key="uploads/ab/abc.png")
+        assert head["ContentType"] == "image/png"
+        assert head["CacheControl"] == storage.IMMUTABLE
+        assert s3_storage.exists("ab/abc.png")
+        assert not os.path.exists(staged)
+
+    def test_url_round_trip(self, s3_storage):
+        """URLs are under the public base URL and prefix"""
+        url = s3_storage.url("ab/abc.png")
+
+        assert url == "https://cdn.example.com/uploads/ab/abc.png"
+        assert s3_storage.key_for_url(url) == "ab/abc.png"
+        assert s3_storage.key_for_url("/uploads/ab/abc.png") is None
+
+    def test_delete(self, s3_storage):
+        """delete reports whether the object existed"""
+        s3_storage.put_file("ab/abc.png", _staged(s3_storage, PNG))
+
+        assert s3_storage.delete("ab/abc.png") is True
+        assert s3_storage.delete("ab/abc.png") is False
+        assert not s3_storage.exists("ab/abc.png")
+
+    def test_modified(self, s3_storage):
+        """modified is the object's LastModified, None once it is gone"""
+        s3_storage.put_file("ab/abc.png", _staged(s3_storage, PNG))
+
+        head = s3_storage.client.head_object(Bucket="bloomup-test", Key="uploads/ab/abc.png")
+        assert s3_storage.modified("ab/abc.png") == head["LastModified"]
+        s3_storage.delete("ab/abc.png")
+        assert s3_storage.modified("ab/abc.png") is None
+
+    def test_local_copy(self, s3_storage):
+        """local_copy downloads to a temporary file removed afterwards"""
+        s3_storage.put_file("ab/abc.png", _staged(s3_storage, PNG))
+
+        with s3_storage.local_copy("ab/abc.png") as path:
+            with open(path, "rb") as f:
+                assert f.read() == PNG
+
+        assert not os.path.exists(path)
+
+    def test_upload_dedup_and_variants(self, s3_storage):
+        """Uploads are content-addressed in the bucket and variants are rendered from it"""
+        Image = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        Image.new("RGB", (800, 400), (10, 20, 30)).save(buffer, format="JPEG")
+        content = buffer.getvalue()
+
+        first = uploads.store_upload(io.BytesIO(content), 1024 * 1024)
+        second = uploads.store_upload(io.BytesIO(content), 1024 * 1024)
+        image_variants.shutdown()
+
+        key = s3_storage.key_for_url(first)
+        assert first == second
+        assert first.startswith("https://cdn.example.com/uploads/")
+        assert s3_storage.exists(image_variants.variant_key(key, "thumb"))
+        assert image_variants.variant_url(first, "thumb") == first + ".thumb.webp"
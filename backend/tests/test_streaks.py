@@ -0,0 +1,191 @@
+"""
+Tests for services/streaks.py
+Incremental habit/user streak state and its rebuild fallback
+"""
+import pytest
+from datetime import timedelta
+
+from app import models
+from app.crud import log_habit_completion, remove_habit_completion
+from app.services import streaks
+from app.utils.timezone_utils import get_bangkok_today
+
+
+@pytest.fixture
+def today():
+    return get_bangkok_today()
+
+
+@pytest.fixture
+def second_habit(db, test_user):
+    habit = models.Habit(
+        user_id=test_user.user_id,
+        habit_name="Reading",
+        start_date=get_bangkok_today(),
+    )
+    db.add(habit)
+    db.commit()
+    db.refresh(habit)
+    return habit
+
+
+def _log(db, habit, day):
+    return log_habit_completion(db, habit.habit_id, habit.user_id, day)
+
+
+class TestHabitStreak:
+    """Per-habit streak state"""
+
+    def test_consecutive_days_extend_streak(self, db, test_habit, today):
+        """Marking the next day extends the current streak"""
+        for offset in (2, 1, 0):
+            _log(db, test_habit, today - timedelta(days=offset))
+
+        streak = db.get(models.HabitStreak, test_habit.habit_id)
+        assert streak.current_streak == 3
+        assert streak.best_streak == 3
+        assert streak.last_completed_on == today
+
+    def test_gap_resets_current_but_keeps_best(self, db, test_habit, today):
+        """A gap starts a new run without losing the best one"""
+        for offset in (5, 4, 3, 0):
+            _log(db, test_habit, today - timedelta(days=offset))
+
+        streak = db.get(models.HabitStreak, test_habit.habit_id)
+        assert streak.current_streak == 1
+        assert streak.best_streak == 3
+
+    def test_best_streak_mirrored_on_habit(self, db, test_habit, today):
+        """Habit.best_streak follows the tracked best streak"""
+        _log(db, test_habit, today - timedelta(days=1))
+        _log(db, test_habit, today)
+
+        db.refresh(test_habit)
+        assert test_habit.best_streak == 2
+
+    def test_backfill_joins_runs(self, db, test_habit, today):
+        """Backfilling a missing day merges the runs around it"""
+        for offset in (4, 3, 1, 0):
+            _log(db, test_habit, today - timedelta(days=offset))
+        _log(db, test_habit, today - timedelta(days=2))
+
+        streak = db.get(models.HabitStreak, test_habit.habit_id)
+        assert streak.current_streak == 5
+        assert streak.best_streak == 5
+
+    def test_unmark_last_day_shortens_run(self, db, test_user, test_habit, today):
+        """Removing the last day of a run shortens it"""
+        for offset in (2, 1, 0):
+            _log(db, test_habit, today - timedelta(days=offset))
+        remove_habit_completion(db, test_habit.habit_id, test_user.user_id, today)
+
+        streak = db.get(models.HabitStreak, test_habit.habit_id)
+        assert streak.current_streak == 2
+        assert streak.best_streak == 2
+        assert streak.last_completed_on == today - timedelta(days=1)
+
+    def test_unmark_inside_run_splits_it(self, db, test_user, test_habit, today):
+        """Removing a day inside a run falls back to a rebuild"""
+        for offset in (3, 2, 1, 0):
+            _log(db, test_habit, today - timedelta(days=offset))
+        remove_habit_completion(
+            db, test_habit.habit_id, test_user.user_id, today - timedelta(days=2)
+        )
+
+        streak = db.get(models.HabitStreak, test_habit.habit_id)
+        assert streak.current_streak == 2
+        assert streak.best_streak == 2
+
+    def test_missing_state_is_rebuilt_from_history(self, db, test_user, test_habit, today):
+        """Habits with history but no streak row get rebuilt on first use"""
+        for offset in (2, 1):
+            db.add(models.HabitCompletion(
+                habit_id=test_habit.habit_id,
+                user_id=test_user.user_id,
+                completed_on=today - timedelta(days=offset),
+            ))
+        db.commit()
+
+        _log(db, test_habit, today)
+
+        streak = db.get(models.HabitStreak, test_habit.habit_id)
+        assert streak.current_streak == 3
+
+
+class TestUserStreak:
+    """Per-user streak state across habits"""
+
+    def test_days_count_once_across_habits(self, db, test_user, test_habit, second_habit, today):
+        """Completing two habits on the same day counts one streak day"""
+        _log(db, test_habit, today - timedelta(days=1))
+        _log(db, second_habit, today - timedelta(days=1))
+        _log(db, second_habit, today)
+
+        assert streaks.current_user_streak(db, test_user.user_id, today) == 2
+
+    def test_unmark_keeps_day_covered_by_other_habit(
+        self, db, test_user, test_habit, second_habit, today
+    ):
+        """Unmarking one habit keeps the day if another habit covers it"""
+        _log(db, test_habit, today)
+        _log(db, second_habit, today)
+        remove_habit_completion(db, test_habit.habit_id, test_user.user_id, today)
+
+        assert streaks.current_user_streak(db, test_user.user_id, today) == 1
+
+    def test_streak_not_ending_today_is_zero(self, db, test_user, test_habit, today):
+        """A run that ended before today is not a current streak"""
+        _log(db, test_habit, today - timedelta(days=2))
+
+        assert streaks.current_user_streak(db, test_user.user_id, today) == 0
+
+    def test_rebuild_all_matches_incremental(self, db, test_user, test_habit, second_habit, today):
+        """Full rebuild produces the same state as incremental updates"""
+        for offset in (6, 5, 3, 2, 1):
+            _log(db, test_habit, today - timedelta(days=offset))
+        _log(db, second_habit, today - timedelta(days=4))
+        incremental = db.get(models.UserStreak, test_user.user_id)
+        expected = (incremental.current_streak, incremental.best_streak)
+
+        streaks.rebuild_all_streaks(db)
+
+        rebuilt = db.get(models.UserStreak, test_user.user_id)
+        assert (rebuilt.current_streak, rebuilt.best_streak) == expected == (6, 6)
+
+    def test_initialize_missing_matches_rebuild(
+        self, db, test_user, test_user2, test_habit, second_habit, today
+    ):
+        """The set-based initializer produces the same rows as per-user rebuilds"""
+        for offset in (9, 8, 6, 5, 4, 2):
+            _log(db, test_habit, today - timedelta(days=offset))
+        for offset in (7, 4):
+            _log(db, second_habit, today - timedelta(days=offset))
+        db.query(models.UserStreak).delete()
+        db.commit()
+
+        created = streaks.initialize_user_streaks(db, test_user.user_id, test_user2.user_id)
+        db.expire_all()
+        initialized = {
+            s.user_id: (s.current_streak, s.best_streak, s.last_completed_on)
+            for s in db.query(models.UserStreak)
+        }
+        rebuilt = {
+            user_id: (s.current_streak, s.best_streak, s.last_completed_on)
+            for user_id in (test_user.user_id, test_user2.user_id)
+            for s in [streaks.rebuild_user_streak(db, user_id)]
+        }
+
+        assert created == 2
+        assert initialized == rebuilt
+        assert initialized[test_user.user_id] == (1, 6, today - timedelta(days=2))
+        assert initialized[test_user2.user_id] == (0, 0, None)
+
+    def test_initialize_keeps_existing_rows(self, db, test_user, test_habit, today):
+        """Users that already have a streak row are skipped"""
+        _log(db, test_habit, today)
+        db.get(models.UserStreak, test_user.user_id).best_streak = 42
+        db.commit()
+
+        assert streaks.initialize_user_streaks(db, test_user.user_id, test_user.user_id) == 0
+        db.expire_all()
+        assert db.get(models.UserStreak, test_user.user_id).best_streak == 42
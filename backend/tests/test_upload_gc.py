@@ -0,0 +1,193 @@
+"""
+Tests for services/upload_gc.py
+"""
+import asyncio
+import io
+import os
+import time
+from datetime import timedelta
+
+import pytest
+
+from app import models
+from app.services import storage, upload_gc, uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _age(root, key, hours):
+    """Backdate a stored file"""
+    then = time.time() - hours * 3600
+    os.utime(root / key, (then, then))
+
+
+def _store(root, content, hours_old=48):
+    url = uploads.store_upload(io.BytesIO(content), 1024)
+    key = url.removeprefix("/uploads/")
+    _age(root, key, hours_old)
+    return url, key
+
+
+def _keys(root):
+    return {
+        str(p.relative_to(root)) for p in root.rglob("*") if p.is_file() and ".staging" not in p.parts
+    }
+
+
+class TestCollect:
+    """upload_gc.collect on local storage"""
+
+    def test_deletes_only_old_orphans(self, db, test_user, upload_root):
+        """Referenced objects and orphans inside the grace period are kept"""
+        used_url, used_key = _store(upload_root, PNG)
+        _, orphan_key = _store(upload_root, JPEG)
+        db.add(models.GratitudeEntry(user_id=test_user.user_id, body="Tea", image_url=used_url))
+        db.commit()
+        (upload_root / "fresh.png").write_bytes(b"new")
+
+        report = upload_gc.collect(db, grace=timedelta(hours=24))
+
+        assert _keys(upload_root) == {used_key, "fresh.png"}
+        assert (report.deleted, report.referenced, report.recent) == (1, 1, 1)
+        assert report.reclaimed_bytes == len(JPEG)
+
+    def test_absolute_avatar_urls_count(self, db, test_user, upload_root):
+        """profile_picture holds absolute URLs; they still protect their object"""
+        url, key = _store(upload_root, PNG)
+        test_user.profile_picture = f"http://localhost:8000{url}"
+        db.commit()
+
+        upload_gc.collect(db, grace=timedelta(0))
+
+        assert key in _keys(upload_root)
+
+    def test_variants_follow_their_original(self, db, test_user, upload_root):
+        """Variants of referenced objects stay; variants of orphans go"""
+        url, key = _store(upload_root, PNG)
+        db.add(models.GratitudeEntry(user_id=test_user.user_id, body="Tea", image_url=url))
+        db.commit()
+        for name in (f"{key}.thumb.webp", "aa/gone.png.thumb.webp"):
+            (upload_root / name).parent.mkdir(parents=True, exist_ok=True)
+            (upload_root / name).write_bytes(b"variant")
+            _age(upload_root, name, 48)
+
+        upload_gc.collect(db, grace=timedelta(hours=1))
+
+        assert _keys(upload_root) == {key, f"{key}.thumb.webp"}
+
+    def test_dry_run_deletes_nothing(self, db, upload_root):
+        """A dry run reports what it would reclaim"""
+        _, key = _store(upload_root, PNG)
+
+        report = upload_gc.collect(db, grace=timedelta(hours=1), dry_run=True)
+
+        assert key in _keys(upload_root)
+        assert report.deleted == 1 and report.reclaimed_bytes == len(PNG)
+        assert report.summary().startswith("Scanned 1 objects")
+        assert "Would delete 1 objects" in report.summary()
+
+    def test_batches(self, db, upload_root):
+        """Deletion works across several batches"""
+        for i in range(7):
+            _store(upload_root, PNG + bytes([i]))
+
+        report = upload_gc.collect(db, grace=timedelta(hours=1), batch_size=3)
+
+        assert report.deleted == 7
+        assert _keys(upload_root) == set()
+
+    def test_stale_staging_files_removed(self, db, upload_root):
+        """Temp files left by crashed uploads are collected too"""
+        staging = upload_root / ".staging"
+        staging.mkdir(exist_ok=True)
+        (staging / ".upload-x.part").write_bytes(b"partial")
+        _age(upload_root, ".staging/.upload-x.part", 48)
+
+        upload_gc.collect(db, grace=timedelta(hours=1))
+
+        assert not (staging / ".upload-x.part").exists()
+
+    def test_reupload_restarts_grace_period(self, db, upload_root):
+        """A deduplicated upload touches its object, so GC keeps it"""
+        _, key = _store(upload_root, PNG)
+
+        uploads.store_upload(io.BytesIO(PNG), 1024)
+        upload_gc.collect(db, grace=timedelta(hours=1))
+
+        assert key in _keys(upload_root)
+
+
+class TestAvatarReplacement:
+    """POST /users/me/avatar releases the previous avatar"""
+
+    def test_previous_avatar_deleted(self, client, test_token, upload_root):
+        """Replacing an avatar deletes the old object once it is past the grace period"""
+        first = client.post(
+            "/users/me/avatar",
+            files={"file": ("a.png", PNG, "image/png")},
+            headers=_auth(test_token),
+        ).json()["profile_picture"]
+        _age(upload_root, first.split("/uploads/")[1], 48)
+        client.post(
+            "/users/me/avatar",
+            files={"file": ("b.jpg", JPEG, "image/jpeg")},
+            headers=_auth(test_token),
+        )
+
+        assert first.split("/uploads/")[1] not in _keys(upload_root)
+        assert len(_keys(upload_root)) == 1
+
+
+    def test_release_runs_off_event_loop(self, client, test_token, upload_root, monkeypatch):
+        """The reference lookup and delete run on the threadpool, not the event loop"""
+        calls = []
+
+        def record(db, url):
+            try:
+                asyncio.get_running_loop()
+                calls.append("event loop")
+            except RuntimeError:
+                calls.append("thread")
+            return False
+
+        monkeypatch.setattr(uploads, "release", record)
+        for upload in (("a.png", PNG, "image/png"), ("b.jpg", JPEG, "image/jpeg")):
+            client.post(
+                "/users/me/avatar",
+                files={"file": upload},
+                headers=_auth(test_token),
+            )
+
+        assert calls == ["thread"]
+
+
+class TestS3Collect:
+    """upload_gc.collect on S3 (moto)"""
+
+    def test_orphans_deleted_from_bucket(self, db, test_user, monkeypatch):
+        """Listing and batched deletes go through the bucket"""
+        boto3 = pytest.importorskip("boto3")
+        moto = pytest.importorskip("moto")
+        monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+        monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+        with moto.mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="bloomup-test")
+            backend = storage.S3Storage("bloomup-test", client=client, public_base_url="https://cdn")
+            monkeypatch.setattr(storage, "_storage", backend)
+            monkeypatch.setattr(uploads.image_variants, "schedule", lambda key: None)
+            used = uploads.store_upload(io.BytesIO(PNG), 1024)
+            uploads.store_upload(io.BytesIO(JPEG), 1024)
+            db.add(models.GratitudeEntry(user_id=test_user.user_id, body="Tea", image_url=used))
+            db.commit()
+
+            report = upload_gc.collect(db, grace=timedelta(0))
+
+            remaining = [obj.key for obj in backend.iter_objects()]
+            assert remaining == [backend.key_for_url(used)]
+            assert report.reclaimed_bytes == len(JPEG)
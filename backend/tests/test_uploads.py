@@ -0,0 +1,277 @@
+"""
+Tests for services/uploads.py and the upload routes
+"""
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from sqlalchemy import event, insert, update
+
+from app import models
+from app.services import uploads
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+GIF = b"GIF89a" + b"\x00" * 64
+WEBP = b"RIFF\x00\x00\x00\x00WEBP" + b"\x00" * 64
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _age(root, url, hours=48):
+    """Backdate a stored file past the release grace period"""
+    then = time.time() - hours * 3600
+    os.utime(root / url.removeprefix("/uploads/"), (then, then))
+
+
+def _stored_files(root):
+    """Stored objects (variants and the staging area excluded)"""
+    return sorted(
+        p.name
+        for p in root.rglob("*")
+        if p.is_file()
+        and ".staging" not in p.parts
+        and not p.name.endswith((".thumb.webp", ".medium.webp"))
+    )
+
+
+class TestStoreUpload:
+    """uploads.store_upload"""
+
+    @pytest.mark.parametrize(
+        "content, ext", [(PNG, "png"), (JPEG, "jpg"), (GIF, "gif"), (WEBP, "webp")]
+    )
+    def test_type_from_magic_bytes(self, upload_root, content, ext):
+        """The extension comes from the content, not the client's filename"""
+        url = uploads.store_upload(io.BytesIO(content), 1024)
+
+        assert url.startswith("/uploads/") and url.endswith("." + ext)
+        assert (upload_root / url.removeprefix("/uploads/")).read_bytes() == content
+
+    def test_content_addressed_key(self, upload_root):
+        """The key is derived from the SHA-256 of the content"""
+        digest = hashlib.sha256(PNG).hexdigest()
+
+        url = uploads.store_upload(io.BytesIO(PNG), 1024)
+
+        assert url == f"/uploads/{digest[:2]}/{digest}.png"
+
+    def test_identical_content_stored_once(self, upload_root):
+        """A second upload of the same bytes reuses the stored object"""
+        first = uploads.store_upload(io.BytesIO(PNG), 1024)
+        second = uploads.store_upload(io.BytesIO(PNG), 1024)
+        other = uploads.store_upload(io.BytesIO(JPEG), 1024)
+
+        assert first == second != other
+        assert len(_stored_files(upload_root)) == 2
+
+    def test_unknown_type_rejected(self, upload_root):
+        """Non-image content is refused and nothing is left behind"""
+        with pytest.raises(uploads.UnsupportedUploadType):
+            uploads.store_upload(io.BytesIO(b"<html>hello</html>"), 1024)
+
+        assert _stored_files(upload_root) == []
+        assert list((upload_root / ".staging").iterdir()) == []
+
+    def test_limit_enforced_while_streaming(self, upload_root, monkeypatch):
+        """An oversized upload fails part-way and its temp file is removed"""
+        monkeypatch.setattr(uploads, "CHUNK_SIZE", 16)
+
+        with pytest.raises(uploads.UploadTooLarge):
+            uploads.store_upload(io.BytesIO(PNG + b"\x00" * 1000), 100)
+
+        assert _stored_files(upload_root) == []
+        assert list((upload_root / ".staging").iterdir()) == []
+
+    def test_exact_limit_allowed(self, upload_root):
+        """A file of exactly max_bytes is accepted"""
+        url = uploads.store_upload(io.BytesIO(PNG), len(PNG))
+        assert os.path.getsize(upload_root / url.removeprefix("/uploads/")) == len(PNG)
+
+
+class TestRelease:
+    """uploads.release"""
+
+    def test_shared_object_kept_until_unreferenced(self, db, test_user, upload_root):
+        """An object is deleted only when no entry or avatar uses it"""
+        url = uploads.store_upload(io.BytesIO(PNG), 1024)
+        _age(upload_root, url)
+        entry = models.GratitudeEntry(user_id=test_user.user_id, body="Tea", image_url=url)
+        test_user.profile_picture = f"http://localhost:8000{url}"
+        db.add(entry)
+        db.commit()
+
+        assert uploads.release(db, url) is False
+        db.delete(entry)
+        test_user.profile_picture = None
+        db.commit()
+
+        assert uploads.release(db, url) is True
+        assert _stored_files(upload_root) == []
+
+    def test_recent_object_left_to_gc(self, db, upload_root):
+        """An unreferenced object reused by an upload that has not committed yet is kept"""
+        url = uploads.store_upload(io.BytesIO(PNG), 1024)
+        _age(upload_root, url)
+
+        # A concurrent upload of the same bytes is deduplicated onto the object
+        assert uploads.store_upload(io.BytesIO(PNG), 1024) == url
+
+        assert uploads.release(db, url) is False
+        assert len(_stored_files(upload_root)) == 1
+
+    def test_foreign_and_escaping_urls_ignored(self, db, upload_root, tmp_path_factory):
+        """URLs outside the storage, or escaping its root, are never deleted"""
+        outside = tmp_path_factory.mktemp("outside") / "keep.txt"
+        outside.write_text("keep")
+
+        assert uploads.release(db, "https://lh3.googleusercontent.com/a/x") is False
+        assert uploads.release(db, f"/uploads/../{outside.parent.name}/keep.txt") is False
+        assert outside.exists()
+
+
+class TestReferences:
+    """upload_references, the indexed lookup behind is_referenced"""
+
+    def test_reference_follows_url(self, db, test_user, upload_root):
+        """Assigning, replacing and clearing a URL keeps one reference row in step"""
+        png = uploads.store_upload(io.BytesIO(PNG), 1024)
+        jpeg = uploads.store_upload(io.BytesIO(JPEG), 1024)
+
+        test_user.profile_picture = f"http://localhost:8000{png}"
+        db.commit()
+        assert uploads.is_referenced(db, png.removeprefix("/uploads/"))
+
+        test_user.profile_picture = f"http://localhost:8000{jpeg}"
+        db.commit()
+        assert not uploads.is_referenced(db, png.removeprefix("/uploads/"))
+        assert uploads.is_referenced(db, jpeg.removeprefix("/uploads/"))
+
+        test_user.profile_picture = "https://lh3.googleusercontent.com/a/x"
+        db.commit()
+        assert db.query(models.UploadReference).count() == 0
+
+    def test_lookup_does_not_scan_owners(self, db, upload_root):
+        """is_referenced reads upload_references only"""
+        statements = []
+        listen = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.get_bind(), "before_cursor_execute", listen)
+        try:
+            uploads.is_referenced(db, "ab/abc.png")
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listen)
+
+        assert len(statements) == 1
+        assert "upload_references" in statements[0]
+        assert "gratitude_entries" not in statements[0] and "users" not in statements[0]
+
+    def test_backfill_for_older_rows(self, db, test_user, upload_root):
+        """ensure_references adds rows for URLs written without one, once"""
+        url = uploads.store_upload(io.BytesIO(PNG), 1024)
+        # Core statements bypass the ORM events, like rows from before the table existed
+        db.execute(
+            insert(models.GratitudeEntry).values(user_id=test_user.user_id, body="Tea", image_url=url)
+        )
+        db.execute(
+            update(models.User)
+            .where(models.User.user_id == test_user.user_id)
+            .values(profile_picture=f"http://localhost:8000{url}")
+        )
+        db.commit()
+        assert not uploads.is_referenced(db, url.removeprefix("/uploads/"))
+
+        assert uploads.ensure_references(db) is True
+        assert uploads.ensure_references(db) is False
+
+        references = db.query(models.UploadReference).all()
+        assert {r.key for r in references} == {url.removeprefix("/uploads/")}
+        assert len(references) == 2
+
+
+class TestUploadRoutes:
+    """POST /gratitude/ with an image and POST /users/me/avatar"""
+
+    def test_gratitude_image_saved(self, client, test_token, upload_root):
+        """The stored image is referenced by a /uploads/ path"""
+        response = client.post(
+            "/gratitude/",
+            data={"text": "Sunset"},
+            files={"file": ("photo.txt", PNG, "text/plain")},
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 201
+        image = response.json()["image"]
+        assert image.startswith("/uploads/") and image.endswith(".png")
+        assert (upload_root / image.removeprefix("/uploads/")).exists()
+
+    def test_gratitude_image_too_large_413(self, client, test_token, upload_root, monkeypatch):
+        """Images over MAX_GRATITUDE_IMAGE_BYTES are 413 and no entry is created"""
+        monkeypatch.setattr(uploads, "MAX_GRATITUDE_IMAGE_BYTES", 32)
+
+        response = client.post(
+            "/gratitude/",
+            data={"text": "Sunset"},
+            files={"file": ("photo.png", PNG, "image/png")},
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 413
+        assert client.get("/gratitude/", headers=_auth(test_token)).json() == []
+
+    def test_gratitude_not_an_image_415(self, client, test_token, upload_root):
+        """A non-image named like one is 415"""
+        response = client.post(
+            "/gratitude/",
+            data={"text": "Sunset"},
+            files={"file": ("photo.png", b"#!/bin/sh\n", "image/png")},
+            headers=_auth(test_token),
+        )
+        assert response.status_code == 415
+
+    def test_delete_entry_removes_image(self, client, test_token, upload_root):
+        """Deleting the last entry that uses an image deletes it"""
+        post = lambda: client.post(
+            "/gratitude/",
+            data={"text": "Sunset"},
+            files={"file": ("photo.png", PNG, "image/png")},
+            headers=_auth(test_token),
+        ).json()
+        first, second = post(), post()
+        assert first["image"] == second["image"]
+        _age(upload_root, first["image"])
+
+        client.delete(f"/gratitude/{first['id']}", headers=_auth(test_token))
+        assert len(_stored_files(upload_root)) == 1
+
+        client.delete(f"/gratitude/{second['id']}", headers=_auth(test_token))
+        assert _stored_files(upload_root) == []
+
+    def test_avatar_upload(self, client, test_token, upload_root):
+        """The stored avatar is set as an absolute profile_picture URL"""
+        response = client.post(
+            "/users/me/avatar",
+            files={"file": ("me.jpg", JPEG, "image/jpeg")},
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 200
+        picture = response.json()["profile_picture"]
+        assert picture.startswith("http") and "/uploads/" in picture and picture.endswith(".jpg")
+
+    def test_avatar_too_large_413(self, client, test_token, upload_root, monkeypatch):
+        """Avatars over MAX_AVATAR_BYTES are 413"""
+        monkeypatch.setattr(uploads, "MAX_AVATAR_BYTES", 32)
+
+        response = client.post(
+            "/users/me/avatar",
+            files={"file": ("me.jpg", JPEG, "image/jpeg")},
+            headers=_auth(test_token),
+        )
+
+        assert response.status_code == 413
+        assert _stored_files(upload_root) == []